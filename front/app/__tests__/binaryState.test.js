@@ -0,0 +1,98 @@
+import { describe, it, expect } from 'vitest';
+import { StateDecoder } from '../src/js/components/pages/game/binaryState';
+
+const FORMATS = ['i', 'i', 'B', 'i', 'd', 'i', 'i', 'B', 'i', 'd', 'i', 'i', 'i', 'i', 'i', 'i', 'i', 'i', 'B', 'I', 'H', 'B'];
+const SIZES = { i: 4, I: 4, H: 2, B: 1, d: 8 };
+
+function writeField(view, offset, format, value) {
+  switch (format) {
+    case 'i':
+      view.setInt32(offset, value, true);
+      break;
+    case 'I':
+      view.setUint32(offset, value, true);
+      break;
+    case 'H':
+      view.setUint16(offset, value, true);
+      break;
+    case 'B':
+      view.setUint8(offset, value);
+      break;
+    case 'd':
+      view.setFloat64(offset, value, true);
+      break;
+  }
+  return offset + SIZES[format];
+}
+
+function keyframe(frameId, fields) {
+  const size = 5 + FORMATS.reduce((sum, format) => sum + SIZES[format], 0);
+  const view = new DataView(new ArrayBuffer(size));
+  view.setUint8(0, 1);
+  view.setUint32(1, frameId, true);
+  let offset = 5;
+  FORMATS.forEach((format, i) => {
+    offset = writeField(view, offset, format, fields[i]);
+  });
+  return view.buffer;
+}
+
+function delta(frameId, baseFrameId, changes) {
+  let changedFields = 0;
+  let size = 13;
+  for (const i of Object.keys(changes)) {
+    changedFields |= 1 << i;
+    size += SIZES[FORMATS[i]];
+  }
+  const view = new DataView(new ArrayBuffer(size));
+  view.setUint8(0, 2);
+  view.setUint32(1, frameId, true);
+  view.setUint32(5, baseFrameId, true);
+  view.setUint32(9, changedFields, true);
+  let offset = 13;
+  FORMATS.forEach((format, i) => {
+    if (changedFields & (1 << i)) {
+      offset = writeField(view, offset, format, changes[i]);
+    }
+  });
+  return view.buffer;
+}
+
+// bumper_1 at (1.5, -9), bumper_2 at (-2, 9), ball at (0.25, 3) with velocity (1, 15), coin is visible
+const FIELDS = [1500, -9000, 2, 7, 1700000000000, -2000, 9000, 1, 3, 1700000000001, 250, 3000, 1000, 15000, 1000, 1000];
+FIELDS.push(-9000, 1000, 0, 0, 12, 1 << 4);
+
+describe('StateDecoder', () => {
+  it('decodes keyframe into the state', () => {
+    const { frameId, state, shouldAcknowledge } = new StateDecoder().decode(keyframe(1, FIELDS));
+    expect(frameId).toBe(1);
+    expect(shouldAcknowledge).toBe(true);
+    expect(state.bumper_1).toEqual({
+      x: 1.5,
+      z: -9,
+      score: 2,
+      buff_or_debuff_target: false,
+      move_id: 7,
+      timestamp: 1700000000000,
+    });
+    expect(state.ball).toEqual({ x: 0.25, z: 3, velocity: { x: 1, z: 15 }, temporal_speed: { x: 1, z: 1 } });
+    expect(state.coin).toEqual({ x: -9, z: 1 });
+    expect(state.elapsed_seconds).toBe(12);
+    expect(state.is_someone_scored).toBe(false);
+  });
+
+  it('applies delta to the base frame', () => {
+    const decoder = new StateDecoder();
+    decoder.decode(keyframe(1, FIELDS));
+    const { state } = decoder.decode(delta(2, 1, { 10: 500, 21: 1 }));
+    expect(state.ball.x).toBe(0.5);
+    expect(state.ball.z).toBe(3);
+    expect(state.bumper_2.x).toBe(-2);
+    expect(state.coin).toBe(null);
+    expect(state.is_someone_scored).toBe(true);
+  });
+
+  it('returns null when the base frame is unknown', () => {
+    expect(new StateDecoder().decode(delta(2, 1, { 10: 500 }))).toBe(null);
+  });
+});
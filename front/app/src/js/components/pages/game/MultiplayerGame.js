@@ -20,6 +20,7 @@ import { auth } from '@auth';
 import { showToastNotification, TOAST_TYPES } from '@utils';
 import './components/index';
 import { OVERLAY_TYPE, BUFF_TYPE } from './components/index';
+import { BINARY_STATE_SUBPROTOCOL, StateDecoder } from './binaryState';
 
 /* eslint no-var: "off" */
 /* eslint-disable new-cap */
@@ -1481,7 +1482,12 @@ export class MultiplayerGame extends HTMLElement {
       ENLARGE_PLAYER: 5,
     };
 
-    this.#pongSocket = new WebSocket('wss://' + window.location.host + '/ws/pong/' + this.#state.gameId + '/');
+    // states of the game are received as compact binary frames, other events as JSON
+    this.#pongSocket = new WebSocket('wss://' + window.location.host + '/ws/pong/' + this.#state.gameId + '/', [
+      BINARY_STATE_SUBPROTOCOL,
+    ]);
+    this.#pongSocket.binaryType = 'arraybuffer';
+    const stateDecoder = new StateDecoder();
 
     const applyInputToBumper = (input, bumper, deltaTime) => {
       if (!input.action) return;
@@ -1849,24 +1855,39 @@ export class MultiplayerGame extends HTMLElement {
       GameLogger.info('Success! :3 ');
     });
 
+    const handleStateUpdated = (state) => {
+      updateTimerUI(state.elapsed_seconds);
+      if (
+        state.is_someone_scored ||
+        state.bumper_1.score !== serverState.bumper_1.score ||
+        state.bumper_2.score !== serverState.bumper_2.score
+      ) {
+        updateScoreUI(state);
+        updateLifePointUI(state);
+      }
+      updateServerState(state);
+      reconcileWithServer();
+      applyBuffEffects();
+      updateEntitiesInterpolationBuffer(Date.now());
+    };
+
     let data;
     this.#pongSocket.addEventListener('message', async (e) => {
+      if (e.data instanceof ArrayBuffer) {
+        const frame = stateDecoder.decode(e.data);
+        if (!frame) {
+          return;
+        }
+        if (frame.shouldAcknowledge) {
+          this.safeSend(JSON.stringify({ action: 'state_ack', frame: frame.frameId }));
+        }
+        handleStateUpdated(frame.state);
+        return;
+      }
       data = JSON.parse(e.data);
       switch (data.action) {
         case 'state_updated':
-          updateTimerUI(data.state.elapsed_seconds);
-          if (
-            data.state.is_someone_scored ||
-            data.state.bumper_1.score !== serverState.bumper_1.score ||
-            data.state.bumper_2.score !== serverState.bumper_2.score
-          ) {
-            updateScoreUI(data.state);
-            updateLifePointUI(data.state);
-          }
-          updateServerState(data.state);
-          reconcileWithServer();
-          applyBuffEffects();
-          updateEntitiesInterpolationBuffer(Date.now());
+          handleStateUpdated(data.state);
           break;
         case 'player_joined':
           log.info('Player joined', data);
@@ -1950,6 +1971,12 @@ export class MultiplayerGame extends HTMLElement {
           }
           GameLogger.debug('clientState', clientState.bumper.speed);
           break;
+        case 'ping':
+          this.safeSend(JSON.stringify({ action: 'pong', ping_id: data.ping_id }));
+          break;
+        case 'network_stats':
+          GameLogger.debug('Network stats', data);
+          break;
         case 'game_started':
           GameLogger.info('Game started', data);
           this.overlay.hide();
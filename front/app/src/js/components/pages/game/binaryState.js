@@ -0,0 +1,153 @@
+/**
+ * Decoder of the binary `state_updated` frames of the game websocket.
+ * The format is described in `server/pong/binary_protocol.py`.
+ */
+
+export const BINARY_STATE_SUBPROTOCOL = 'pong.binary.v1';
+
+const FRAME_KEYFRAME = 1;
+const QUANTIZATION_SCALE = 1000;
+// the client acknowledges every n-th frame, so the server can send only what changed since then
+const ACKNOWLEDGE_EVERY_FRAMES = 5;
+const FRAME_HISTORY_SIZE = 60;
+
+const FLAG_IS_SOMEONE_SCORED = 1 << 0;
+const FLAG_TIME_LIMIT_REACHED = 1 << 1;
+const FLAG_BUMPER_1_IS_TARGET = 1 << 2;
+const FLAG_BUMPER_2_IS_TARGET = 1 << 3;
+const FLAG_HAS_COIN = 1 << 4;
+
+// the same order and types as `STATE_FIELDS` of the server
+const STATE_FIELDS = [
+  'i', // bumper_1.x
+  'i', // bumper_1.z
+  'B', // bumper_1.score
+  'i', // bumper_1.move_id
+  'd', // bumper_1.timestamp
+  'i', // bumper_2.x
+  'i', // bumper_2.z
+  'B', // bumper_2.score
+  'i', // bumper_2.move_id
+  'd', // bumper_2.timestamp
+  'i', // ball.x
+  'i', // ball.z
+  'i', // ball.velocity.x
+  'i', // ball.velocity.z
+  'i', // ball.temporal_speed.x
+  'i', // ball.temporal_speed.z
+  'i', // coin.x
+  'i', // coin.z
+  'B', // current_buff_or_debuff
+  'I', // current_buff_or_debuff_remaining_time
+  'H', // elapsed_seconds
+  'B', // flags
+];
+
+const readers = {
+  i: [(view, offset) => view.getInt32(offset, true), 4],
+  I: [(view, offset) => view.getUint32(offset, true), 4],
+  H: [(view, offset) => view.getUint16(offset, true), 2],
+  B: [(view, offset) => view.getUint8(offset), 1],
+  d: [(view, offset) => view.getFloat64(offset, true), 8],
+};
+
+const dequantize = (value) => value / QUANTIZATION_SCALE;
+
+/**
+ * Converts the array of the values of the fields into the same state object as the JSON `state_updated` event has.
+ * @param {number[]} fields
+ * @return {Object}
+ */
+export function fieldsToState(fields) {
+  const flags = fields[21];
+  return {
+    bumper_1: {
+      x: dequantize(fields[0]),
+      z: dequantize(fields[1]),
+      score: fields[2],
+      buff_or_debuff_target: Boolean(flags & FLAG_BUMPER_1_IS_TARGET),
+      move_id: fields[3],
+      timestamp: fields[4],
+    },
+    bumper_2: {
+      x: dequantize(fields[5]),
+      z: dequantize(fields[6]),
+      score: fields[7],
+      buff_or_debuff_target: Boolean(flags & FLAG_BUMPER_2_IS_TARGET),
+      move_id: fields[8],
+      timestamp: fields[9],
+    },
+    ball: {
+      x: dequantize(fields[10]),
+      z: dequantize(fields[11]),
+      velocity: { x: dequantize(fields[12]), z: dequantize(fields[13]) },
+      temporal_speed: { x: dequantize(fields[14]), z: dequantize(fields[15]) },
+    },
+    coin: flags & FLAG_HAS_COIN ? { x: dequantize(fields[16]), z: dequantize(fields[17]) } : null,
+    current_buff_or_debuff: fields[18],
+    current_buff_or_debuff_remaining_time: fields[19],
+    elapsed_seconds: fields[20],
+    is_someone_scored: Boolean(flags & FLAG_IS_SOMEONE_SCORED),
+    time_limit_reached: Boolean(flags & FLAG_TIME_LIMIT_REACHED),
+  };
+}
+
+export class StateDecoder {
+  #receivedFrames = new Map();
+
+  /**
+   * Decodes keyframe or delta frame.
+   * @param {ArrayBuffer} buffer
+   * @return {{frameId: number, state: Object, shouldAcknowledge: boolean} | null}
+   * `null` if the delta is based on the frame that the client doesn't have.
+   */
+  decode(buffer) {
+    const view = new DataView(buffer);
+    const kind = view.getUint8(0);
+    const frameId = view.getUint32(1, true);
+    let offset = 5;
+    let fields;
+
+    if (kind === FRAME_KEYFRAME) {
+      fields = STATE_FIELDS.map((format) => {
+        const [read, size] = readers[format];
+        const value = read(view, offset);
+        offset += size;
+        return value;
+      });
+    } else {
+      const baseFrameId = view.getUint32(offset, true);
+      const changedFields = view.getUint32(offset + 4, true);
+      offset += 8;
+      const base = this.#receivedFrames.get(baseFrameId);
+      if (!base) {
+        return null;
+      }
+      fields = STATE_FIELDS.map((format, i) => {
+        if (!(changedFields & (1 << i))) {
+          return base[i];
+        }
+        const [read, size] = readers[format];
+        const value = read(view, offset);
+        offset += size;
+        return value;
+      });
+      // server never goes back to the frames older than the base
+      for (const oldFrameId of this.#receivedFrames.keys()) {
+        if (oldFrameId < baseFrameId) {
+          this.#receivedFrames.delete(oldFrameId);
+        }
+      }
+    }
+
+    this.#receivedFrames.set(frameId, fields);
+    if (this.#receivedFrames.size > FRAME_HISTORY_SIZE) {
+      this.#receivedFrames.delete(this.#receivedFrames.keys().next().value);
+    }
+    return {
+      frameId,
+      state: fieldsToState(fields),
+      shouldAcknowledge: kind === FRAME_KEYFRAME || frameId % ACKNOWLEDGE_EVERY_FRAMES === 0,
+    };
+  }
+}
@@ -8,6 +8,7 @@ from channels.db import database_sync_to_async
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.testing import WebsocketCommunicator
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TransactionTestCase
 
 from chat.consumers import UserEventsConsumer
@@ -52,6 +53,9 @@ application = ProtocolTypeRouter({
 
 
 class UserEventsConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
     async def get_authenticated_communicator(self, username=None, password=None):
         if not username or not password:
             self.user = await database_sync_to_async(get_user_model().objects.create_user)(
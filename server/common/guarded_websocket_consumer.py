@@ -3,18 +3,15 @@ import time
 from collections import deque
 
 import autobahn
-from channels.generic.websocket import WebsocketConsumer
+from channels.generic.websocket import AsyncWebsocketConsumer, WebsocketConsumer
 
 from common.close_codes import CloseCodes
 
 logger = logging.getLogger("server")
 
 
-class GuardedWebsocketConsumer(WebsocketConsumer):
-    """
-    Extends default `WebsocketConsumer` and adds security features that are missing by default like handling
-    of `.send()` when the user is already disconnected and rate limit functionality.
-    """
+class RateLimiterMixin:
+    """Rate limit functionality shared by the sync and async guarded consumers."""
 
     class RateLimits:
         """
@@ -26,14 +23,6 @@ class GuardedWebsocketConsumer(WebsocketConsumer):
         GAME_CONSUMER = (100, 1)
         EVENT_CONSUMER = (50, 1)
 
-    def send(self, *args, **kwargs):
-        """Custom extended `send` method that handles the case when the user is already disconnected."""
-        try:
-            super().send(*args, **kwargs)
-        except autobahn.exception.Disconnected:
-            logger.info("[%s.send]: cannot send the message, user has disconnected", self.__class__.__name__)
-            self.close(CloseCodes.NORMAL_CLOSURE)
-
     def init_rate_limiter(
         self,
         allowed_requests: int = RateLimits.REGULAR_CONSUMER[0],
@@ -66,3 +55,33 @@ class GuardedWebsocketConsumer(WebsocketConsumer):
         else:
             self.rl_exceeded = True
         return not self.rl_exceeded
+
+
+class GuardedWebsocketConsumer(RateLimiterMixin, WebsocketConsumer):
+    """
+    Extends default `WebsocketConsumer` and adds security features that are missing by default like handling
+    of `.send()` when the user is already disconnected and rate limit functionality.
+    """
+
+    def send(self, *args, **kwargs):
+        """Custom extended `send` method that handles the case when the user is already disconnected."""
+        try:
+            super().send(*args, **kwargs)
+        except autobahn.exception.Disconnected:
+            logger.info("[%s.send]: cannot send the message, user has disconnected", self.__class__.__name__)
+            self.close(CloseCodes.NORMAL_CLOSURE)
+
+
+class AsyncGuardedWebsocketConsumer(RateLimiterMixin, AsyncWebsocketConsumer):
+    """
+    Async version of `GuardedWebsocketConsumer`, for the consumers with high message rate. Its handlers run directly
+    on the event loop instead of taking a thread of the executor for each message.
+    """
+
+    async def send(self, *args, **kwargs):
+        """Custom extended `send` method that handles the case when the user is already disconnected."""
+        try:
+            await super().send(*args, **kwargs)
+        except autobahn.exception.Disconnected:
+            logger.info("[%s.send]: cannot send the message, user has disconnected", self.__class__.__name__)
+            await self.close(CloseCodes.NORMAL_CLOSURE)
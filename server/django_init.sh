@@ -5,15 +5,28 @@ set -e
 echo "Running server in $NODE_ENV mode."
 
 python manage.py reset_connection_counters
+python manage.py reset_game_room_connection_counters
 
 python manage.py makemigrations --noinput && python manage.py migrate --noinput
 
 exec "$@" &
 
 if [ "$NODE_ENV" = "production" ]; then
-    python manage.py runworker game &
+    # each game worker runs its own share of the matches on the channel `game.{number of the worker}`
+    for ((shard = 0; shard < ${GAME_WORKER_SHARDS:-1}; shard++)); do
+        python manage.py runworker "game.$shard" &
+    done
     python manage.py runworker tournament &
+    # the only matchmaking worker holds the searches of all players in memory
+    python manage.py runworker matchmaking &
     echo "Workers were launched successefully! 🚀"
+
+    # on shutdown, let the game workers finish ongoing matches before stopping them
+    drain_game_workers() {
+        python manage.py drain_game_workers
+        kill $(jobs -p) 2>/dev/null
+    }
+    trap drain_game_workers TERM INT
 fi
 
 wait -n
@@ -0,0 +1,342 @@
+"""
+Structure-of-arrays physics engine that resolves ticks of many pong matches at once.
+Each sub tick gathers the state of every match that still has time left into NumPy arrays, finds the earliest collision
+and moves the objects of all of them with vectorized operations, and stores the results back into the matches.
+Collisions themselves are rare, so they are still handled by `BasePong`.
+Operations are done in the same order as in the scalar `BasePong`, so results are identical to `resolve_next_tick`.
+"""
+
+from collections.abc import Callable, Sequence
+
+import numpy as np
+
+from pong.consumers.game_worker import (
+    BALL_RADIUS,
+    BUMPER_1_BORDER,
+    BUMPER_2_BORDER,
+    COIN_LENGTH,
+    COIN_LENGTH_HALF,
+    COIN_WIDTH_HALF,
+    COLLISION_BUMPER_1,
+    COLLISION_BUMPER_2,
+    COLLISION_COIN,
+    COLLISION_NONE,
+    COLLISION_SCORE_BUMPER_1,
+    COLLISION_SCORE_BUMPER_2,
+    COLLISION_WALL,
+    EPSILON,
+    WALL_LEFT_X,
+    WALL_RIGHT_X,
+    WALL_WIDTH_HALF,
+    BasePong,
+)
+
+# columns of the `BasePong.get_physics_state`
+PHYSICS_STATE_FIELDS = (
+    "ball_x",
+    "ball_z",
+    "ball_vel_x",
+    "ball_vel_z",
+    "bumper_1_x",
+    "bumper_1_z",
+    "bumper_1_vel_x",
+    "bumper_1_length_half",
+    "bumper_1_width_half",
+    "bumper_2_x",
+    "bumper_2_z",
+    "bumper_2_vel_x",
+    "bumper_2_length_half",
+    "bumper_2_width_half",
+    "coin_on_screen",
+    "coin_x",
+    "coin_z",
+    "coin_vel_x",
+)
+
+# below this amount of matches, the overhead of NumPy calls is bigger than the gain of vectorization
+BATCH_PHYSICS_MIN_MATCHES = 64
+
+
+def _moving_rectangle_collision_time(
+    ball_x: np.ndarray,
+    ball_z: np.ndarray,
+    ball_vel_x: np.ndarray,
+    ball_vel_z: np.ndarray,
+    *,
+    rect_x: np.ndarray,
+    rect_z: np.ndarray,
+    rect_vel_x: np.ndarray | float,
+    half_width: np.ndarray | float,
+    half_height: np.ndarray | float,
+) -> np.ndarray:
+    """Vectorized `BasePong._calculate_moving_rectangle_collision_time`. Rectangles never move along z axis."""
+    rel_vel_x = ball_vel_x - rect_vel_x
+    rel_vel_z = ball_vel_z
+
+    rect_left = rect_x - half_width - BALL_RADIUS
+    rect_right = rect_x + half_width + BALL_RADIUS
+    rect_top = rect_z + half_height + BALL_RADIUS
+    rect_bottom = rect_z - half_height - BALL_RADIUS
+
+    no_x_movement = np.abs(rel_vel_x) < EPSILON
+    no_z_movement = np.abs(rel_vel_z) < EPSILON
+    # the divisions by zero are discarded by the masks above
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_x_1 = (rect_left - ball_x) / rel_vel_x
+        t_x_2 = (rect_right - ball_x) / rel_vel_x
+        t_z_1 = (rect_bottom - ball_z) / rel_vel_z
+        t_z_2 = (rect_top - ball_z) / rel_vel_z
+    t_x_enter = np.where(no_x_movement, 0.0, np.minimum(t_x_1, t_x_2))
+    t_x_exit = np.where(no_x_movement, np.inf, np.maximum(t_x_1, t_x_2))
+    t_z_enter = np.where(no_z_movement, 0.0, np.minimum(t_z_1, t_z_2))
+    t_z_exit = np.where(no_z_movement, np.inf, np.maximum(t_z_1, t_z_2))
+
+    collision_enter = np.maximum(t_x_enter, t_z_enter)
+    collision_exit = np.minimum(t_x_exit, t_z_exit)
+
+    is_collision = (
+        ~(no_x_movement & no_z_movement)
+        & ~(no_x_movement & ((ball_x <= rect_left) | (ball_x >= rect_right)))
+        & ~(no_z_movement & ((ball_z <= rect_bottom) | (ball_z >= rect_top)))
+        & (collision_enter <= collision_exit)
+        & (collision_enter > EPSILON)
+    )
+    return np.where(is_collision, collision_enter, np.inf)
+
+
+def _find_next_collisions(state: np.ndarray, max_time: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorized `BasePong._find_next_collision`. Returns collision times and `COLLISION_*` codes."""
+    (
+        ball_x,
+        ball_z,
+        ball_vel_x,
+        ball_vel_z,
+        bumper_1_x,
+        bumper_1_z,
+        bumper_1_vel_x,
+        bumper_1_length_half,
+        bumper_1_width_half,
+        bumper_2_x,
+        bumper_2_z,
+        bumper_2_vel_x,
+        bumper_2_length_half,
+        bumper_2_width_half,
+        coin_on_screen,
+        coin_x,
+        coin_z,
+        coin_vel_x,
+    ) = state
+
+    earliest_time = max_time.copy()
+    collisions = np.zeros(max_time.shape, dtype=np.int8)
+
+    def consider(t: np.ndarray, candidates: np.ndarray | bool, code: int):
+        is_earlier = candidates & (t >= -EPSILON) & (t <= earliest_time)
+        np.copyto(earliest_time, t, where=is_earlier)
+        collisions[is_earlier] = code
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        consider((WALL_RIGHT_X + WALL_WIDTH_HALF + BALL_RADIUS - ball_x) / ball_vel_x, ball_vel_x < 0, COLLISION_WALL)
+        consider((WALL_LEFT_X - WALL_WIDTH_HALF - BALL_RADIUS - ball_x) / ball_vel_x, ball_vel_x > 0, COLLISION_WALL)
+        consider(
+            _moving_rectangle_collision_time(
+                ball_x,
+                ball_z,
+                ball_vel_x,
+                ball_vel_z,
+                rect_x=bumper_1_x,
+                rect_z=bumper_1_z,
+                rect_vel_x=bumper_1_vel_x,
+                half_width=bumper_1_length_half,
+                half_height=bumper_1_width_half,
+            ),
+            True,
+            COLLISION_BUMPER_1,
+        )
+        consider(
+            _moving_rectangle_collision_time(
+                ball_x,
+                ball_z,
+                ball_vel_x,
+                ball_vel_z,
+                rect_x=bumper_2_x,
+                rect_z=bumper_2_z,
+                rect_vel_x=bumper_2_vel_x,
+                half_width=bumper_2_length_half,
+                half_height=bumper_2_width_half,
+            ),
+            True,
+            COLLISION_BUMPER_2,
+        )
+        consider(
+            _moving_rectangle_collision_time(
+                ball_x,
+                ball_z,
+                ball_vel_x,
+                ball_vel_z,
+                rect_x=coin_x,
+                rect_z=coin_z,
+                rect_vel_x=coin_vel_x,
+                half_width=COIN_LENGTH_HALF,
+                half_height=COIN_WIDTH_HALF,
+            ),
+            coin_on_screen.astype(bool),
+            COLLISION_COIN,
+        )
+        consider((BUMPER_2_BORDER - ball_z) / ball_vel_z, ball_vel_z > 0, COLLISION_SCORE_BUMPER_1)
+        consider((BUMPER_1_BORDER - ball_z) / ball_vel_z, ball_vel_z < 0, COLLISION_SCORE_BUMPER_2)
+
+    return earliest_time, collisions
+
+
+def _move_bumpers(bumper_x: np.ndarray, bumper_vel_x: np.ndarray, length_half: np.ndarray, delta_time: np.ndarray):
+    """Vectorized `BasePong._move_bumper`. Bumpers stick to the edges of the walls."""
+    left_limit = WALL_LEFT_X - WALL_WIDTH_HALF - length_half
+    right_limit = WALL_RIGHT_X + WALL_WIDTH_HALF + length_half
+    moved_x = np.maximum(right_limit, np.minimum(left_limit, bumper_x + bumper_vel_x * delta_time))
+    return np.where(bumper_vel_x != 0, moved_x, bumper_x)
+
+
+def _move_all_objects(state: np.ndarray, delta_time: np.ndarray) -> tuple[np.ndarray, ...]:
+    """Vectorized `BasePong._move_all_objects`. Returns new positions of the objects and the coin velocity."""
+    ball_x, ball_z, ball_vel_x, ball_vel_z = state[0:4]
+    ball_x = ball_x + ball_vel_x * delta_time
+    ball_z = ball_z + ball_vel_z * delta_time
+
+    bumper_1_x = _move_bumpers(state[4], state[6], state[7], delta_time)
+    bumper_2_x = _move_bumpers(state[9], state[11], state[12], delta_time)
+
+    # coin bounces from the walls
+    coin_on_screen = state[14].astype(bool)
+    coin_x, coin_vel_x = state[15], state[17]
+    left_limit = WALL_LEFT_X - WALL_WIDTH_HALF - COIN_LENGTH
+    right_limit = WALL_RIGHT_X + WALL_WIDTH_HALF + COIN_LENGTH
+    moved_coin_x = np.maximum(right_limit, np.minimum(left_limit, coin_x + coin_vel_x * delta_time))
+    coin_x = np.where(coin_on_screen, moved_coin_x, coin_x)
+    is_bounced = coin_on_screen & ((coin_x == left_limit) | (coin_x == right_limit))
+    coin_vel_x = np.where(is_bounced, -coin_vel_x, coin_vel_x)
+
+    return ball_x, ball_z, bumper_1_x, bumper_2_x, coin_x, coin_vel_x
+
+
+def resolve_sub_ticks(
+    pongs: Sequence[BasePong],
+    remaining_time: float,
+    current_time: float,
+    min_matches: int | None = None,
+    *,
+    on_crash: Callable[[BasePong], None] | None = None,
+) -> int:
+    """
+    Vectorized `BasePong.resolve_sub_ticks` for many matches. Every iteration handles one sub tick of the matches that
+    still have time left. When there are less than `min_matches` of them left (`BATCH_PHYSICS_MIN_MATCHES` by
+    default), they are finished one by one by the scalar engine.
+    The match that raises is passed to `on_crash` inside of the `except` block, and is dropped from the batch, so the
+    other matches are resolved anyway. Without `on_crash`, the exception is raised.
+    Returns the total number of sub ticks of all the matches.
+    """
+    if min_matches is None:
+        min_matches = BATCH_PHYSICS_MIN_MATCHES
+    active = list(pongs)
+    remaining_times = np.full(len(active), remaining_time)
+    sub_ticks = 0
+    while active:
+        if len(active) < min_matches:
+            for pong, pong_remaining_time in zip(active, remaining_times.tolist(), strict=True):
+                try:
+                    sub_ticks += pong.resolve_sub_ticks(pong_remaining_time, current_time)
+                except Exception:  # noqa: PERF203
+                    if on_crash is None:
+                        raise
+                    on_crash(pong)
+            return sub_ticks
+
+        states = []
+        is_healthy = []
+        for pong in active:
+            try:
+                states.append(pong.get_physics_state())
+                is_healthy.append(True)
+            except Exception:  # noqa: PERF203
+                if on_crash is None:
+                    raise
+                on_crash(pong)
+                is_healthy.append(False)
+        if len(states) < len(active):
+            remaining_times = remaining_times[np.array(is_healthy, dtype=bool)]
+            active = [pong for pong, is_pong_healthy in zip(active, is_healthy, strict=True) if is_pong_healthy]
+            continue
+
+        sub_ticks += len(active)
+        state = np.array(states, dtype=np.float64).T
+        collision_times, collisions = _find_next_collisions(state, remaining_times)
+        moved = _move_all_objects(state, collision_times)
+
+        still_active = []
+        moved_states = zip(*(array.tolist() for array in moved), strict=True)
+        for pong, moved_state, collision in zip(active, moved_states, collisions.tolist(), strict=True):
+            try:
+                pong.apply_sub_tick(moved_state, collision, current_time)
+                still_active.append(collision != COLLISION_NONE)
+            except Exception:  # noqa: PERF203
+                if on_crash is None:
+                    raise
+                on_crash(pong)
+                still_active.append(False)
+
+        # matches without collision have moved until the end of the tick
+        still_active = np.array(still_active, dtype=bool)
+        remaining_times = (remaining_times - collision_times)[still_active]
+        active = [pong for pong, is_active in zip(active, still_active.tolist(), strict=True) if is_active]
+        still_remaining = remaining_times > EPSILON
+        remaining_times = remaining_times[still_remaining]
+        active = [pong for pong, is_active in zip(active, still_remaining.tolist(), strict=True) if is_active]
+    return sub_ticks
+
+
+def resolve_next_tick(
+    pongs: Sequence[BasePong],
+    delta_time: float,
+    current_time: float,
+    min_matches: int | None = None,
+    *,
+    on_crash: Callable[[BasePong], None] | None = None,
+) -> int:
+    """
+    Same as calling `resolve_next_tick` on every match, but the physics of all of them are calculated together.
+    The match that raises in any step of the tick is passed to `on_crash` and isn't touched anymore in this tick, see
+    `resolve_sub_ticks`.
+    Returns the total number of sub ticks of all the matches.
+    """
+    crashed_pongs: set[int] = set()
+
+    def on_pong_crash(pong: BasePong):
+        crashed_pongs.add(id(pong))
+        on_crash(pong)
+
+    started_pongs = []
+    for pong in pongs:
+        try:
+            pong.start_tick(delta_time)
+            started_pongs.append(pong)
+        except Exception:  # noqa: PERF203
+            if on_crash is None:
+                raise
+            on_pong_crash(pong)
+    sub_ticks = resolve_sub_ticks(
+        started_pongs,
+        delta_time,
+        current_time,
+        min_matches,
+        on_crash=None if on_crash is None else on_pong_crash,
+    )
+    for pong in started_pongs:
+        if id(pong) in crashed_pongs:
+            continue
+        try:
+            pong.finish_tick(current_time)
+        except Exception:  # noqa: PERF203
+            if on_crash is None:
+                raise
+            on_pong_crash(pong)
+    return sub_ticks
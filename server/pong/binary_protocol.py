@@ -0,0 +1,275 @@
+"""
+Binary version of the `state_updated` event of the game websocket.
+The client opts in by requesting the `BINARY_STATE_SUBPROTOCOL` websocket subprotocol when it connects. Then, instead of
+JSON, the states of the game are sent as binary frames of little-endian packed and quantized fields. Other events stay
+JSON text frames.
+
+Every frame starts with the header:
+- `kind`:     uint8, `FRAME_KEYFRAME` or `FRAME_DELTA`.
+- `frame_id`: uint32, incremented on every frame of the connection.
+Keyframes are followed by every field of `STATE_FIELDS`.
+Delta frames are followed by:
+- `base_frame_id`: uint32, id of the frame acknowledged by the client, on which this frame is based.
+- `changed_fields`: uint32, bitmask where the bit `i` is set if the field `i` of `STATE_FIELDS` differs from the base.
+- only the fields that changed, in the order of `STATE_FIELDS`.
+The client acknowledges the frames with the `state_ack` action. The server sends a keyframe every second, or when it
+doesn't know any acknowledged frame to base the delta on.
+"""
+
+import functools
+import struct
+from collections.abc import Sequence
+
+from pong.game_protocol import SerializedGameState
+
+BINARY_STATE_SUBPROTOCOL = "pong.binary.v1"
+
+FRAME_KEYFRAME = 1
+FRAME_DELTA = 2
+# one second of the game ticks
+KEYFRAME_INTERVAL = 30
+# how many unacknowledged frames are remembered. Older acknowledgements are ignored
+FRAME_HISTORY_SIZE = KEYFRAME_INTERVAL * 2
+
+# positions, velocities and speed multipliers are sent as integers in thousandths of the unit
+QUANTIZATION_SCALE = 1000
+
+FLAG_IS_SOMEONE_SCORED = 1 << 0
+FLAG_TIME_LIMIT_REACHED = 1 << 1
+FLAG_BUMPER_1_IS_TARGET = 1 << 2
+FLAG_BUMPER_2_IS_TARGET = 1 << 3
+FLAG_HAS_COIN = 1 << 4
+
+# name and struct format of the fields of the binary state, in the order in which they are packed
+STATE_FIELDS = (
+    ("bumper_1.x", "i"),
+    ("bumper_1.z", "i"),
+    ("bumper_1.score", "B"),
+    ("bumper_1.move_id", "i"),
+    ("bumper_1.timestamp", "d"),
+    ("bumper_2.x", "i"),
+    ("bumper_2.z", "i"),
+    ("bumper_2.score", "B"),
+    ("bumper_2.move_id", "i"),
+    ("bumper_2.timestamp", "d"),
+    ("ball.x", "i"),
+    ("ball.z", "i"),
+    ("ball.velocity.x", "i"),
+    ("ball.velocity.z", "i"),
+    ("ball.temporal_speed.x", "i"),
+    ("ball.temporal_speed.z", "i"),
+    ("coin.x", "i"),
+    ("coin.z", "i"),
+    ("current_buff_or_debuff", "B"),
+    ("current_buff_or_debuff_remaining_time", "I"),
+    ("elapsed_seconds", "H"),
+    ("flags", "B"),
+)
+
+_HEADER = struct.Struct("<BI")
+_DELTA_HEADER = struct.Struct("<II")
+_KEYFRAME_BODY = struct.Struct("<" + "".join(fmt for _, fmt in STATE_FIELDS))
+
+
+@functools.lru_cache(maxsize=1024)
+def _delta_body(changed_fields: int) -> struct.Struct:
+    """Struct of the fields of the delta frame. The same few combinations of fields are changed most of the time."""
+    return struct.Struct("<" + "".join(fmt for i, (_, fmt) in enumerate(STATE_FIELDS) if changed_fields & (1 << i)))
+
+
+def _quantize(value: float) -> int:
+    return round(value * QUANTIZATION_SCALE)
+
+
+def _dequantize(value: int) -> float:
+    return value / QUANTIZATION_SCALE
+
+
+def quantize_state(state: SerializedGameState) -> tuple:
+    """Converts the state of the game into the tuple of values of `STATE_FIELDS`."""
+    bumper_1, bumper_2, ball, coin = state["bumper_1"], state["bumper_2"], state["ball"], state["coin"]
+    flags = (
+        (FLAG_IS_SOMEONE_SCORED if state["is_someone_scored"] else 0)
+        | (FLAG_TIME_LIMIT_REACHED if state["time_limit_reached"] else 0)
+        | (FLAG_BUMPER_1_IS_TARGET if bumper_1["buff_or_debuff_target"] else 0)
+        | (FLAG_BUMPER_2_IS_TARGET if bumper_2["buff_or_debuff_target"] else 0)
+        | (FLAG_HAS_COIN if coin else 0)
+    )
+    return (
+        _quantize(bumper_1["x"]),
+        _quantize(bumper_1["z"]),
+        bumper_1["score"],
+        bumper_1["move_id"],
+        float(bumper_1["timestamp"]),
+        _quantize(bumper_2["x"]),
+        _quantize(bumper_2["z"]),
+        bumper_2["score"],
+        bumper_2["move_id"],
+        float(bumper_2["timestamp"]),
+        _quantize(ball["x"]),
+        _quantize(ball["z"]),
+        _quantize(ball["velocity"]["x"]),
+        _quantize(ball["velocity"]["z"]),
+        _quantize(ball["temporal_speed"]["x"]),
+        _quantize(ball["temporal_speed"]["z"]),
+        _quantize(coin["x"]) if coin else 0,
+        _quantize(coin["z"]) if coin else 0,
+        int(state["current_buff_or_debuff"]),
+        max(round(state["current_buff_or_debuff_remaining_time"]), 0),
+        state["elapsed_seconds"],
+        flags,
+    )
+
+
+def dequantize_state(fields: Sequence) -> SerializedGameState:
+    """Converts the tuple of values of `STATE_FIELDS` back into the state of the game."""
+    (
+        bumper_1_x,
+        bumper_1_z,
+        bumper_1_score,
+        bumper_1_move_id,
+        bumper_1_timestamp,
+        bumper_2_x,
+        bumper_2_z,
+        bumper_2_score,
+        bumper_2_move_id,
+        bumper_2_timestamp,
+        ball_x,
+        ball_z,
+        ball_velocity_x,
+        ball_velocity_z,
+        ball_temporal_speed_x,
+        ball_temporal_speed_z,
+        coin_x,
+        coin_z,
+        current_buff_or_debuff,
+        current_buff_or_debuff_remaining_time,
+        elapsed_seconds,
+        flags,
+    ) = fields
+    return {
+        "bumper_1": {
+            "x": _dequantize(bumper_1_x),
+            "z": _dequantize(bumper_1_z),
+            "score": bumper_1_score,
+            "buff_or_debuff_target": bool(flags & FLAG_BUMPER_1_IS_TARGET),
+            "move_id": bumper_1_move_id,
+            "timestamp": int(bumper_1_timestamp),
+        },
+        "bumper_2": {
+            "x": _dequantize(bumper_2_x),
+            "z": _dequantize(bumper_2_z),
+            "score": bumper_2_score,
+            "buff_or_debuff_target": bool(flags & FLAG_BUMPER_2_IS_TARGET),
+            "move_id": bumper_2_move_id,
+            "timestamp": int(bumper_2_timestamp),
+        },
+        "ball": {
+            "x": _dequantize(ball_x),
+            "z": _dequantize(ball_z),
+            "velocity": {"x": _dequantize(ball_velocity_x), "z": _dequantize(ball_velocity_z)},
+            "temporal_speed": {"x": _dequantize(ball_temporal_speed_x), "z": _dequantize(ball_temporal_speed_z)},
+        },
+        "coin": {"x": _dequantize(coin_x), "z": _dequantize(coin_z)} if flags & FLAG_HAS_COIN else None,
+        "is_someone_scored": bool(flags & FLAG_IS_SOMEONE_SCORED),
+        "current_buff_or_debuff": current_buff_or_debuff,
+        "current_buff_or_debuff_remaining_time": float(current_buff_or_debuff_remaining_time),
+        "elapsed_seconds": elapsed_seconds,
+        "time_limit_reached": bool(flags & FLAG_TIME_LIMIT_REACHED),
+    }
+
+
+def pack_state(state: SerializedGameState) -> bytes:
+    """Quantized state as the body of the keyframe. Used to pass the state around without serializing it again."""
+    return _KEYFRAME_BODY.pack(*quantize_state(state))
+
+
+def unpack_state(packed_state: bytes) -> tuple:
+    return _KEYFRAME_BODY.unpack(packed_state)
+
+
+class StateEncoder:
+    """
+    Encodes the states of the game for one client connection.
+    Remembers the recently sent frames to encode the new ones as deltas from the latest frame acknowledged by client.
+    """
+
+    def __init__(self):
+        self._frame_id = 0
+        self._last_keyframe_id = 0
+        self._acknowledged_frame_id: int | None = None
+        self._sent_frames: dict[int, tuple] = {}
+
+    def acknowledge(self, frame_id: int) -> None:
+        """Client received the frame. Older frames will never be used as a base again."""
+        if frame_id not in self._sent_frames or (
+            self._acknowledged_frame_id is not None and frame_id <= self._acknowledged_frame_id
+        ):
+            return
+        self._acknowledged_frame_id = frame_id
+        for old_frame_id in [old_frame_id for old_frame_id in self._sent_frames if old_frame_id < frame_id]:
+            del self._sent_frames[old_frame_id]
+
+    def encode(self, state: SerializedGameState) -> bytes:
+        return self.encode_fields(quantize_state(state))
+
+    def encode_packed(self, packed_state: bytes) -> bytes:
+        """Encodes the state produced by `pack_state`."""
+        return self.encode_fields(unpack_state(packed_state))
+
+    def encode_fields(self, fields: tuple) -> bytes:
+        """Encodes already quantized state."""
+        self._frame_id += 1
+        frame_id = self._frame_id
+        self._sent_frames[frame_id] = fields
+        if len(self._sent_frames) > FRAME_HISTORY_SIZE:
+            del self._sent_frames[next(iter(self._sent_frames))]
+
+        base = self._sent_frames.get(self._acknowledged_frame_id)
+        if base is None or frame_id - self._last_keyframe_id >= KEYFRAME_INTERVAL:
+            self._last_keyframe_id = frame_id
+            return _HEADER.pack(FRAME_KEYFRAME, frame_id) + _KEYFRAME_BODY.pack(*fields)
+
+        changed_fields = 0
+        changed_values = []
+        for i, (value, base_value) in enumerate(zip(fields, base, strict=True)):
+            if value != base_value:
+                changed_fields |= 1 << i
+                changed_values.append(value)
+        return (
+            _HEADER.pack(FRAME_DELTA, frame_id)
+            + _DELTA_HEADER.pack(self._acknowledged_frame_id, changed_fields)
+            + _delta_body(changed_fields).pack(*changed_values)
+        )
+
+
+class StateDecoder:
+    """
+    Decodes the frames produced by `StateEncoder`. Reference implementation of the client side of the protocol.
+    Remembers received frames, because delta frames may be based on any of the frames acknowledged by the client.
+    """
+
+    def __init__(self):
+        self._received_frames: dict[int, tuple] = {}
+
+    def decode(self, data: bytes) -> tuple[int, SerializedGameState] | None:
+        """Returns id of the frame and the state, or `None` if the base of the delta frame is unknown."""
+        kind, frame_id = _HEADER.unpack_from(data)
+        if kind == FRAME_KEYFRAME:
+            fields = _KEYFRAME_BODY.unpack_from(data, _HEADER.size)
+        else:
+            base_frame_id, changed_fields = _DELTA_HEADER.unpack_from(data, _HEADER.size)
+            base = self._received_frames.get(base_frame_id)
+            if base is None:
+                return None
+            changed_values = iter(_delta_body(changed_fields).unpack_from(data, _HEADER.size + _DELTA_HEADER.size))
+            fields = tuple(
+                next(changed_values) if changed_fields & (1 << i) else base_value for i, base_value in enumerate(base)
+            )
+            # server never goes back to the frames older than the base
+            for old_frame_id in [frame for frame in self._received_frames if frame < base_frame_id]:
+                del self._received_frames[old_frame_id]
+        self._received_frames[frame_id] = fields
+        if len(self._received_frames) > FRAME_HISTORY_SIZE:
+            del self._received_frames[next(iter(self._received_frames))]
+        return frame_id, dequantize_state(fields)
@@ -1,5 +1,10 @@
+from .game_spectator import GameSpectatorConsumer
 from .game_worker import GameWorkerConsumer
 from .game_ws_server import GameServerConsumer
 from .matchmaking import MatchmakingConsumer
+from .matchmaking_worker import MatchmakingWorkerConsumer
 
-__all__ = ["GameWorkerConsumer", "GameServerConsumer", "MatchmakingConsumer"]
+__all__ = [
+    "GameSpectatorConsumer", "GameWorkerConsumer", "GameServerConsumer", "MatchmakingConsumer",
+    "MatchmakingWorkerConsumer",
+]
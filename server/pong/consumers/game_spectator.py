@@ -0,0 +1,110 @@
+import json
+import logging
+from typing import TYPE_CHECKING
+
+from channels.db import database_sync_to_async
+
+from common.close_codes import CloseCodes
+from common.guarded_websocket_consumer import AsyncGuardedWebsocketConsumer
+from pong import local_tick_transport
+from pong.game_protocol import GameServerToClient, GameServerToGameWorker
+from pong.game_worker_shards import get_game_worker_channel_name
+from pong.models import GameRoom
+
+if TYPE_CHECKING:
+    from users.models import User
+
+logger = logging.getLogger("server")
+
+
+class GameSpectatorConsumer(AsyncGuardedWebsocketConsumer):
+    """
+    Read-only connection to the ongoing match, including the games of the tournaments.
+    Spectators don't cost the game worker anything per tick: the worker sends the state of the match once for all of
+    them, in the `game_room_{id}_spectators` group or once per websocket server process through the local transport,
+    and only every `SPECTATOR_STATE_INTERVAL_TICKS` tick. The state is serialized by the worker, so the consumer
+    sends the same text to every spectator as it is.
+    """
+
+    async def connect(self):
+        self.user: None | User = self.scope.get("user")
+        self.game_room_id: str = self.scope["url_route"]["kwargs"]["game_room_id"]
+        self.spectators_group_name = f"game_room_{self.game_room_id}_spectators"
+        self.game_worker_channel_name = get_game_worker_channel_name(self.game_room_id)
+        self.has_joined = False
+        await self.accept()
+        if not self.user:
+            logger.warning(
+                "[GameSpectator.connect]: unauthorized user tried to watch game room {%s}",
+                self.game_room_id,
+            )
+            await self.close(CloseCodes.ILLEGAL_CONNECTION)
+            return
+
+        if not await self._is_game_room_ongoing():
+            logger.warning(
+                "[GameSpectator.connect]: user {%s} tried to watch non-existant or finished game room {%s}",
+                self.user.profile,
+                self.game_room_id,
+            )
+            await self.close(CloseCodes.ILLEGAL_CONNECTION)
+            return
+
+        self.has_joined = True
+        await self.channel_layer.group_add(self.spectators_group_name, self.channel_name)
+        await self.channel_layer.send(
+            self.game_worker_channel_name,
+            GameServerToGameWorker.SpectatorJoined(
+                type="spectator_joined",
+                game_room_id=self.game_room_id,
+                channel_name=self.channel_name,
+                tick_socket_path=await local_tick_transport.register_consumer(
+                    local_tick_transport.get_spectators_key(self.game_room_id),
+                    self,
+                ),
+            ),
+        )
+        logger.info("[GameSpectator.connect]: user {%s} watches game room {%s}", self.user.profile, self.game_room_id)
+
+    @database_sync_to_async
+    def _is_game_room_ongoing(self) -> bool:
+        return GameRoom.objects.for_id(self.game_room_id).for_ongoing_status().exists()
+
+    async def disconnect(self, close_code):
+        if not self.has_joined:
+            return
+
+        await self.channel_layer.group_discard(self.spectators_group_name, self.channel_name)
+        local_tick_transport.unregister_consumer(local_tick_transport.get_spectators_key(self.game_room_id), self)
+        await self.channel_layer.send(
+            self.game_worker_channel_name,
+            GameServerToGameWorker.SpectatorLeft(
+                type="spectator_left",
+                game_room_id=self.game_room_id,
+                channel_name=self.channel_name,
+            ),
+        )
+        logger.info("[GameSpectator.disconnect]: user {%s} left game room {%s}", self.user.profile, self.game_room_id)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """Spectators can't send anything to the match."""
+        await self.close(CloseCodes.BAD_DATA)
+        logger.warning(
+            "[GameSpectator.receive]: spectator {%s} sent data to the game room {%s}",
+            self.user.profile,
+            self.game_room_id,
+        )
+
+    ##############################
+    # GAME WORKER EVENT HANDLERS #
+    ##############################
+    # See `GameServerConsumer`.
+    async def worker_to_client_close(self, event: GameServerToClient.WorkerToClientClose):
+        await self.send(text_data=json.dumps({k: v for k, v in event.items() if k != "type"}))
+        await self.close(event["close_code"])
+
+    async def worker_to_client_open(self, event: GameServerToClient.WorkerToClientOpen):
+        await self.send(text_data=json.dumps({k: v for k, v in event.items() if k != "type"}))
+
+    async def worker_to_client_state(self, event: GameServerToClient.WorkerToClientState):
+        await self.send(text_data=event["text"])
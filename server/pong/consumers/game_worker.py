@@ -1,10 +1,12 @@
 import asyncio
-import contextlib
+import json
 import logging
 import math
 import random
+import time
 import traceback
-from collections import deque
+import zlib
+from collections import Counter, defaultdict, deque
 from dataclasses import dataclass, field
 from enum import Enum, IntEnum, auto
 from typing import Literal
@@ -12,16 +14,35 @@ from typing import Literal
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncConsumer
 from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
 
 from common.close_codes import CloseCodes
+from pong.binary_protocol import pack_state
 from pong.game_protocol import (
     ClientToGameServer,
     GameRoomSettings,
     GameServerToClient,
     GameServerToGameWorker,
+    GameWorkerControl,
     SerializedGameState,
 )
+from pong.game_worker_load import GameWorkerLoad
+from pong.game_worker_metrics import GameWorkerMetrics, PlayerNetworkStats
+from pong.game_worker_shards import get_game_worker_ring
+from pong.local_tick_transport import LocalTickClient, get_spectators_key
+from pong.match_results import BracketResult, FinishedGameRoom, MatchResult, MatchResultWriter, get_spool_path
+from pong.match_snapshots import (
+    SNAPSHOT_MAX_AGE,
+    BumperSnapshot,
+    EngineSnapshot,
+    MatchSnapshot,
+    MatchSnapshotStore,
+    PlayerSnapshot,
+)
 from pong.models import GameRoom, Match
+from pong.replays import ReplayRecorder
+from pong.timer_wheel import Timer, TimerWheel
 from tournaments.models import Bracket
 
 logger = logging.getLogger("server")
@@ -30,6 +51,22 @@ logging.getLogger("asyncio").setLevel(logging.WARNING)
 # FRAME RATE
 GAME_TICKS_PER_SECOND = 30
 GAME_TICK_INTERVAL = 1.0 / GAME_TICKS_PER_SECOND
+# spectators receive the state of the match 10 times a second
+SPECTATOR_STATE_INTERVAL_TICKS = 3
+# players and spectators receive the round trip times and the jitter of the players every 2 seconds
+NETWORK_STATS_INTERVAL_TICKS = GAME_TICKS_PER_SECOND * 2
+# LAG COMPENSATION
+# latency the game stays responsive to: the moves that came late are caught up, and the misses of the ball that the
+# player saw as hits are forgiven, but only within this window
+LAG_COMPENSATION_MAX = 0.15
+MAX_CATCH_UP_MOVES = int(LAG_COMPENSATION_MAX / GAME_TICK_INTERVAL)
+# weight of the last input in the smoothed latency of the player
+INPUT_LATENCY_SMOOTHING = 0.1
+# latency of the input above this is the wrong clock of the client rather than its network
+INPUT_LATENCY_SAMPLE_CAP = 1.0
+# weights of the last round trip time in the smoothed round trip time and in its jitter, the same as TCP does
+RTT_SMOOTHING = 1 / 8
+RTT_JITTER_SMOOTHING = 1 / 4
 
 # GEOMETRIC CONSTANTS
 WALL_LEFT_X = 10.0
@@ -55,6 +92,9 @@ PLAYERS_REQUIRED = 2
 
 # tolerance level for floating point caclulations
 EPSILON = 1e-6
+# x of the center of the ball when it touches the left or the right wall
+BALL_LEFT_WALL_X = WALL_RIGHT_X + WALL_WIDTH_HALF + BALL_RADIUS
+BALL_RIGHT_WALL_X = WALL_LEFT_X - WALL_WIDTH_HALF - BALL_RADIUS
 
 # SPEED VALUES IN UNITS PER SECOND (original working values)
 BUMPER_SPEED_PER_SECOND = 15.0
@@ -83,6 +123,9 @@ SHORTEN_ENEMY_DURATION = 5
 ELONGATE_PLAYER_DURATION = 5
 ENLARGE_PLAYER_DURATION = 15
 COIN_SPAWN_TIME = 30
+# game room that was handed over to another worker or refused is forgotten after this, when its match has surely
+# finished: it's longer than waiting for the players, the longest time limit and the reconnections of both players
+HANDED_OFF_GAME_ROOM_TTL = 15 * 60
 ###################
 
 
@@ -125,6 +168,17 @@ class CollisionType(Enum):
     SCORE = auto()
 
 
+# codes of the collisions, see `BasePong._collisions_by_code`
+# the same order of checks as in `BasePong._find_next_collision`: later checks win when collision times are equal
+COLLISION_NONE = 0
+COLLISION_WALL = 1
+COLLISION_BUMPER_1 = 2
+COLLISION_BUMPER_2 = 3
+COLLISION_COIN = 4
+COLLISION_SCORE_BUMPER_1 = 5
+COLLISION_SCORE_BUMPER_2 = 6
+
+
 class PlayerConnectionState(Enum):
     NOT_CONNECTED = auto()
     CONNECTED = auto()
@@ -144,6 +198,11 @@ class Vector2:
 
 @dataclass(slots=True)
 class Bumper(Vector2):
+    """
+    Size of the bumper changes only with the buffs, so its geometry is calculated by `resize` instead of on every sub
+    tick. Bumpers never move along the z axis. Always change the size with `resize`, so the geometry is kept in sync.
+    """
+
     dir_z: int
     width_half: float = 0.5
     lenght_half: float = 2.5
@@ -152,31 +211,94 @@ class Bumper(Vector2):
     control_reversed: bool = False
     moves_left: bool = False
     moves_right: bool = False
+    # moves that came late and are caught up during this tick, the bumper moves faster by `catch_up_factor`
+    catch_up_moves: int = 0
+    catch_up_factor: float = 1.0
+    # misses of the ball within this many seconds after it passed the bumper are forgiven, see `_is_saved_by_lag`
+    lag_compensation: float = 0.0
+    # z of the center of the ball when it touches the bottom or the top side of the bumper
+    collision_bottom: float = field(init=False, default=0.0)
+    collision_top: float = field(init=False, default=0.0)
+    # bumper can't go further than these x because of the walls
+    left_limit: float = field(init=False, default=0.0)
+    right_limit: float = field(init=False, default=0.0)
+
+    def __post_init__(self):
+        self.resize(self.lenght_half, self.width_half)
+
+    def resize(self, lenght_half: float, width_half: float):
+        self.lenght_half = lenght_half
+        self.width_half = width_half
+        self.collision_bottom = self.z - width_half - BALL_RADIUS
+        self.collision_top = self.z + width_half + BALL_RADIUS
+        self.left_limit = WALL_LEFT_X - WALL_WIDTH_HALF - lenght_half
+        self.right_limit = WALL_RIGHT_X + WALL_WIDTH_HALF + lenght_half
+
+
+@dataclass(slots=True)
+class QueuedMoves:
+    """
+    Consecutive moves of the player in the same direction that wait to be processed, as one entry of the queue: a single
+    input, or the whole batch. The moves are taken one by one, each with its own `move_id`, and the timestamps of the
+    moves in the middle of the batch are spread evenly between the first and the last one.
+    """
+
+    action: str
+    first_move_id: int
+    last_move_id: int
+    first_timestamp: int
+    last_timestamp: int
+    # moves that are left to take, fewer than in the batch if the queue was almost full
+    remaining: int
+    taken: int = 0
+
+    def take(self, number_of_moves: int, last_processed_move: ClientToGameServer.PlayerInput):
+        """Takes the next `number_of_moves` moves, and records the last one of them as processed."""
+        self.taken += number_of_moves
+        self.remaining -= number_of_moves
+        index = self.taken - 1
+        last_index = max(self.last_move_id - self.first_move_id, 1)
+        last_processed_move["action"] = self.action
+        last_processed_move["move_id"] = self.first_move_id + index
+        last_processed_move["timestamp"] = (
+            self.first_timestamp + (self.last_timestamp - self.first_timestamp) * index // last_index
+        )
 
 
 @dataclass
 class Player:
     bumper: Bumper
-    moves_queue: deque[ClientToGameServer.PlayerInput] = field(default_factory=deque)
+    moves_queue: deque[QueuedMoves] = field(default_factory=deque)
+    # number of the moves in all entries of `moves_queue`
+    queued_moves: int = 0
     last_processed_move: ClientToGameServer.PlayerInput = field(
         default_factory=lambda: {"timestamp": -1, "move_id": -1},
     )
     id: str = ""
     connection: PlayerConnectionState = PlayerConnectionState.NOT_CONNECTED
     connection_stamp: float = 0.0
-    reconnection_time: int = 30
-    reconnection_timer: asyncio.Task | None = None
+    # seconds the player has left to reconnect, the timer is running while the player is disconnected
+    reconnection_time: float = 30
+    reconnection_timer: Timer | None = None
     profile_id: int = -1
     name: str = ""
     opponents_name: str = ""
     avatar: str = ""
     elo: int = 0
-
-    def stop_waiting_for_reconnection_timer(self):
-        task = self.reconnection_timer
-        if task and not task.cancelled():
-            task.cancel()
-        self.reconnection_timer = None
+    # socket of the websocket server process of the player, if the states can be sent bypassing the channel layer
+    tick_socket_path: str | None = None
+    # smoothed one-way latency of the inputs in seconds
+    latency: float = 0.0
+    # smoothed round trip time to the client and its jitter in seconds, measured by the pings of the websocket server
+    rtt: float = 0.0
+    rtt_jitter: float = 0.0
+    # moves that can be processed without speeding up the bumper over its usual rate, see `_drain_inputs`
+    move_credit: int = 0
+
+    def get_remaining_reconnection_time(self, current_time: float) -> float:
+        if self.reconnection_timer is None:
+            return self.reconnection_time
+        return self.reconnection_timer.get_remaining_time(current_time)
 
     def as_dict(self):
         return {
@@ -192,6 +314,38 @@ class Player:
         self.connection_stamp = connection_timestamp
         return self
 
+    def record_input_latency(self, timestamp: int):
+        """
+        `timestamp` of the input is `Date.now()` of the client in milliseconds, so the latency is as correct as the
+        clock of the client is. The damage of the wrong clock is limited by `LAG_COMPENSATION_MAX` anyway.
+        """
+        sample = min(max(time.time() - timestamp / 1000, 0.0), INPUT_LATENCY_SAMPLE_CAP)
+        self.latency += (sample - self.latency) * INPUT_LATENCY_SMOOTHING
+        self._update_lag_compensation()
+
+    def record_rtt(self, rtt: float):
+        """
+        Round trip time doesn't depend on the clock of the client, so once it's measured, half of it is the latency
+        that the lag of the player is compensated by.
+        """
+        if not self.rtt:
+            self.rtt = rtt
+            self.rtt_jitter = rtt / 2
+        else:
+            self.rtt_jitter += (abs(rtt - self.rtt) - self.rtt_jitter) * RTT_JITTER_SMOOTHING
+            self.rtt += (rtt - self.rtt) * RTT_SMOOTHING
+        self._update_lag_compensation()
+
+    def get_network_stats(self) -> PlayerNetworkStats | dict:
+        if not self.rtt:
+            return {}
+        return PlayerNetworkStats(rtt_ms=round(self.rtt * 1000, 1), jitter_ms=round(self.rtt_jitter * 1000, 1))
+
+    def _update_lag_compensation(self):
+        """Lag compensation of the bumper is in whole milliseconds, so it's recorded in the replay exactly."""
+        latency = self.rtt / 2 if self.rtt else self.latency
+        self.bumper.lag_compensation = round(min(latency, LAG_COMPENSATION_MAX) * 1000) / 1000
+
 
 @dataclass(slots=True)
 class Coin(Vector2):
@@ -224,10 +378,20 @@ class BasePong:
     _active_buff_or_debuff_start_time: float  # in seconds
     _active_buff_or_debuff_target: Bumper | None
     _serialized_state: SerializedGameState
+    _rng: random.Random
+    _collisions_by_code: tuple
 
-    def __init__(self, cool_mode: bool, game_speed: Literal[0.75, 1.0, 1.25], start_time: float):
+    def __init__(
+        self,
+        cool_mode: bool,
+        game_speed: Literal[0.75, 1.0, 1.25],
+        start_time: float,
+        rng: random.Random | None = None,
+    ):
+        """`rng` is the source of randomness of the match. Can be seeded to make the match reproducible."""
         self.start_time = start_time
         self._game_speed = game_speed
+        self._rng = rng if rng is not None else random.Random()  # noqa: S311
         if cool_mode:
             self._coin = Coin(
                 *STARTING_COIN_POS,
@@ -284,6 +448,16 @@ class BasePong:
             Vector2(*STARTING_BALL_VELOCITY),
             Vector2(*TEMPORAL_SPEED_DEFAULT),
         )
+        # preallocated collisions, indexed by the `COLLISION_*` codes
+        self._collisions_by_code = (
+            None,
+            (CollisionType.WALL, None),
+            (CollisionType.BUMPER, self._bumper_1),
+            (CollisionType.BUMPER, self._bumper_2),
+            (CollisionType.COIN, None),
+            (CollisionType.SCORE, self._bumper_1),
+            (CollisionType.SCORE, self._bumper_2),
+        )
 
     # tuple of:
     # - type of entity with which ball collided
@@ -294,19 +468,33 @@ class BasePong:
     CollisionInfoCoin = tuple[CollisionType.COIN, None]
     CollisionInfo = CollisionInfoWall | CollisionInfoBumper | CollisionInfoScore | CollisionInfoCoin
 
-    def resolve_next_tick(self, delta_time: float, current_time: float):
+    def resolve_next_tick(self, delta_time: float, current_time: float) -> int:
         """
         Calculates movement and collisions for the next tick.
         Uses continuous collision detection for exact collision times.
+        Returns the number of sub ticks it took.
         """
+        self.start_tick(delta_time)
+        sub_ticks = self.resolve_sub_ticks(delta_time, current_time)
+        self.finish_tick(current_time)
+        return sub_ticks
+
+    def start_tick(self, delta_time: float):
+        """First step of `resolve_next_tick`: prepares the state before any movement happens."""
         self._is_someone_scored = False
 
         decay_amount = TEMPORAL_SPEED_DECAY * delta_time
         self._ball.temporal_speed.x = max(TEMPORAL_SPEED_DEFAULT[0], self._ball.temporal_speed.x - decay_amount)
         self._ball.temporal_speed.z = max(TEMPORAL_SPEED_DEFAULT[1], self._ball.temporal_speed.z - decay_amount)
 
-        remaining_time = delta_time
+    def resolve_sub_ticks(self, remaining_time: float, current_time: float) -> int:
+        """
+        Second step of `resolve_next_tick`: moves objects and handles collisions during `remaining_time`.
+        Returns the number of sub ticks.
+        """
+        sub_ticks = 0
         while remaining_time > EPSILON:
+            sub_ticks += 1
             collision_time, collision_info = self._find_next_collision(remaining_time)
 
             if collision_info is None:
@@ -323,10 +511,54 @@ class BasePong:
             self._move_all_objects(collision_time)
             self._handle_collision(collision_info, current_time)
             remaining_time -= collision_time
+        return sub_ticks
 
-        # Handle coin spawning and buff expiration after all movement/collisions
+    def finish_tick(self, current_time: float):
+        """Last step of `resolve_next_tick`: handles coin spawning and buff expiration after all movement/collisions."""
+        self._compensate_lag()
         self._update_coin_and_buffs(current_time)
 
+    def get_physics_state(self) -> tuple:
+        """
+        State needed to find the next collision and to move the objects, as a flat tuple of floats, in the order of
+        `pong.batch_pong.PHYSICS_STATE_FIELDS`. Used by the batch engine that resolves many matches at once.
+        """
+        coin_on_screen = self._coin is not None and self._is_coin_on_screen()
+        return (
+            self._ball.x,
+            self._ball.z,
+            self._ball.velocity.x * self._ball.temporal_speed.x * self._game_speed,
+            self._ball.velocity.z * self._ball.temporal_speed.z * self._game_speed,
+            self._bumper_1.x,
+            self._bumper_1.z,
+            float(self._get_bumper_velocity_x(self._bumper_1)),
+            self._bumper_1.lenght_half,
+            self._bumper_1.width_half,
+            self._bumper_2.x,
+            self._bumper_2.z,
+            float(self._get_bumper_velocity_x(self._bumper_2)),
+            self._bumper_2.lenght_half,
+            self._bumper_2.width_half,
+            coin_on_screen,
+            self._coin.x if coin_on_screen else HIDDEN_COIN_SPOT,
+            self._coin.z if coin_on_screen else 0.0,
+            self._coin.velocity.x if coin_on_screen else 0.0,
+        )
+
+    def apply_sub_tick(self, moved_state: tuple, collision: int, current_time: float):
+        """
+        Counterpart of `get_physics_state`: stores positions moved by the batch engine and handles the collision that
+        happened at the end of the sub tick. `moved_state` is the ball x and z, the bumper 1 x, the bumper 2 x, the coin
+        x and its velocity along x. `collision` is one of the `COLLISION_*` codes.
+        """
+        self._ball.x, self._ball.z, self._bumper_1.x, self._bumper_2.x, coin_x, coin_velocity_x = moved_state
+        if self._coin and self._is_coin_on_screen():
+            self._coin.x = coin_x
+            self._coin.velocity.x = coin_velocity_x
+
+        if collision:
+            self._handle_collision(self._collisions_by_code[collision], current_time)
+
     def set_ball_to_max_speed(self) -> None:
         current_speed = (self._ball.velocity.x**2 + self._ball.velocity.z**2) ** 0.5
         speed_multiplier = BALL_VELOCITY_CAP_PER_SECOND / current_speed
@@ -338,78 +570,69 @@ class BasePong:
         """
         Find the earliest collision within max_time using analytical collision detection.
         Returns (collision_time, collision_info) or (max_time, None) if no collision.
+        It runs on every sub tick of every match, so it doesn't allocate: collision infos are preallocated, geometry of
+        the bumpers is cached by `Bumper.resize`, and the debug messages are formatted only when they are enabled.
         """
+        is_debug = logger.isEnabledFor(logging.DEBUG)
+        ball = self._ball
+        ball_x = ball.x
+        ball_z = ball.z
         earliest_time = max_time
-        collision_info = None
+        collision = COLLISION_NONE
 
-        ball_vel_x = self._ball.velocity.x * self._ball.temporal_speed.x * self._game_speed
-        ball_vel_z = self._ball.velocity.z * self._ball.temporal_speed.z * self._game_speed
+        ball_vel_x = ball.velocity.x * ball.temporal_speed.x * self._game_speed
+        ball_vel_z = ball.velocity.z * ball.temporal_speed.z * self._game_speed
 
         # ball vs left wall
         if ball_vel_x < 0:
-            wall_x = WALL_RIGHT_X + WALL_WIDTH_HALF
-            t = (wall_x + BALL_RADIUS - self._ball.x) / ball_vel_x
+            t = (BALL_LEFT_WALL_X - ball_x) / ball_vel_x
             if -EPSILON <= t <= earliest_time:
-                logger.debug(
-                    "COLLISION: left wall - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f",
-                    t,
-                    earliest_time,
-                    self._ball.x,
-                    self._ball.z,
-                )
+                if is_debug:
+                    logger.debug(
+                        "COLLISION: left wall - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f",
+                        t,
+                        earliest_time,
+                        ball_x,
+                        ball_z,
+                    )
                 earliest_time = t
-                collision_info = (CollisionType.WALL, None)
+                collision = COLLISION_WALL
 
         # ball vs right wall
         elif ball_vel_x > 0:
-            wall_x = WALL_LEFT_X - WALL_WIDTH_HALF
-            t = (wall_x - BALL_RADIUS - self._ball.x) / ball_vel_x
+            t = (BALL_RIGHT_WALL_X - ball_x) / ball_vel_x
             if -EPSILON <= t <= earliest_time:
-                logger.debug(
-                    "COLLISION: right wall - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f",
-                    t,
-                    earliest_time,
-                    self._ball.x,
-                    self._ball.z,
-                )
+                if is_debug:
+                    logger.debug(
+                        "COLLISION: right wall - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f",
+                        t,
+                        earliest_time,
+                        ball_x,
+                        ball_z,
+                    )
                 earliest_time = t
-                collision_info = (CollisionType.WALL, None)
+                collision = COLLISION_WALL
 
         # ball vs bumpers
-        for bumper, name in [(self._bumper_1, "bumper_1"), (self._bumper_2, "bumper_2")]:
-            bumper_vel_x = self._get_bumper_velocity_x(bumper)
-
-            t = self._calculate_moving_rectangle_collision_time(
-                self._ball.x,
-                self._ball.z,
-                ball_vel_x,
-                ball_vel_z,
-                bumper.x,
-                bumper.z,
-                bumper_vel_x,
-                0,
-                bumper.lenght_half,
-                bumper.width_half,
-            )
-            if -EPSILON <= t <= earliest_time:
-                logger.debug(
-                    "COLLISION: %s - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f, bumper.x=%f, bumper_vel=%f",
-                    name,
-                    t,
-                    earliest_time,
-                    self._ball.x,
-                    self._ball.z,
-                    bumper.x,
-                    bumper_vel_x,
-                )
-                earliest_time = t
-                collision_info = (CollisionType.BUMPER, bumper)
+        t = self._calculate_bumper_collision_time(ball_x, ball_z, ball_vel_x, ball_vel_z, self._bumper_1)
+        if -EPSILON <= t <= earliest_time:
+            if is_debug:
+                self._log_bumper_collision("bumper_1", self._bumper_1, t, earliest_time)
+            earliest_time = t
+            collision = COLLISION_BUMPER_1
+
+        t = self._calculate_bumper_collision_time(ball_x, ball_z, ball_vel_x, ball_vel_z, self._bumper_2)
+        if -EPSILON <= t <= earliest_time:
+            if is_debug:
+                self._log_bumper_collision("bumper_2", self._bumper_2, t, earliest_time)
+            earliest_time = t
+            collision = COLLISION_BUMPER_2
 
         # ball vs coin (moving object)
         if self._coin and self._is_coin_on_screen():
             t = self._calculate_moving_rectangle_collision_time(
-                self._ball.x,
-                self._ball.z,
+                ball_x,
+                ball_z,
                 ball_vel_x,
                 ball_vel_z,
                 self._coin.x,
@@ -420,48 +643,63 @@ class BasePong:
                 COIN_WIDTH_HALF,
             )
             if -EPSILON <= t <= earliest_time:
-                logger.debug(
-                    "COLLISION: coin - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f",
-                    t,
-                    earliest_time,
-                    self._ball.x,
-                    self._ball.z,
-                )
+                if is_debug:
+                    logger.debug(
+                        "COLLISION: coin - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f",
+                        t,
+                        earliest_time,
+                        ball_x,
+                        ball_z,
+                    )
                 earliest_time = t
-                collision_info = (CollisionType.COIN, None)
+                collision = COLLISION_COIN
 
         # ball vs scoring zones
         # SCOOOOORE for bumperino uno
         if ball_vel_z > 0:
-            t = (BUMPER_2_BORDER - self._ball.z) / ball_vel_z
+            t = (BUMPER_2_BORDER - ball_z) / ball_vel_z
             if -EPSILON <= t <= earliest_time:
-                logger.debug(
-                    "COLLISION: score! - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f, bumper_2.x=%f",
-                    t,
-                    earliest_time,
-                    self._ball.x,
-                    self._ball.z,
-                    self._bumper_2.x,
-                )
+                if is_debug:
+                    logger.debug(
+                        "COLLISION: score! - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f, bumper_2.x=%f",
+                        t,
+                        earliest_time,
+                        ball_x,
+                        ball_z,
+                        self._bumper_2.x,
+                    )
                 earliest_time = t
-                collision_info = (CollisionType.SCORE, self._bumper_1)
+                collision = COLLISION_SCORE_BUMPER_1
 
         # SCOOOOORE for bumperino dos
         if ball_vel_z < 0:
-            t = (BUMPER_1_BORDER - self._ball.z) / ball_vel_z
+            t = (BUMPER_1_BORDER - ball_z) / ball_vel_z
             if -EPSILON <= t <= earliest_time:
-                logger.debug(
-                    "COLLISION: score! - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f, bumper_1.x=%f",
-                    t,
-                    earliest_time,
-                    self._ball.x,
-                    self._ball.z,
-                    self._bumper_1.x,
-                )
+                if is_debug:
+                    logger.debug(
+                        "COLLISION: score! - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f, bumper_1.x=%f",
+                        t,
+                        earliest_time,
+                        ball_x,
+                        ball_z,
+                        self._bumper_1.x,
+                    )
                 earliest_time = t
-                collision_info = (CollisionType.SCORE, self._bumper_2)
-
-        return earliest_time, collision_info
+                collision = COLLISION_SCORE_BUMPER_2
+
+        return earliest_time, self._collisions_by_code[collision]
+
+    def _log_bumper_collision(self, name: str, bumper: Bumper, t: float, earliest_time: float):
+        logger.debug(
+            "COLLISION: %s - t=%f, earliest_time=%f, ball.x=%f, ball.z=%f, bumper.x=%f, bumper_vel=%f",
+            name,
+            t,
+            earliest_time,
+            self._ball.x,
+            self._ball.z,
+            bumper.x,
+            self._get_bumper_velocity_x(bumper),
+        )
 
     def _get_bumper_velocity_x(self, bumper: Bumper) -> float:
         """Calculate the current velocity of a bumper."""
@@ -470,12 +708,60 @@ class BasePong:
 
         bumper_vel_x = 0
         if (bumper.moves_left and not bumper.control_reversed) or (bumper.moves_right and bumper.control_reversed):
-            bumper_vel_x = bumper.speed
+            bumper_vel_x = bumper.speed * bumper.catch_up_factor
         elif (bumper.moves_right and not bumper.control_reversed) or (bumper.moves_left and bumper.control_reversed):
-            bumper_vel_x = -bumper.speed
+            bumper_vel_x = -bumper.speed * bumper.catch_up_factor
 
         return bumper_vel_x
 
+    def _calculate_bumper_collision_time(
+        self,
+        ball_x: float,
+        ball_z: float,
+        ball_vel_x: float,
+        ball_vel_z: float,
+        bumper: Bumper,
+    ) -> float:
+        """
+        `_calculate_moving_rectangle_collision_time` for the bumper, with its cached geometry. Bumper moves only along
+        the x axis. The calculations are done in the same order, so the results are identical.
+        """
+        rel_vel_x = ball_vel_x - self._get_bumper_velocity_x(bumper)
+
+        if abs(rel_vel_x) < EPSILON and abs(ball_vel_z) < EPSILON:
+            return math.inf
+
+        rect_left = bumper.x - bumper.lenght_half - BALL_RADIUS
+        rect_right = bumper.x + bumper.lenght_half + BALL_RADIUS
+        rect_top = bumper.collision_top
+        rect_bottom = bumper.collision_bottom
+
+        if abs(rel_vel_x) < EPSILON:
+            if ball_x <= rect_left or ball_x >= rect_right:
+                return math.inf
+            t_x_enter, t_x_exit = 0, math.inf
+        else:
+            t_x_1 = (rect_left - ball_x) / rel_vel_x
+            t_x_2 = (rect_right - ball_x) / rel_vel_x
+            t_x_enter = min(t_x_1, t_x_2)
+            t_x_exit = max(t_x_1, t_x_2)
+
+        if abs(ball_vel_z) < EPSILON:
+            if ball_z <= rect_bottom or ball_z >= rect_top:
+                return math.inf
+            t_z_enter, t_z_exit = 0, math.inf
+        else:
+            t_z_1 = (rect_bottom - ball_z) / ball_vel_z
+            t_z_2 = (rect_top - ball_z) / ball_vel_z
+            t_z_enter = min(t_z_1, t_z_2)
+            t_z_exit = max(t_z_1, t_z_2)
+
+        collision_enter = max(t_x_enter, t_z_enter)
+        if collision_enter <= min(t_x_exit, t_z_exit) and collision_enter > EPSILON:
+            return collision_enter
+
+        return math.inf
+
     def _calculate_moving_rectangle_collision_time(
         self,
         ball_x,
@@ -499,7 +785,7 @@ class BasePong:
 
         # if no relative movement, no collision possible
         if abs(rel_vel_x) < EPSILON and abs(rel_vel_z) < EPSILON:
-            return float("inf")
+            return math.inf
 
         # expand rectangle size: this allows to treat the ball as a point
         # collision happens when the point enters the expanded rectangle
@@ -510,8 +796,8 @@ class BasePong:
 
         if abs(rel_vel_x) < EPSILON:
             if ball_x <= rect_left or ball_x >= rect_right:
-                return float("inf")
-            t_x_enter, t_x_exit = 0, float("inf")
+                return math.inf
+            t_x_enter, t_x_exit = 0, math.inf
         else:
             t_x_1 = (rect_left - ball_x) / rel_vel_x
             t_x_2 = (rect_right - ball_x) / rel_vel_x
@@ -520,8 +806,8 @@ class BasePong:
 
         if abs(rel_vel_z) < EPSILON:
             if ball_z <= rect_bottom or ball_z >= rect_top:
-                return float("inf")
-            t_z_enter, t_z_exit = 0, float("inf")
+                return math.inf
+            t_z_enter, t_z_exit = 0, math.inf
         else:
             t_z_1 = (rect_bottom - ball_z) / rel_vel_z
             t_z_2 = (rect_top - ball_z) / rel_vel_z
@@ -534,7 +820,7 @@ class BasePong:
         if collision_enter <= collision_exit and collision_enter > EPSILON:
             return collision_enter
 
-        return float("inf")
+        return math.inf
 
     def _move_all_objects(self, delta_time):
         """Move all objects by `delta_time`."""
@@ -571,12 +857,10 @@ class BasePong:
         # don't go over walls
         # when bumper goes overl wall, it sticks to its edge instead
         new_x = bumper.x + movement
-        left_limit = WALL_LEFT_X - WALL_WIDTH_HALF - bumper.lenght_half
-        right_limit = WALL_RIGHT_X + WALL_WIDTH_HALF + bumper.lenght_half
 
         # min() and max() are implemented in C, so they are faster than conditions
         # it means: `left_limit < new_x < right_limit`
-        bumper.x = max(right_limit, min(left_limit, new_x))
+        bumper.x = max(bumper.right_limit, min(bumper.left_limit, new_x))
 
     def _handle_collision(self, collision_info: CollisionInfo, current_time: float):
         """Handle the collision that just occurred."""
@@ -601,6 +885,8 @@ class BasePong:
 
         elif collision_type == CollisionType.SCORE:
             bumper_that_scored = data
+            if self._is_saved_by_lag(self._bumper_2 if bumper_that_scored == self._bumper_1 else self._bumper_1):
+                return
             if bumper_that_scored == self._bumper_1:
                 self._bumper_1.score += 1
                 self._reset_ball(-1)
@@ -610,6 +896,50 @@ class BasePong:
                 self._reset_ball(1)
                 self._is_someone_scored = True
 
+    def _compensate_lag(self):
+        """
+        The ball that has passed the bumper can be saved by it while it passed less than `lag_compensation` seconds
+        ago, so the bumper the ball moves to is checked after every tick, not only when the ball reaches the goal.
+        """
+        ball_vel_z = self._ball.velocity.z
+        if ball_vel_z < 0 and self._bumper_1.lag_compensation:
+            self._is_saved_by_lag(self._bumper_1)
+        elif ball_vel_z > 0 and self._bumper_2.lag_compensation:
+            self._is_saved_by_lag(self._bumper_2)
+
+    def _is_saved_by_lag(self, bumper: Bumper) -> bool:
+        """
+        Lag-compensated hit detection. The player sees the ball late by their latency, and their moves come late by it
+        too, so their bumper can reach the ball when it has already passed the bumper on the server. Bumper where it is
+        now is compared with the ball rewound to the moment it passed the bumper: if the ball passed the bumper less
+        than `lag_compensation` seconds ago, and the bumper covers it now, the ball bounces from the bumper there.
+        """
+        if not bumper.lag_compensation:
+            return False
+
+        ball = self._ball
+        ball_vel_x = ball.velocity.x * ball.temporal_speed.x * self._game_speed
+        ball_vel_z = ball.velocity.z * ball.temporal_speed.z * self._game_speed
+        bumper_front_z = bumper.collision_top if bumper.dir_z == 1 else bumper.collision_bottom
+        if not ball_vel_z:
+            return False
+        passed_ago = (ball.z - bumper_front_z) / ball_vel_z
+        if not 0 <= passed_ago <= bumper.lag_compensation:
+            return False
+
+        rewound_ball_x = ball.x - ball_vel_x * passed_ago
+        # the ball has bounced from the wall after it passed the bumper
+        if not BALL_LEFT_WALL_X <= rewound_ball_x <= BALL_RIGHT_WALL_X:
+            return False
+        if abs(rewound_ball_x - bumper.x) > bumper.lenght_half + BALL_RADIUS:
+            return False
+
+        logger.debug("LAG COMPENSATION: ball passed bumper.x=%f %f seconds ago", bumper.x, passed_ago)
+        ball.x, ball.z = rewound_ball_x, bumper_front_z
+        self._last_bumper_collided = bumper
+        self._increase_ball_speed_and_calculate_new_ball_dir(bumper)
+        return True
+
     def _reset_ball(self, direction: int):
         self._ball.temporal_speed.x, self._ball.temporal_speed.z = TEMPORAL_SPEED_DEFAULT
         self._ball.x, self._ball.z = STARTING_BALL_POS
@@ -695,7 +1025,7 @@ class BasePong:
             return
 
         # returns 1-5, convert to Buff enum
-        buff_id = random.randrange(1, 6)  # noqa: S311
+        buff_id = self._rng.randrange(1, 6)
         self._active_buff_or_debuff = Buff(buff_id)  # Convert int to Buff enum
         self._active_buff_or_debuff_start_time = current_time
 
@@ -714,12 +1044,12 @@ class BasePong:
 
             case Buff.SHORTEN_ENEMY:
                 target_bumper = self._bumper_1 if self._last_bumper_collided == self._bumper_2 else self._bumper_2
-                target_bumper.lenght_half = 1.25
+                target_bumper.resize(1.25, target_bumper.width_half)
                 self._active_buff_or_debuff_target = target_bumper
                 logger.debug("Debuff target: %s", "bumper_1" if target_bumper == self._bumper_1 else "bumper_2")
 
             case Buff.ELONGATE_PLAYER:
-                self._last_bumper_collided.lenght_half = 5
+                self._last_bumper_collided.resize(5, self._last_bumper_collided.width_half)
                 if (
                     self._last_bumper_collided.x
                     < WALL_RIGHT_X + WALL_WIDTH_HALF + self._last_bumper_collided.lenght_half
@@ -741,7 +1071,7 @@ class BasePong:
                 )
 
             case Buff.ENLARGE_PLAYER:
-                self._last_bumper_collided.width_half = 1.5
+                self._last_bumper_collided.resize(self._last_bumper_collided.lenght_half, 1.5)
                 self._active_buff_or_debuff_target = self._last_bumper_collided
                 logger.debug(
                     "Buff target: %s",
@@ -785,8 +1115,7 @@ class BasePong:
 
         self._active_buff_or_debuff_target.control_reversed = False
         self._active_buff_or_debuff_target.speed = BASE_BUMPER_SPEED * self._game_speed
-        self._active_buff_or_debuff_target.lenght_half = BUMPER_LENGTH_HALF
-        self._active_buff_or_debuff_target.width_half = BUMPER_WIDTH_HALF
+        self._active_buff_or_debuff_target.resize(BUMPER_LENGTH_HALF, BUMPER_WIDTH_HALF)
 
     def as_dict(self) -> SerializedGameState:
         """
@@ -825,14 +1154,90 @@ class BasePong:
 
         return self._serialized_state
 
+    def get_engine_snapshot(self, current_time: float) -> EngineSnapshot:
+        """Full state of the engine that is needed to resume it. Times are relative to `current_time`."""
+        ball, coin = self._ball, self._coin
+        return EngineSnapshot(
+            game_speed=self._game_speed,
+            started_ago=current_time - self.start_time,
+            is_someone_scored=self._is_someone_scored,
+            bumpers=[
+                BumperSnapshot(
+                    x=bumper.x,
+                    width_half=bumper.width_half,
+                    lenght_half=bumper.lenght_half,
+                    score=bumper.score,
+                    speed=bumper.speed,
+                    control_reversed=bumper.control_reversed,
+                )
+                for bumper in (self._bumper_1, self._bumper_2)
+            ],
+            ball=[ball.x, ball.z, ball.velocity.x, ball.velocity.z, ball.temporal_speed.x, ball.temporal_speed.z],
+            coin=[coin.x, coin.z, coin.velocity.x, coin.velocity.z] if coin else None,
+            last_coin_hit_ago=current_time - self._last_coin_hit_time,
+            last_bumper_collided=self._get_bumper_number(self._last_bumper_collided),
+            buff=int(self._active_buff_or_debuff),
+            buff_started_ago=current_time - self._active_buff_or_debuff_start_time,
+            buff_target=self._get_bumper_number(self._active_buff_or_debuff_target),
+        )
+
+    def restore_engine_snapshot(self, snapshot: EngineSnapshot, current_time: float):
+        """Restores the state from `get_engine_snapshot`, moving its times to the clock of `current_time`."""
+        self.start_time = current_time - snapshot["started_ago"]
+        self._is_someone_scored = snapshot["is_someone_scored"]
+        for bumper, bumper_snapshot in zip((self._bumper_1, self._bumper_2), snapshot["bumpers"], strict=True):
+            bumper.x = bumper_snapshot["x"]
+            bumper.resize(bumper_snapshot["lenght_half"], bumper_snapshot["width_half"])
+            bumper.score = bumper_snapshot["score"]
+            bumper.speed = bumper_snapshot["speed"]
+            bumper.control_reversed = bumper_snapshot["control_reversed"]
+        (
+            self._ball.x,
+            self._ball.z,
+            self._ball.velocity.x,
+            self._ball.velocity.z,
+            self._ball.temporal_speed.x,
+            self._ball.temporal_speed.z,
+        ) = snapshot["ball"]
+        if self._coin and snapshot["coin"]:
+            self._coin.x, self._coin.z, self._coin.velocity.x, self._coin.velocity.z = snapshot["coin"]
+        self._last_coin_hit_time = current_time - snapshot["last_coin_hit_ago"]
+        self._last_bumper_collided = self._get_bumper_by_number(snapshot["last_bumper_collided"])
+        self._active_buff_or_debuff = Buff(snapshot["buff"])
+        self._active_buff_or_debuff_start_time = current_time - snapshot["buff_started_ago"]
+        self._active_buff_or_debuff_target = self._get_bumper_by_number(snapshot["buff_target"])
+
+    def set_catch_up_moves(self, bumper: Bumper, catch_up_moves: int, ticks: int):
+        """Bumper makes `catch_up_moves` more moves during `ticks`, so it moves faster."""
+        bumper.catch_up_moves = catch_up_moves
+        bumper.catch_up_factor = (ticks + catch_up_moves) / ticks
+
+    def get_bumpers(self) -> tuple[Bumper, Bumper]:
+        return self._bumper_1, self._bumper_2
+
+    def reseed(self, seed: int):
+        """Starts the new sequence of the random choices, so the match can be replayed from this point."""
+        self._rng.seed(seed)
+
+    def _get_bumper_number(self, bumper: Bumper | None) -> int:
+        if bumper is self._bumper_1:
+            return 1
+        if bumper is self._bumper_2:
+            return 2
+        return 0
+
+    def _get_bumper_by_number(self, number: int) -> Bumper | None:
+        return (None, self._bumper_1, self._bumper_2)[number]
+
 
 class MultiplayerPongMatch(BasePong):
     """
     Adaptated interface for the pong engine for the purposes of being managed by the GameConsumer in concurrent manner
     for the purposes of being sent to the client via websockets.
     Connects the pong enging to actual players, their inputs and state. Manages players, their connection status,
-    inputs, as well as the background tasks needed for the proper management of the game loop and
-    connection/reconnection of the players.
+    inputs, as well as the timers needed for the proper management of connection/reconnection of the players.
+    The match doesn't tick by itself: `GameWorkerConsumer` advances all of its ongoing matches together, and fires their
+    timers from its timer wheel.
     """
 
     id: str
@@ -840,10 +1245,18 @@ class MultiplayerPongMatch(BasePong):
     tournament_id: None | str
     bracket_id: None | str
     is_in_tournament: bool
-    game_loop_task: asyncio.Task | None
-    waiting_for_players_timer: asyncio.Task | None
+    # deadlines of the match in the timer wheel of the worker
+    waiting_for_players_timer: Timer | None
+    time_limit_timer: Timer | None
+    replay: ReplayRecorder | None
+    # sockets of the websocket server processes of the spectators, by their channel names. `None` is the channel layer
+    spectators: dict[str, str | None]
+    last_spectator_state_tick: int
+    # tick of the worker when the match was resolved last time, or when it was not ongoing yet
+    last_resolved_tick: int | None
+    # offset of the ticks of the match when the worker doesn't resolve or broadcast every match on every tick
+    tick_phase: int
     status: MultiplayerPongMatchStatus = MultiplayerPongMatchStatus.PENDING
-    pause_event: asyncio.Event
     time_limit_in_seconds: int
     time_limit_reached: bool
     ranked: bool
@@ -881,9 +1294,17 @@ class MultiplayerPongMatch(BasePong):
         self.time_limit_in_seconds = time_limit * 60  # in seconds for ease of testing
         self.time_limit_reached = False
         self.ranked = ranked
-        self.pause_event = asyncio.Event()
-        self.game_loop_task: asyncio.Task | None = None
         self.waiting_for_players_timer = None
+        self.time_limit_timer = None
+        self.replay = None
+        # draining workers that handed the match over, and forward the events of its game room to this worker
+        self.drained_channels: list[str] = []
+        self.spectators = {}
+        self._spectator_transports: Counter[str | None] = Counter()
+        self.last_spectator_state_tick = 0
+        self.last_resolved_tick = None
+        self.tick_phase = zlib.crc32(game_id.encode())
+        self._ticks_in_step = 1
         self._score_to_win = score_to_win
         self._player_1 = Player(self._bumper_1)
         self._player_2 = Player(self._bumper_2)
@@ -899,45 +1320,118 @@ class MultiplayerPongMatch(BasePong):
 
     def add_input_to_queue(self, player_input: ClientToGameServer.PlayerInput) -> None:
         """Adds inputs to the queue for processing."""
-        player_id = player_input["player_id"]
-        player: Player
-        if player_id == self._player_1.id:
-            player = self._player_1
-        elif player_id == self._player_2.id:
-            player = self._player_2
-        else:
+        player = self.get_player(player_input["player_id"])
+        if player is None:
             return
 
+        player.record_input_latency(player_input["timestamp"])
         # legit client can't send input messages at the rate faster than 30hz
-        if len(player.moves_queue) < GAME_TICKS_PER_SECOND:
-            player.moves_queue.append(player_input)
+        if player.queued_moves < GAME_TICKS_PER_SECOND:
+            move_id, timestamp = player_input["move_id"], player_input["timestamp"]
+            player.moves_queue.append(QueuedMoves(player_input["action"], move_id, move_id, timestamp, timestamp, 1))
+            player.queued_moves += 1
+
+    def add_inputs_batch_to_queue(self, batch: GameServerToGameWorker.PlayerInputsBatched) -> None:
+        """
+        Adds the batch to the queue as one entry. Its moves are still processed one per tick, each with its own
+        `move_id`, but the moves that came late are caught up all at once, see `_drain_inputs`.
+        """
+        player = self.get_player(batch["player_id"])
+        if player is None:
+            return
+
+        first_move_id, last_move_id = batch["first_move_id"], batch["last_move_id"]
+        player.record_input_latency(batch["last_timestamp"])
+        number_of_moves = min(last_move_id - first_move_id + 1, GAME_TICKS_PER_SECOND - player.queued_moves)
+        if number_of_moves <= 0:
+            return
+        player.moves_queue.append(
+            QueuedMoves(
+                batch["action"],
+                first_move_id,
+                last_move_id,
+                batch["first_timestamp"],
+                batch["last_timestamp"],
+                number_of_moves,
+            ),
+        )
+        player.queued_moves += number_of_moves
 
     def _process_inputs(self, player: Player):
-        move: ClientToGameServer.PlayerInput
-        if player.moves_queue:
-            move = player.moves_queue.popleft()
-        else:
+        if not player.moves_queue:
             return
 
-        action = move["action"]
+        action = player.moves_queue[0].action
         if action == "move_left":
             player.bumper.moves_left = True
         elif action == "move_right":
             player.bumper.moves_right = True
 
-        player.last_processed_move.update(move)
+        self._take_moves(player, 1)
+
+    def _take_moves(self, player: Player, number_of_moves: int):
+        """Takes the moves from the first entry of the queue, which has at least `number_of_moves` of them."""
+        queued_moves = player.moves_queue[0]
+        queued_moves.take(number_of_moves, player.last_processed_move)
+        player.queued_moves -= number_of_moves
+        if not queued_moves.remaining:
+            player.moves_queue.popleft()
+
+    def _drain_inputs(self, player: Player, ticks: int):
+        """
+        Processes one input for every tick of the step, and catches up the moves that came late, for example in a
+        burst after a spike of the latency: the following moves in the same direction are made during the same step,
+        faster, instead of leaving the player behind by several ticks for the rest of the match.
+        The player earns one move per tick, and can save up to `MAX_CATCH_UP_MOVES` of them while the moves don't
+        come, so on average the bumper never moves faster than the client sends the moves.
+        """
+        player.move_credit = min(player.move_credit + ticks, ticks + MAX_CATCH_UP_MOVES)
+        for _ in range(ticks):
+            if not player.moves_queue:
+                break
+            self._process_inputs(player)
+            player.move_credit -= 1
+
+        if not player.moves_queue:
+            return
+        bumper = player.bumper
+        last_action = player.last_processed_move.get("action")
+        catch_up_moves = 0
+        while (
+            player.move_credit > 0
+            and player.moves_queue
+            and bumper.moves_left != bumper.moves_right
+            and player.moves_queue[0].action == last_action
+        ):
+            # the whole batch is caught up at once, as far as the credit allows
+            number_of_moves = min(player.moves_queue[0].remaining, player.move_credit)
+            self._take_moves(player, number_of_moves)
+            player.move_credit -= number_of_moves
+            catch_up_moves += number_of_moves
+        if catch_up_moves:
+            self.set_catch_up_moves(bumper, catch_up_moves, ticks)
 
     def _reset_movement(self, player: Player):
         player.bumper.moves_left = False
         player.bumper.moves_right = False
+        if player.bumper.catch_up_moves:
+            self.set_catch_up_moves(player.bumper, 0, 1)
 
-    def resolve_next_tick(self, delta_time: float, current_time: float):
-        """Extends parent's `resolve_next_tick`, but with awarness of of inputs."""
-        self._process_inputs(self._player_1)
-        self._process_inputs(self._player_2)
-
-        super().resolve_next_tick(delta_time, current_time)
-
+    def start_tick(self, delta_time: float):
+        """
+        Extends parent's `start_tick`, but with awarness of of inputs.
+        When the step is longer than one tick, one input of every tick of the step is processed.
+        """
+        self._ticks_in_step = max(round(delta_time / GAME_TICK_INTERVAL), 1)
+        self._drain_inputs(self._player_1, self._ticks_in_step)
+        self._drain_inputs(self._player_2, self._ticks_in_step)
+        super().start_tick(delta_time)
+
+    def finish_tick(self, current_time: float):
+        """Extends parent's `finish_tick`: inputs are applied only for one tick."""
+        super().finish_tick(current_time)
+        if self.replay:
+            self.replay.record_tick(self, current_time, self._ticks_in_step)
         self._reset_movement(self._player_1)
         self._reset_movement(self._player_2)
 
@@ -993,16 +1487,47 @@ class MultiplayerPongMatch(BasePong):
             return self._player_2
         return None
 
+    def get_players(self) -> tuple[Player, Player]:
+        return self._player_1, self._player_2
+
+    def get_network_stats(self) -> GameServerToClient.NetworkStats:
+        return GameServerToClient.NetworkStats(
+            type="worker_to_client_open",
+            action="network_stats",
+            bumper_1=self._player_1.get_network_stats(),
+            bumper_2=self._player_2.get_network_stats(),
+        )
+
+    def get_input_queue_depths(self) -> dict[str, int]:
+        """Number of inputs waiting to be processed, by id of the player."""
+        return {player.id: player.queued_moves for player in (self._player_1, self._player_2) if player.id}
+
+    def add_spectator(self, channel_name: str, tick_socket_path: str | None):
+        self.remove_spectator(channel_name)
+        self.spectators[channel_name] = tick_socket_path
+        self._spectator_transports[tick_socket_path] += 1
+
+    def remove_spectator(self, channel_name: str):
+        if channel_name not in self.spectators:
+            return
+        tick_socket_path = self.spectators.pop(channel_name)
+        self._spectator_transports[tick_socket_path] -= 1
+        if not self._spectator_transports[tick_socket_path]:
+            del self._spectator_transports[tick_socket_path]
+
+    def get_spectator_transports(self) -> list[str | None]:
+        """Distinct transports of the spectators. Their number doesn't grow with the number of the spectators."""
+        return list(self._spectator_transports)
+
     def get_other_player(self, player_id: str) -> Player:
         if player_id == self._player_1.id:
             return self._player_2
         return self._player_1
 
-    def stop_waiting_for_players_timer(self) -> None:
-        timer = self.waiting_for_players_timer
-        if timer and not timer.cancelled():
-            timer.cancel()
-        self.waiting_for_players_timer = None
+    def get_timers(self) -> list[Timer]:
+        timers = [self.waiting_for_players_timer, self.time_limit_timer]
+        timers.extend(player.reconnection_timer for player in self.get_players())
+        return [timer for timer in timers if timer is not None]
 
     def get_result(self) -> tuple[Player, Player] | None:
         """
@@ -1047,43 +1572,155 @@ class MultiplayerPongMatch(BasePong):
 
         return pong_state
 
+    def get_snapshot(self, current_time: float) -> MatchSnapshot:
+        """Snapshot to resume the match in the restarted worker. See `pong.match_snapshots`."""
+        return MatchSnapshot(
+            id=self.id,
+            settings=self.settings,
+            is_in_tournament=self.is_in_tournament,
+            bracket_id=self.bracket_id,
+            tournament_id=self.tournament_id,
+            status=self.status.name,
+            time_limit_reached=self.time_limit_reached,
+            total_paused_time=self.total_paused_time,
+            paused_ago=current_time - self.pause_start_time if self.pause_start_time else 0.0,
+            engine=self.get_engine_snapshot(current_time),
+            players=[
+                PlayerSnapshot(
+                    id=player.id,
+                    connection=player.connection.name,
+                    connected_ago=current_time - player.connection_stamp if player.connection_stamp else 0.0,
+                    reconnection_time=player.get_remaining_reconnection_time(current_time),
+                    profile_id=player.profile_id,
+                    name=player.name,
+                    opponents_name=player.opponents_name,
+                    avatar=player.avatar,
+                    elo=player.elo,
+                    tick_socket_path=player.tick_socket_path,
+                    last_processed_move=dict(player.last_processed_move),
+                )
+                for player in (self._player_1, self._player_2)
+            ],
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: MatchSnapshot, current_time: float) -> "MultiplayerPongMatch":
+        """Creates the match from `get_snapshot`. Timers of the match are not started here."""
+        match = cls(
+            snapshot["id"],
+            snapshot["settings"],
+            snapshot["is_in_tournament"],
+            snapshot["bracket_id"],
+            snapshot["tournament_id"],
+        )
+        match.status = MultiplayerPongMatchStatus[snapshot["status"]]
+        match.time_limit_reached = snapshot["time_limit_reached"]
+        match.total_paused_time = snapshot["total_paused_time"]
+        match.pause_start_time = current_time - snapshot["paused_ago"] if snapshot["paused_ago"] else 0.0
+        match.restore_engine_snapshot(snapshot["engine"], current_time)
+        for player, player_snapshot in zip((match._player_1, match._player_2), snapshot["players"], strict=True):  # noqa: SLF001
+            player.id = player_snapshot["id"]
+            player.connection = PlayerConnectionState[player_snapshot["connection"]]
+            player.connection_stamp = (
+                current_time - player_snapshot["connected_ago"] if player_snapshot["connected_ago"] else 0.0
+            )
+            player.reconnection_time = player_snapshot["reconnection_time"]
+            player.profile_id = player_snapshot["profile_id"]
+            player.name = player_snapshot["name"]
+            player.opponents_name = player_snapshot["opponents_name"]
+            player.avatar = player_snapshot["avatar"]
+            player.elo = player_snapshot["elo"]
+            player.tick_socket_path = player_snapshot["tick_socket_path"]
+            player.last_processed_move = player_snapshot["last_processed_move"]
+        return match
+
 
 class GameWorkerConsumer(AsyncConsumer):
     """
     Manages multiple concurrent pong matches. Receives inputs from `GameRoomConsumer` and sends back different events
     based on what happened in the match.
+    There can be several game workers, each one listening on its own channel. When the worker is draining, it finishes
+    its own matches, but hands over the new ones to the next worker on the ring and forwards their events there.
+    The overloaded worker degrades its matches, see `pong/game_worker_load.py`. When it has reached
+    `GAME_WORKER_MAX_MATCHES` or can't degrade them any further, it hands over the new matches as well, and refuses them
+    if no other worker can take them.
+    All deadlines of the matches are held by one timer wheel, which is advanced by the game loop, see
+    `pong/timer_wheel.py`.
     """
 
     def __init__(self):
         super().__init__()
         self.matches: dict[str, MultiplayerPongMatch] = {}
         self.channel_layer = get_channel_layer()
+        self.is_draining = False
+        self.drain_reply_channel: str | None = None
+        # game rooms that were handed over to other workers during draining, with the channels of these workers
+        self.forwarded_game_rooms: dict[str, str] = {}
+        # game rooms that were refused because no worker could take them
+        self.refused_game_rooms: set[str] = set()
+        # when the forwarded and the refused game rooms are forgotten, the earliest first
+        self._handed_off_game_rooms_expiry: deque[tuple[float, str]] = deque()
+        self.game_loop_task: asyncio.Task | None = None
+        self.tick_number = 0
+        self.load = GameWorkerLoad(GAME_TICK_INTERVAL)
+        self.timers = TimerWheel(GAME_TICK_INTERVAL)
+        self.metrics = GameWorkerMetrics()
+        # strong references to fire-and-forget tasks, so they are not garbage collected while running
+        self._background_tasks: set[asyncio.Task] = set()
+        self.local_ticks = LocalTickClient()
+        self.result_writer: MatchResultWriter | None = None
+        self.snapshot_store: MatchSnapshotStore | None = None
+
+    async def __call__(self, scope, receive, send):
+        """Worker is started with its first event. Before handling it, the state of the previous run is restored."""
+        self.scope = scope
+        self._get_result_writer()
+        try:
+            await self._restore_matches()
+        except Exception:  # noqa: BLE001
+            logger.critical("[GameWorker]: matches can't be restored\n%s", traceback.format_exc())
+        return await super().__call__(scope, receive, send)
 
     ##### EVENT HANDLERS AND CHANNEL METHODS #####
     async def player_connected(self, event: GameServerToGameWorker.PlayerConnected):
         game_room_id = event["game_room_id"]
         player_id = event["player_id"]
+        if await self._forward_to_other_worker(event):
+            return
+        if game_room_id in self.refused_game_rooms:
+            await self._refuse_match(event)
+            return
 
         ### CONNECTION OF THE FIRST PLAYER TO NOT YET CREATED MATCH ###
         if game_room_id not in self.matches:
+            is_overloaded = self._is_overloaded()
+            if (self.is_draining or is_overloaded) and await self._hand_over_to_other_worker(event):
+                return
+            # tournament can't go on without its games, so they are played anyway
+            if (self.is_draining or is_overloaded) and not event["is_in_tournament"]:
+                await self._refuse_match(event)
+                return
             await self._add_player_and_create_pending_match(event)
-            return
+        else:
+            match = self.matches[game_room_id]
 
-        match = self.matches[game_room_id]
+            ### CONNECTION OF THE SECOND PLAYER TO THE PENDING MATCH ###
+            if (
+                match.status == MultiplayerPongMatchStatus.PENDING
+                and len(match.get_players_based_on_connection(PlayerConnectionState.CONNECTED)) == PLAYERS_REQUIRED - 1
+            ):
+                await self._add_player_and_start_match(match, event)
+            ### RECONNECTION OF ONE OF THE PLAYERS TO THE MATCH ###
+            elif match.status in {MultiplayerPongMatchStatus.PENDING, MultiplayerPongMatchStatus.PAUSED}:
+                await self._reconnect_player(player_id, match)
 
-        ### CONNECTION OF THE SECOND PLAYER TO THE PENDING MATCH ###
-        if (
-            match.status == MultiplayerPongMatchStatus.PENDING
-            and len(match.get_players_based_on_connection(PlayerConnectionState.CONNECTED)) == PLAYERS_REQUIRED - 1
-        ):
-            await self._add_player_and_start_match(match, event)
-        ### RECONNECTION OF ONE OF THE PLAYERS TO THE MATCH ###
-        elif match.status in {MultiplayerPongMatchStatus.PENDING, MultiplayerPongMatchStatus.PAUSED}:
-            await self._reconnect_player(player_id, match)
+        await self._set_tick_transport(event)
 
     async def player_disconnected(self, event: GameServerToGameWorker.PlayerDisconnected):
         game_room_id = event["game_room_id"]
         player_id = event["player_id"]
+        if await self._forward_to_other_worker(event):
+            return
 
         match = self.matches.get(game_room_id)
         if match is None or match.status == MultiplayerPongMatchStatus.FINISHED:
@@ -1113,7 +1750,7 @@ class GameWorkerConsumer(AsyncConsumer):
             return
 
         await self._pause(match, player)
-        player.reconnection_timer = asyncio.create_task(self._wait_for_reconnection_task(match, player))
+        self._start_reconnection_timer(match, player, asyncio.get_event_loop().time())
         logger.info(
             "[GameWorker]: player {%s} has been disconnected from the ongoing game {%s}",
             player_id,
@@ -1126,6 +1763,9 @@ class GameWorkerConsumer(AsyncConsumer):
         and event source is the server, which we can trust.
         """
         game_room_id = event["game_room_id"]
+        if await self._forward_to_other_worker(event):
+            return
+
         match = self.matches.get(game_room_id)
         if match is None or match.status != MultiplayerPongMatchStatus.ONGOING:
             logger.warning("[GameWorker]: input was sent for not running game {%s}", game_room_id)
@@ -1137,193 +1777,606 @@ class GameWorkerConsumer(AsyncConsumer):
             case "move_left" | "move_right":
                 match.add_input_to_queue(event)
 
+    async def player_inputs_batched(self, event: GameServerToGameWorker.PlayerInputsBatched):
+        """Handles the inputs coalesced by the websocket server. See `player_inputed`."""
+        game_room_id = event["game_room_id"]
+        if await self._forward_to_other_worker(event):
+            return
+
+        match = self.matches.get(game_room_id)
+        if match is None or match.status != MultiplayerPongMatchStatus.ONGOING:
+            logger.warning("[GameWorker]: input was sent for not running game {%s}", game_room_id)
+            return
+
+        match event["action"]:
+            case "move_left" | "move_right":
+                match.add_inputs_batch_to_queue(event)
+
+    async def player_rtt_measured(self, event: GameServerToGameWorker.PlayerRttMeasured):
+        if await self._forward_to_other_worker(event):
+            return
+
+        match = self.matches.get(event["game_room_id"])
+        player = match.get_player(event["player_id"]) if match else None
+        if player is None:
+            return
+        player.record_rtt(event["rtt"])
+
+    async def spectator_joined(self, event: GameServerToGameWorker.SpectatorJoined):
+        """
+        Adds the spectator to the match, unless the match has reached `GAME_MAX_SPECTATORS_PER_MATCH`.
+        Spectators who can't be reached through the local transport are added to the group that receives the states
+        through the channel layer.
+        """
+        if await self._forward_to_other_worker(event):
+            return
+
+        game_room_id = event["game_room_id"]
+        channel_name = event["channel_name"]
+        match = self.matches.get(game_room_id)
+        if match is None or match.status == MultiplayerPongMatchStatus.FINISHED:
+            await self._refuse_spectator(channel_name, "match_not_found")
+            return
+        if channel_name not in match.spectators and len(match.spectators) >= settings.GAME_MAX_SPECTATORS_PER_MATCH:
+            logger.warning("[GameWorker]: game {%s} has too many spectators", game_room_id)
+            await self._refuse_spectator(channel_name, "too_many_spectators")
+            return
+
+        path = event.get("tick_socket_path")
+        path = path if path and await self.local_ticks.connect(path) else None
+        match.add_spectator(channel_name, path)
+        if path is None:
+            await self.channel_layer.group_add(self._to_spectator_states_group_name(match), channel_name)
+        player_1, player_2 = match.get_players()
+        await self.channel_layer.send(
+            channel_name,
+            GameServerToClient.SpectatorJoined(
+                type="worker_to_client_open",
+                action="spectator_joined",
+                player_1_name=player_1.name or player_2.opponents_name,
+                player_2_name=player_2.name or player_1.opponents_name,
+                is_paused=match.status == MultiplayerPongMatchStatus.PAUSED,
+                settings=match.settings,
+            ),
+        )
+        logger.info("[GameWorker]: game {%s} has {%s} spectators", game_room_id, len(match.spectators))
+
+    async def spectator_left(self, event: GameServerToGameWorker.SpectatorLeft):
+        if await self._forward_to_other_worker(event):
+            return
+
+        match = self.matches.get(event["game_room_id"])
+        channel_name = event["channel_name"]
+        if match is None or channel_name not in match.spectators:
+            return
+        if match.spectators[channel_name] is None:
+            await self.channel_layer.group_discard(self._to_spectator_states_group_name(match), channel_name)
+        match.remove_spectator(channel_name)
+
+    async def worker_drain(self, event: GameWorkerControl.Drain):
+        """
+        Stops accepting new matches. Ongoing and pending matches are played until the end, and the `worker_drained`
+        event is sent to the `reply_channel` after that. New matches are handed over to the other workers, or refused
+        when every worker is draining, unless they are tournament games.
+        """
+        self.is_draining = True
+        self.drain_reply_channel = event["reply_channel"]
+        logger.info(
+            "[GameWorker]: worker {%s} is draining. {%s} matches are left",
+            self.scope["channel"],
+            len(self.matches),
+        )
+        await self._notify_if_drained()
+
+    async def worker_forwarded_game_finished(self, event: GameWorkerControl.ForwardedGameFinished):
+        """Match that this worker has handed over is finished, so the events of its game room won't come anymore."""
+        self.forwarded_game_rooms.pop(event["game_room_id"], None)
+        await self._notify_if_drained()
+
+    async def worker_metrics(self, event: GameWorkerControl.GetMetrics):
+        """Sends the snapshot of the metrics of the worker to the `reply_channel`."""
+        matches_by_status = dict.fromkeys(MultiplayerPongMatchStatus, 0)
+        input_queue_depth = {}
+        spectators = {}
+        network = {}
+        for game_room_id, match in self.matches.items():
+            matches_by_status[match.status] += 1
+            if match.spectators:
+                spectators[game_room_id] = len(match.spectators)
+            for player_id, depth in match.get_input_queue_depths().items():
+                input_queue_depth[f"{game_room_id}:{player_id}"] = depth
+            for player in match.get_players():
+                if player_network := player.get_network_stats():
+                    network[f"{game_room_id}:{player.id}"] = player_network
+        await self.channel_layer.send(
+            event["reply_channel"],
+            GameWorkerControl.Metrics(
+                type="worker_metrics_reported",
+                metrics=self.metrics.snapshot(
+                    channel_name=self.scope["channel"],
+                    ongoing_matches=matches_by_status[MultiplayerPongMatchStatus.ONGOING],
+                    paused_matches=matches_by_status[MultiplayerPongMatchStatus.PAUSED],
+                    pending_matches=matches_by_status[MultiplayerPongMatchStatus.PENDING],
+                    input_queue_depth=input_queue_depth,
+                    spectators=spectators,
+                    network=network,
+                    load=self.load.load,
+                    degradation_level=self.load.level,
+                ),
+            ),
+        )
+
     ##### BACKGROUND TASKS #####
-    async def _match_game_loop_task(self, match: MultiplayerPongMatch):
-        """Asynchrounous loop that runs one specific match."""
-        logger.info("[GameWorker]: match {%s} has been started", match)
+    async def _game_loop_task(self):
+        """
+        Asynchronous fixed-rate loop that advances all ongoing matches of the worker in one pass, 30 times a second.
+        Before that, it fires the timers of the matches that are due.
+        Ticks are scheduled relative to the start of the loop, so they don't drift apart. If the worker falls more than
+        one tick behind, the schedule is moved forward instead of running the missed ticks back to back.
+        Stops when the worker doesn't have any matches left.
+        """
+        loop = asyncio.get_event_loop()
+        next_tick_time = loop.time()
+        logger.info("[GameWorker]: game loop has been started")
         try:
-            while match.status != MultiplayerPongMatchStatus.FINISHED:
-                if match.status == MultiplayerPongMatchStatus.PAUSED:
-                    await match.pause_event.wait()
-                tick_start_time = asyncio.get_event_loop().time()
-
-                elapsed_seconds = tick_start_time - match.start_time - match.total_paused_time
-                if not match.time_limit_reached and elapsed_seconds >= match.time_limit_in_seconds:
-                    logger.info("[GameWorker]: match {%s} reached time limit", match.id)
-                    match.time_limit_reached = True
-
-                    result = match.get_result()
-                    # someone scored more than the other
-                    if result:
-                        winner, loser = result
-                        logger.info("[GameWorker]: player {%s} won due to time limit in game {%s}", winner.id, match)
-                        match_db = await self._write_result_to_db(winner, loser, match, "finished")
-                        if not match_db:
-                            logger.warning("[GameWorker]: match couldn't be recorded to the database")
-                        await self._send_player_won_event(
-                            match,
-                            "player_won",
-                            winner,
-                            loser,
-                            match_db.elo_change if match_db and not match.is_in_tournament else 0,
-                        )
-
-                        await self._do_after_match_cleanup(match, False)
-                        break
-
-                    # equal score: set the ball speed to the max!!
-                    match.set_ball_to_max_speed()
-                    logger.info("[GameWorker]: equal scores at time limit - activating sudden death mode")
-
-                match.resolve_next_tick(GAME_TICK_INTERVAL, tick_start_time)
-                if result := match.get_result():
-                    winner, loser = result
-                    match_db = await self._write_result_to_db(winner, loser, match, Bracket.FINISHED)
-                    if not match_db:
-                        logger.warning("[GameWorker]: match couldn't be recorded to the database")
-                    await self._send_player_won_event(
-                        match,
-                        "player_won",
-                        winner,
-                        loser,
-                        match_db.elo_change if match_db and not match.is_in_tournament else 0,
+            while self.matches:
+                tick_start_time = loop.time()
+                lateness = tick_start_time - next_tick_time
+                self.metrics.tick_lateness.record(max(lateness, 0))
+                if lateness > GAME_TICK_INTERVAL:
+                    logger.warning("[GameWorker]: game loop is late by {%.1f} ms", lateness * 1000)
+                    next_tick_time = tick_start_time
+
+                self._fire_timers(tick_start_time)
+                await self._tick_matches(tick_start_time)
+                if self.load.record(loop.time() - tick_start_time + max(lateness, 0)):
+                    logger.warning(
+                        "[GameWorker]: load of the worker is {%.2f}, degradation level is {%s}",
+                        self.load.load,
+                        self.load.level,
                     )
-                    await self._do_after_match_cleanup(match, False)
-                    logger.info("[GameWorker]: player {%s} has won the game {%s}", winner.id, match)
-                    break
-                await self.channel_layer.group_send(
-                    self._to_game_room_group_name(match.id),
-                    GameServerToClient.StateUpdated(
-                        type="worker_to_client_open",
-                        action="state_updated",
-                        state=match.as_dict_with_multiplayer_data(tick_start_time),
-                    ),
-                )
-                tick_end_time = asyncio.get_event_loop().time()
-                time_taken_for_current_tick = tick_end_time - tick_start_time
-                # tick the game for this match 30 times a second
-                await asyncio.sleep(max(GAME_TICK_INTERVAL - time_taken_for_current_tick, 0))
-            logger.info("[GameWorker]: task for game {%s} has been done", match)
+                await self._save_snapshot_if_needed(tick_start_time)
+
+                next_tick_time += GAME_TICK_INTERVAL
+                await asyncio.sleep(max(next_tick_time - loop.time(), 0))
+            await self._save_snapshot_if_needed(loop.time(), force=True)
+            logger.info("[GameWorker]: game loop has been stopped, there are no matches left")
         except asyncio.CancelledError:
-            logger.info("[GameWorker]: task for game {%s} has been cancelled", match)
+            logger.info("[GameWorker]: game loop has been cancelled")
         except Exception:  # noqa: BLE001
             logger.critical(traceback.format_exc())
 
-    async def _wait_for_both_player_task(self, match: MultiplayerPongMatch):
+    async def _tick_matches(self, current_time: float):
         """
-        Called with `asyncio.create_task`. Waits for both players to be connected to the game.
-        Cancels the game if the players do not manage to connect in time.
+        Advances every ongoing match by one tick. Matches that were decided are finished in the background, so the
+        database calls don't hold the tick of the other matches. States of the others are broadcasted together.
+        When the worker has a lot of matches, their physics are resolved together by the batch engine. The match
+        whose tick crashes is cancelled, so it doesn't crash the next ticks, and the other matches go on.
+        The states are sent to the spectators every `SPECTATOR_STATE_INTERVAL_TICKS` ticks, and the network stats of
+        the players every `NETWORK_STATS_INTERVAL_TICKS` ticks.
+        When the worker is overloaded, every match is resolved and broadcasted only on its share of the ticks, and is
+        advanced by all the ticks since it was resolved last.
         """
-        try:
-            logger.info("[GameWorker]: waiting for players to connect to the game {%s}", match)
-            await asyncio.sleep(WAITING_FOR_PLAYERS_TIME)
-
-            # if we are here, players didn't connect
-            if len(match.get_players_based_on_connection(PlayerConnectionState.CONNECTED)) < PLAYERS_REQUIRED:
-                if not match.is_in_tournament:
-                    await self.channel_layer.group_send(
-                        self._to_game_room_group_name(match),
-                        GameServerToClient.GameCancelled(
-                            type="worker_to_client_close",
-                            action="game_cancelled",
-                            tournament_id=match.tournament_id,
-                            close_code=CloseCodes.CANCELLED,
-                        ),
-                    )
-                elif match.is_in_tournament:
-                    winner = match.get_player_who_connected_earliest()
-                    loser = match.get_other_player(winner.id)
-                    await self.channel_layer.group_send(
-                        self._to_game_room_group_name(match),
-                        GameServerToClient.PlayerWon(
-                            type="worker_to_client_close",
-                            action="player_resigned",
-                            winner=winner.as_dict(),
-                            loser=loser.as_dict(),
-                            elo_change=0,
-                            tournament_id=match.tournament_id,
-                            close_code=CloseCodes.CANCELLED,
-                        ),
-                    )
-                    await database_sync_to_async(Bracket.objects.update_finished_bracket)(
-                        match.bracket_id,
-                        winner.profile_id,
-                        0,
-                        0,
-                        Bracket.FINISHED,
-                    )
-                    await self.channel_layer.send(
-                        "tournament",
-                        {
-                            "type": "tournament_game_finished",
-                            "tournament_id": str(match.tournament_id),
-                            "bracket_id": match.bracket_id,
-                        },
-                    )
-                await self._do_after_match_cleanup(match, True)
-                logger.info("[GameWorker]: players didn't connect to the game {%s}. Closing", match)
+        # batch engine is built on top of this module
+        from pong import batch_pong
+
+        compute_start_time = time.perf_counter()
+        self.tick_number += 1
+        physics_interval, broadcast_interval = self.load.physics_interval, self.load.broadcast_interval
+        matches_to_resolve = []
+        # matches by the number of ticks since their last resolution, which changes along with the `physics_interval`
+        matches_by_elapsed_ticks: defaultdict[int, list[MultiplayerPongMatch]] = defaultdict(list)
+        for match in list(self.matches.values()):
+            if match.status != MultiplayerPongMatchStatus.ONGOING:
+                match.last_resolved_tick = self.tick_number
+                continue
+            if (self.tick_number + match.tick_phase) % physics_interval == 0:
+                elapsed_ticks = (
+                    physics_interval
+                    if match.last_resolved_tick is None
+                    else self.tick_number - match.last_resolved_tick
+                )
+                match.last_resolved_tick = self.tick_number
+                matches_to_resolve.append(match)
+                matches_by_elapsed_ticks[elapsed_ticks].append(match)
+
+        crashed_matches = []
+
+        def on_crash(match: MultiplayerPongMatch):
+            crashed_matches.append(match)
+            self._cancel_crashed_match(match)
+
+        for elapsed_ticks, matches in matches_by_elapsed_ticks.items():
+            delta_time = elapsed_ticks * GAME_TICK_INTERVAL
+            if len(matches) >= batch_pong.BATCH_PHYSICS_MIN_MATCHES:
+                batch_pong.resolve_next_tick(matches, delta_time, current_time, on_crash=on_crash)
+                continue
+            for match in matches:
+                try:
+                    match.resolve_next_tick(delta_time, current_time)
+                except Exception:  # noqa: BLE001, PERF203
+                    on_crash(match)
+        if crashed_matches:
+            matches_to_resolve = [match for match in matches_to_resolve if match not in crashed_matches]
+
+        broadcasts = []
+        for match in matches_to_resolve:
+            if result := match.get_result():
+                self._finish_match_in_background(match, result)
+                continue
+
+            if (self.tick_number + match.tick_phase) % broadcast_interval:
+                continue
+            event = self._encode_state(match, current_time)
+            broadcasts.extend(self._send_state(match, event))
+            if (
+                match.spectators
+                and self.tick_number - match.last_spectator_state_tick >= SPECTATOR_STATE_INTERVAL_TICKS
+            ):
+                match.last_spectator_state_tick = self.tick_number
+                broadcasts.extend(self._send_state_to_spectators(match, event))
+            if (self.tick_number + match.tick_phase) % NETWORK_STATS_INTERVAL_TICKS == 0:
+                broadcasts.append(self._send_to_game_room(match, match.get_network_stats()))
+        broadcast_start_time = time.perf_counter()
+        self.metrics.tick_compute.record(broadcast_start_time - compute_start_time)
+        await asyncio.gather(*broadcasts)
+        self.metrics.broadcast.record(time.perf_counter() - broadcast_start_time)
+
+    def _send_state(self, match: MultiplayerPongMatch, event: GameServerToClient.WorkerToClientState) -> list:
+        """
+        Writes the state directly to the websocket server processes of the players that have the local transport.
+        Each process gets it once and passes it to all of its consumers of the game room.
+        Returns the channel layer sends for the other players.
+        If no player has the local transport, the state is sent to the whole group.
+        """
+        players = match.get_players_based_on_connection(PlayerConnectionState.CONNECTED)
+        reached_paths = {
+            path
+            for path in {player.tick_socket_path for player in players if player.tick_socket_path}
+            if self.local_ticks.send(path, match.id, event)
+        }
+        players_without_local_transport = [player for player in players if player.tick_socket_path not in reached_paths]
+        if len(players_without_local_transport) == len(players):
+            return [self.channel_layer.group_send(self._to_game_room_group_name(match.id), event)]
+        return [
+            self.channel_layer.group_send(self._to_player_group_name(player.id), event)
+            for player in players_without_local_transport
+        ]
+
+    def _send_state_to_spectators(
+        self,
+        match: MultiplayerPongMatch,
+        event: GameServerToClient.WorkerToClientState,
+    ) -> list:
+        """
+        Spectators get the same state as the players, sent once per transport and not once per spectator: each
+        websocket server process with the local transport passes it to all of its spectators of the match, and the
+        others get it with one send to the group. Returns the channel layer send, if it's needed.
+        """
+        broadcasts = []
+        for path in match.get_spectator_transports():
+            if path is None:
+                broadcasts.append(self.channel_layer.group_send(self._to_spectator_states_group_name(match), event))
+            elif not self.local_ticks.send(path, get_spectators_key(match.id), event):
+                self._run_in_background(self._move_spectators_to_channel_layer(match, path))
+        return broadcasts
+
+    async def _move_spectators_to_channel_layer(self, match: MultiplayerPongMatch, path: str):
+        """Websocket server process of the spectators can't be reached through the local transport anymore."""
+        for channel_name, spectator_path in list(match.spectators.items()):
+            if spectator_path == path:
+                match.add_spectator(channel_name, None)
+                await self.channel_layer.group_add(self._to_spectator_states_group_name(match), channel_name)
+
+    def _is_overloaded(self) -> bool:
+        return (0 < settings.GAME_WORKER_MAX_MATCHES <= len(self.matches)) or self.load.is_exhausted()
+
+    async def _refuse_match(self, event: GameServerToGameWorker.PlayerConnected):
+        """
+        Cancels the new match that no worker can take, and closes its game room. The game room is remembered, so the
+        players who connect to it later are refused as well, even if the worker can take new matches by then.
+        """
+        game_room_id = event["game_room_id"]
+        await self.channel_layer.group_send(
+            self._to_player_group_name(event["player_id"]),
+            GameServerToClient.GameCancelled(
+                type="worker_to_client_close",
+                action="game_cancelled",
+                tournament_id=event["tournament_id"],
+                close_code=CloseCodes.CANCELLED,
+            ),
+        )
+        if game_room_id in self.refused_game_rooms:
+            return
+        self.refused_game_rooms.add(game_room_id)
+        self._handed_off_game_rooms_expiry.append((time.monotonic() + HANDED_OFF_GAME_ROOM_TTL, game_room_id))
+        self._get_result_writer().submit(FinishedGameRoom(game_room_id=game_room_id, date=timezone.now().isoformat()))
+        logger.warning("[GameWorker]: no worker can take the game {%s}, it was cancelled", game_room_id)
 
-        except asyncio.CancelledError:
-            logger.info("[GameWorker]: both players reconnected\nwaiting for both timer {%s} has been cancelled", match)
+    async def _refuse_spectator(
+        self,
+        channel_name: str,
+        reason: Literal["match_not_found", "too_many_spectators"],
+    ):
+        await self.channel_layer.send(
+            channel_name,
+            GameServerToClient.SpectatingRefused(
+                type="worker_to_client_close",
+                action="spectating_refused",
+                reason=reason,
+                close_code=CloseCodes.CANCELLED,
+            ),
+        )
+
+    async def _set_tick_transport(self, event: GameServerToGameWorker.PlayerConnected):
+        """Connects to the socket of the websocket server process of the player, if it has one."""
+        match = self.matches.get(event["game_room_id"])
+        player = match.get_player(event["player_id"]) if match else None
+        if player is None:
+            return
+        path = event.get("tick_socket_path")
+        player.tick_socket_path = path if path and await self.local_ticks.connect(path) else None
+
+    def _encode_state(self, match: MultiplayerPongMatch, current_time: float) -> GameServerToClient.WorkerToClientState:
+        """
+        Serializes the state once for every client of the match, both as JSON and as the binary protocol keyframe.
+        Consumers send it without decoding and encoding it again for each player.
+        """
+        state = match.as_dict_with_multiplayer_data(current_time)
+        return GameServerToClient.WorkerToClientState(
+            type="worker_to_client_state",
+            text=json.dumps({"action": "state_updated", "state": state}),
+            packed_state=pack_state(state),
+        )
+
+    def _on_time_limit(self, match: MultiplayerPongMatch):
+        """Finishes the match that is decided by the time limit, or starts the sudden death."""
+        match.time_limit_timer = None
+        if match.status != MultiplayerPongMatchStatus.ONGOING:
+            return
+        logger.info("[GameWorker]: match {%s} reached time limit", match.id)
+        match.time_limit_reached = True
+
+        # someone scored more than the other
+        if result := match.get_result():
+            logger.info("[GameWorker]: player {%s} won due to time limit in game {%s}", result[0].id, match)
+            self._finish_match_in_background(match, result)
+            return
+
+        # equal score: set the ball speed to the max!!
+        match.set_ball_to_max_speed()
+        logger.info("[GameWorker]: equal scores at time limit - activating sudden death mode")
+
+    def _cancel_crashed_match(self, match: MultiplayerPongMatch):
+        """Called in the `except` block. The match would crash on every tick, so it's cancelled instead."""
+        logger.critical("[GameWorker]: match {%s} crashed\n%s", match, traceback.format_exc())
+        match.status = MultiplayerPongMatchStatus.FINISHED
+        self._run_in_background(self._cancel_crashed_match_task(match))
+
+    async def _cancel_crashed_match_task(self, match: MultiplayerPongMatch):
+        try:
+            await self._send_to_game_room(
+                match,
+                GameServerToClient.GameCancelled(
+                    type="worker_to_client_close",
+                    action="game_cancelled",
+                    tournament_id=match.tournament_id,
+                    close_code=CloseCodes.CANCELLED,
+                ),
+            )
+            await self._do_after_match_cleanup(match)
         except Exception:  # noqa: BLE001
             logger.critical(traceback.format_exc())
 
-    async def _wait_for_reconnection_task(self, match: MultiplayerPongMatch, player: Player):
-        start_time = asyncio.get_event_loop().time()
-        initial_time = player.reconnection_time
+    def _finish_match_in_background(self, match: MultiplayerPongMatch, result: tuple[Player, Player]):
+        winner, loser = result
+        match.status = MultiplayerPongMatchStatus.FINISHED
+        self._run_in_background(self._finish_match_task(match, winner, loser))
 
+    async def _finish_match_task(self, match: MultiplayerPongMatch, winner: Player, loser: Player):
         try:
-            logger.info(
-                "[GameWorker]: waiting for player {%s} to reconnect to game {%s} ({%.1f}s remaining)",
-                player.id,
-                match.id,
-                player.reconnection_time,
+            await self._finish_match(match, winner, loser, "player_won")
+            logger.info("[GameWorker]: player {%s} has won the game {%s}", winner.id, match)
+        except Exception:  # noqa: BLE001
+            logger.critical(traceback.format_exc())
+
+    async def _finish_match(
+        self,
+        match: MultiplayerPongMatch,
+        winner: Player,
+        loser: Player,
+        action: Literal["player_won", "player_resigned"],
+    ):
+        """
+        Announces the winner without waiting for the database: ELO change is calculated from the ELO the players had
+        when they connected. The result is written to the database by `MatchResultWriter` in the background.
+        """
+        elo_change = 0
+        if match.ranked and not match.is_in_tournament:
+            winner.elo, loser.elo, elo_change = Match.objects.calculate_elo_change_for_players(winner.elo, loser.elo)
+        await self._send_player_won_event(match, action, winner, loser, elo_change)
+
+        finished = FinishedGameRoom(game_room_id=str(match), date=timezone.now().isoformat())
+        if match.is_in_tournament:
+            finished["bracket"] = BracketResult(
+                bracket_id=match.bracket_id,
+                tournament_id=str(match.tournament_id),
+                winner_profile_id=winner.profile_id,
+                winners_score=winner.bumper.score,
+                losers_score=loser.bumper.score,
+                status=Bracket.FINISHED,
             )
-            await asyncio.sleep(player.reconnection_time)
+        else:
+            finished["match"] = MatchResult(
+                winner_profile_id=winner.profile_id,
+                loser_profile_id=loser.profile_id,
+                winners_score=winner.bumper.score,
+                losers_score=loser.bumper.score,
+                elo_change=elo_change,
+                winners_elo=winner.elo,
+                losers_elo=loser.elo,
+            )
+        await self._do_after_match_cleanup(match, finished)
+
+    def _run_in_background(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
 
-            # if we reach here,  player didn't reconnect
-            player.reconnection_time = 0.0
+    def _start_replay(self, match: MultiplayerPongMatch):
+        """Replays are recorded for the matches that are saved in the match history, not for tournament games."""
+        if match.is_in_tournament:
+            return
+        match.replay = ReplayRecorder.open(match.id)
+        if match.replay:
+            match.replay.record_keyframe(match)
+
+    def _start_game_loop_if_needed(self):
+        if self.game_loop_task is None or self.game_loop_task.done():
+            self.game_loop_task = asyncio.create_task(self._game_loop_task())
+
+    def _fire_timers(self, current_time: float):
+        for timer in self.timers.advance(current_time):
+            try:
+                timer.callback(*timer.args)
+            except Exception:  # noqa: BLE001, PERF203
+                logger.critical(traceback.format_exc())
+
+    def _start_waiting_for_players_timer(self, match: MultiplayerPongMatch, current_time: float):
+        logger.info("[GameWorker]: waiting for players to connect to the game {%s}", match)
+        match.waiting_for_players_timer = self.timers.schedule(
+            current_time,
+            WAITING_FOR_PLAYERS_TIME,
+            self._on_waiting_for_players_timeout,
+            match,
+        )
 
-            if match.status == MultiplayerPongMatchStatus.FINISHED:
-                logger.info(
-                    "[GameWorker]: reconnection timeout for finished game {%s}",
-                    match.id,
+    def _stop_waiting_for_players_timer(self, match: MultiplayerPongMatch):
+        self.timers.cancel(match.waiting_for_players_timer)
+        match.waiting_for_players_timer = None
+
+    def _on_waiting_for_players_timeout(self, match: MultiplayerPongMatch):
+        match.waiting_for_players_timer = None
+        if len(match.get_players_based_on_connection(PlayerConnectionState.CONNECTED)) < PLAYERS_REQUIRED:
+            self._run_in_background(self._close_unstarted_match_task(match))
+
+    async def _close_unstarted_match_task(self, match: MultiplayerPongMatch):
+        """
+        Cancels the game if the players did not manage to connect in time.
+        Tournament game is won by the player who has connected.
+        """
+        try:
+            finished = None
+            if not match.is_in_tournament:
+                await self._send_to_game_room(
+                    match,
+                    GameServerToClient.GameCancelled(
+                        type="worker_to_client_close",
+                        action="game_cancelled",
+                        tournament_id=match.tournament_id,
+                        close_code=CloseCodes.CANCELLED,
+                    ),
                 )
-                return
+            else:
+                winner = match.get_player_who_connected_earliest()
+                loser = match.get_other_player(winner.id)
+                await self._send_to_game_room(
+                    match,
+                    GameServerToClient.PlayerWon(
+                        type="worker_to_client_close",
+                        action="player_resigned",
+                        winner=winner.as_dict(),
+                        loser=loser.as_dict(),
+                        elo_change=0,
+                        tournament_id=match.tournament_id,
+                        close_code=CloseCodes.CANCELLED,
+                    ),
+                )
+                finished = FinishedGameRoom(
+                    game_room_id=str(match),
+                    date=timezone.now().isoformat(),
+                    bracket=BracketResult(
+                        bracket_id=match.bracket_id,
+                        tournament_id=str(match.tournament_id),
+                        winner_profile_id=winner.profile_id,
+                        winners_score=0,
+                        losers_score=0,
+                        status=Bracket.FINISHED,
+                    ),
+                )
+            await self._do_after_match_cleanup(match, finished)
+            logger.info("[GameWorker]: players didn't connect to the game {%s}. Closing", match)
+        except Exception:  # noqa: BLE001
+            logger.critical(traceback.format_exc())
+
+    def _start_reconnection_timer(self, match: MultiplayerPongMatch, player: Player, current_time: float):
+        logger.info(
+            "[GameWorker]: waiting for player {%s} to reconnect to game {%s} ({%.1f}s remaining)",
+            player.id,
+            match.id,
+            player.reconnection_time,
+        )
+        player.reconnection_timer = self.timers.schedule(
+            current_time,
+            player.reconnection_time,
+            self._on_reconnection_timeout,
+            match,
+            player,
+        )
+
+    def _stop_reconnection_timer(self, player: Player, current_time: float):
+        """Player has reconnected, the time that is left is kept for the next disconnection."""
+        if player.reconnection_timer is None:
+            return
+        player.reconnection_time = player.get_remaining_reconnection_time(current_time)
+        self.timers.cancel(player.reconnection_timer)
+        player.reconnection_timer = None
+        logger.info(
+            "[GameWorker]: reconnection timer cancelled for player {%s} with {%.1f}s remaining",
+            player.id,
+            player.reconnection_time,
+        )
+
+    def _on_reconnection_timeout(self, match: MultiplayerPongMatch, player: Player):
+        player.reconnection_timer = None
+        player.reconnection_time = 0.0
+        if match.status == MultiplayerPongMatchStatus.FINISHED:
+            logger.info("[GameWorker]: reconnection timeout for finished game {%s}", match.id)
+            return
+
+        match.status = MultiplayerPongMatchStatus.FINISHED
+        self._run_in_background(self._resign_by_timeout_task(match, player))
 
-            match.status = MultiplayerPongMatchStatus.FINISHED
+    async def _resign_by_timeout_task(self, match: MultiplayerPongMatch, player: Player):
+        try:
             winner = match.get_other_player(player.id)
-            match_db = await self._write_result_to_db(winner, player, match, "finished")
-            if not match_db:
-                logger.warning("[GameWorker]: match couldn't be recorded to the database")
-            await self._send_player_won_event(
-                match,
-                "player_resigned",
-                winner,
-                player,
-                match_db.elo_change if match_db and not match.is_in_tournament else 0,
-            )
-            await self._do_after_match_cleanup(match, True)
+            await self._finish_match(match, winner, player, "player_resigned")
             logger.info(
                 "[GameWorker]: player {%s} resigned by timeout in game {%s}. Winner is {%s}",
                 player.id,
                 match.id,
                 winner.id,
             )
-
-        except asyncio.CancelledError:
-            # player reconnected
-            elapsed = asyncio.get_event_loop().time() - start_time
-            player.reconnection_time = max(0.0, initial_time - elapsed)
-            logger.info(
-                "[GameWorker]: reconnection timer cancelled for player {%s} with {%.1f}s remaining",
-                player.id,
-                player.reconnection_time,
-            )
-            raise
         except Exception:  # noqa: BLE001
             logger.critical(traceback.format_exc())
 
+    def _start_time_limit_timer(self, match: MultiplayerPongMatch, current_time: float):
+        """Time limit runs only while the match is ongoing, the pauses are not counted."""
+        if match.time_limit_reached:
+            return
+        elapsed_seconds = current_time - match.start_time - match.total_paused_time
+        match.time_limit_timer = self.timers.schedule(
+            current_time,
+            match.time_limit_in_seconds - elapsed_seconds,
+            self._on_time_limit,
+            match,
+        )
+
+    def _stop_time_limit_timer(self, match: MultiplayerPongMatch):
+        self.timers.cancel(match.time_limit_timer)
+        match.time_limit_timer = None
+
     ##### PLAYER MANAGEMENT METHODS #####
     async def _add_player_and_create_pending_match(self, event: GameServerToGameWorker.PlayerConnected):
         player_id = event["player_id"]
@@ -1340,7 +2393,9 @@ class GameWorkerConsumer(AsyncConsumer):
             bracket_id,
             tournament_id,
         )
-        match.waiting_for_players_timer = asyncio.create_task(self._wait_for_both_player_task(match))
+        match.drained_channels = event.get("drained_channels", [])
+        self._start_waiting_for_players_timer(match, asyncio.get_event_loop().time())
+        self._start_game_loop_if_needed()
         player = match.add_player(event)
         await self._send_player_id_and_number_to_player(player, match)
         logger.info(
@@ -1354,15 +2409,17 @@ class GameWorkerConsumer(AsyncConsumer):
         match: MultiplayerPongMatch,
         event: GameServerToGameWorker.PlayerConnected,
     ):
-        """Cancels waiting for players timer, and starts the game loop for this match."""
+        """Cancels waiting for players timer, and starts the time limit of this match."""
         player_id = event["player_id"]
-        match.stop_waiting_for_players_timer()
+        self._stop_waiting_for_players_timer(match)
         player = match.add_player(event)
         await self._send_player_id_and_number_to_player(player, match)
         match.status = MultiplayerPongMatchStatus.ONGOING
-        match.game_loop_task = asyncio.create_task(self._match_game_loop_task(match))
-        await self.channel_layer.group_send(
-            self._to_game_room_group_name(match),
+        self._start_time_limit_timer(match, asyncio.get_event_loop().time())
+        self._start_replay(match)
+        self._start_game_loop_if_needed()
+        await self._send_to_game_room(
+            match,
             GameServerToClient.GameStarted(type="worker_to_client_open", action="game_started"),
         )
         logger.info("[GameWorker]: player {%s} has been added to existing game {%s}", player_id, match.id)
@@ -1380,8 +2437,9 @@ class GameWorkerConsumer(AsyncConsumer):
                 match,
             )
             return
-        player.set_as_connected(asyncio.get_event_loop().time())
-        player.stop_waiting_for_reconnection_timer()
+        current_time = asyncio.get_event_loop().time()
+        player.set_as_connected(current_time)
+        self._stop_reconnection_timer(player, current_time)
         await self._send_player_id_and_number_to_player(player, match)
         if not len(match.get_players_based_on_connection(PlayerConnectionState.DISCONNECTED)):
             await self._unpause(match)
@@ -1404,20 +2462,130 @@ class GameWorkerConsumer(AsyncConsumer):
         )
 
     ##### MATCH MANAGEMENT METHODS #####
-    async def _do_after_match_cleanup(self, match: MultiplayerPongMatch, should_cancel: bool):
+    async def _do_after_match_cleanup(self, match: MultiplayerPongMatch, finished: FinishedGameRoom | None = None):
         """
-        Cleans the match from the memory of the worker. Marks GameRoom in the database as closed.
-        `should_cancel` indicates if the match task should be cancelled. Should not be True when the match
-        can be allowed to end naturally, for example, if a player can win.
+        Cleans the match from the memory of the worker, so the game loop doesn't tick it anymore.
+        Submits the result of the match to the writer, which closes GameRoom in the database. Without the result, the
+        game room is only closed.
         """
+        match.status = MultiplayerPongMatchStatus.FINISHED
         self.matches.pop(str(match), None)
-        if match.game_loop_task and not match.game_loop_task.cancelled() and should_cancel:
-            match.game_loop_task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await match.game_loop_task
-        game_room_db: GameRoom = await database_sync_to_async(GameRoom.objects.get)(id=match.id)
-        game_room_db.status = GameRoom.CLOSED
-        await database_sync_to_async(game_room_db.save)()
+        for timer in match.get_timers():
+            self.timers.cancel(timer)
+        if match.replay:
+            match.replay.close()
+            match.replay = None
+        for channel_name in [channel_name for channel_name, path in match.spectators.items() if path is None]:
+            await self.channel_layer.group_discard(self._to_spectator_states_group_name(match), channel_name)
+        if finished is None:
+            finished = FinishedGameRoom(game_room_id=str(match), date=timezone.now().isoformat())
+        self._get_result_writer().submit(finished)
+        for channel_name in match.drained_channels:
+            await self.channel_layer.send(
+                channel_name,
+                GameWorkerControl.ForwardedGameFinished(
+                    type="worker_forwarded_game_finished",
+                    game_room_id=str(match),
+                ),
+            )
+        await self._notify_if_drained()
+
+    async def _save_snapshot_if_needed(self, current_time: float, force: bool = False):
+        if self.snapshot_store is None or not (force or self.snapshot_store.is_due(current_time)):
+            return
+        await self.snapshot_store.save(
+            current_time,
+            [
+                match.get_snapshot(current_time)
+                for match in self.matches.values()
+                if match.status != MultiplayerPongMatchStatus.FINISHED
+            ],
+        )
+
+    async def _restore_matches(self):
+        """
+        Resumes the matches from the snapshot that was left by the previous run of the worker.
+        Matches continue in the state they had, their timers are started again. If the snapshot is too old, the
+        matches are not resumed, and their game rooms are closed.
+        """
+        self.snapshot_store = MatchSnapshotStore.for_worker(self.scope["channel"])
+        worker_snapshot = self.snapshot_store.load()
+        if not worker_snapshot:
+            return
+
+        if time.time() - worker_snapshot["saved_at"] > SNAPSHOT_MAX_AGE:
+            for snapshot in worker_snapshot["matches"]:
+                self._get_result_writer().submit(
+                    FinishedGameRoom(game_room_id=snapshot["id"], date=timezone.now().isoformat()),
+                )
+            logger.warning(
+                "[GameWorker]: snapshot is too old, {%s} matches were closed",
+                len(worker_snapshot["matches"]),
+            )
+            return
+
+        # matches that have finished after the last snapshot
+        finished_game_room_ids = {finished["game_room_id"] for finished in self._get_result_writer().pending}
+        finished_game_room_ids.update(
+            str(game_room_id)
+            for game_room_id in await database_sync_to_async(list)(
+                GameRoom.objects.filter(
+                    id__in=[snapshot["id"] for snapshot in worker_snapshot["matches"]],
+                    status=GameRoom.CLOSED,
+                ).values_list("id", flat=True),
+            )
+        )
+
+        current_time = asyncio.get_event_loop().time()
+        for snapshot in worker_snapshot["matches"]:
+            if snapshot["id"] in finished_game_room_ids:
+                continue
+            try:
+                match = MultiplayerPongMatch.from_snapshot(snapshot, current_time)
+            except (KeyError, ValueError, TypeError):  # noqa: PERF203
+                logger.critical(
+                    "[GameWorker]: match {%s} can't be restored\n%s",
+                    snapshot.get("id"),
+                    traceback.format_exc(),
+                )
+                continue
+            self.matches[match.id] = match
+            for player in match.get_players():
+                if player.tick_socket_path and not await self.local_ticks.connect(player.tick_socket_path):
+                    player.tick_socket_path = None
+            if match.status == MultiplayerPongMatchStatus.PENDING:
+                self._start_waiting_for_players_timer(match, current_time)
+            else:
+                self._start_replay(match)
+            if match.status == MultiplayerPongMatchStatus.ONGOING:
+                self._start_time_limit_timer(match, current_time)
+            elif match.status == MultiplayerPongMatchStatus.PAUSED:
+                for player in match.get_players_based_on_connection(PlayerConnectionState.DISCONNECTED):
+                    self._start_reconnection_timer(match, player, current_time)
+            logger.info("[GameWorker]: game {%s} was restored from the snapshot", match)
+        if self.matches:
+            self._start_game_loop_if_needed()
+
+    def _get_result_writer(self) -> MatchResultWriter:
+        """Creates the writer on the first event, when the channel of the worker is known, and replays its spool."""
+        if self.result_writer is None:
+            self.result_writer = MatchResultWriter(get_spool_path(self.scope["channel"]), self._on_results_written)
+            self.result_writer.load_spool()
+        return self.result_writer
+
+    async def _on_results_written(self, written: list[FinishedGameRoom]):
+        # tournament worker reads the brackets from the database, so it's notified only after they are written
+        for finished in written:
+            if bracket := finished.get("bracket"):
+                await self.channel_layer.send(
+                    "tournament",
+                    {
+                        "type": "tournament_game_finished",
+                        "tournament_id": bracket["tournament_id"],
+                        "bracket_id": bracket["bracket_id"],
+                    },
+                )
+        await self._notify_if_drained()
 
     async def _pause(
         self,
@@ -1425,9 +2593,10 @@ class GameWorkerConsumer(AsyncConsumer):
         disconnected_player: Player,
     ):
         match.pause_start_time = asyncio.get_event_loop().time()
+        self._stop_time_limit_timer(match)
 
-        await self.channel_layer.group_send(
-            self._to_game_room_group_name(match),
+        await self._send_to_game_room(
+            match,
             GameServerToClient.GamePaused(
                 type="worker_to_client_open",
                 action="game_paused",
@@ -1436,7 +2605,6 @@ class GameWorkerConsumer(AsyncConsumer):
             ),
         )
         match.status = MultiplayerPongMatchStatus.PAUSED
-        match.pause_event.clear()
         logger.info("[GameWorker]: game {%s} has been paused", match.id)
 
     async def _unpause(self, match: MultiplayerPongMatch):
@@ -1444,50 +2612,18 @@ class GameWorkerConsumer(AsyncConsumer):
             logger.warning("[GameWorker]: game {%s} can't be unpaused, as it was not paused", match.id)
             return
 
-        pause_duration = asyncio.get_event_loop().time() - match.pause_start_time
-        match.total_paused_time += pause_duration
+        current_time = asyncio.get_event_loop().time()
+        match.total_paused_time += current_time - match.pause_start_time
         match.pause_start_time = 0.0
+        self._start_time_limit_timer(match, current_time)
 
-        await self.channel_layer.group_send(
-            self._to_game_room_group_name(match),
+        await self._send_to_game_room(
+            match,
             GameServerToClient.GameUnpaused(type="worker_to_client_open", action="game_unpaused"),
         )
         match.status = MultiplayerPongMatchStatus.ONGOING
-        if not match.pause_event.is_set():
-            match.pause_event.set()
         logger.info("[GameWorker]: game {%s} has been unpaused", match.id)
 
-    async def _write_result_to_db(
-        self,
-        winner: Player,
-        loser: Player,
-        match: MultiplayerPongMatch,
-        status: Literal["finished", "cancelled"],
-    ) -> Match | Bracket | None:
-        if not match.is_in_tournament:
-            match_result = await database_sync_to_async(Match.objects.resolve)(
-                winner_profile_or_id=winner.profile_id,
-                loser_profile_or_id=loser.profile_id,
-                winners_score=winner.bumper.score,
-                losers_score=loser.bumper.score,
-                ranked=match.ranked,
-            )
-            if not match_result:
-                return None
-
-            match_db, winner_db, loser_db = match_result
-            winner.elo = winner_db.elo
-            loser.elo = loser_db.elo
-            return match_db
-
-        return await database_sync_to_async(Bracket.objects.update_finished_bracket)(
-            bracket_id=match.bracket_id,
-            winner_profile_id=winner.profile_id,
-            winners_score=winner.bumper.score,
-            losers_score=loser.bumper.score,
-            status=status,
-        )
-
     async def _send_player_won_event(
         self,
         match: MultiplayerPongMatch,
@@ -1496,8 +2632,8 @@ class GameWorkerConsumer(AsyncConsumer):
         loser: Player,
         elo_change: int,
     ):
-        await self.channel_layer.group_send(
-            self._to_game_room_group_name(match),
+        await self._send_to_game_room(
+            match,
             GameServerToClient.PlayerWon(
                 type="worker_to_client_close",
                 action=action,
@@ -1509,20 +2645,82 @@ class GameWorkerConsumer(AsyncConsumer):
             ),
         )
 
-        # Special case: notification for the tournament consumer.
-        if match.is_in_tournament:
-            await self.channel_layer.send(
-                "tournament",
-                {
-                    "type": "tournament_game_finished",
-                    "tournament_id": str(match.tournament_id),
-                    "bracket_id": match.bracket_id,
-                },
-            )
+    ##### WORKER SHARDING METHODS #####
+    async def _forward_to_other_worker(self, event: dict) -> bool:
+        """Forwards the event of the game room that was handed over to another worker. Returns True if it was."""
+        self._forget_expired_handed_off_game_rooms()
+        channel_name = self.forwarded_game_rooms.get(event["game_room_id"])
+        if channel_name is None:
+            return False
+        await self.channel_layer.send(channel_name, event)
+        return True
+
+    async def _hand_over_to_other_worker(self, event: GameServerToGameWorker.PlayerConnected) -> bool:
+        """
+        Passes the new game room to the next worker on the ring, skipping the workers that are draining or overloaded
+        as well.
+        Returns False if there is no worker left to take it.
+        """
+        game_room_id = event["game_room_id"]
+        drained_channels = [*event.get("drained_channels", []), self.scope["channel"]]
+        channel_name = get_game_worker_ring().get_channel_name(game_room_id, excluded=drained_channels)
+        if channel_name is None:
+            logger.warning("[GameWorker]: no other worker can take over the game {%s}", game_room_id)
+            return False
+
+        self.forwarded_game_rooms[game_room_id] = channel_name
+        self._handed_off_game_rooms_expiry.append((time.monotonic() + HANDED_OFF_GAME_ROOM_TTL, game_room_id))
+        await self.channel_layer.send(channel_name, {**event, "drained_channels": drained_channels})
+        logger.info("[GameWorker]: game {%s} was handed over to the worker {%s}", game_room_id, channel_name)
+        return True
+
+    def _forget_expired_handed_off_game_rooms(self):
+        """The worker isn't told when the match it handed over finishes, so the game room is forgotten after a TTL."""
+        expiry = self._handed_off_game_rooms_expiry
+        current_time = time.monotonic()
+        while expiry and expiry[0][0] <= current_time:
+            _, game_room_id = expiry.popleft()
+            self.forwarded_game_rooms.pop(game_room_id, None)
+            self.refused_game_rooms.discard(game_room_id)
+
+    async def _notify_if_drained(self):
+        """
+        Worker is drained when it has no matches and all of their results are in the database. The matches it handed
+        over have to finish as well, because the events of their game rooms still come to this worker and are forwarded.
+        """
+        self._forget_expired_handed_off_game_rooms()
+        if not self.is_draining or self.matches or self.forwarded_game_rooms or not self.drain_reply_channel:
+            return
+        if self.result_writer and self.result_writer.pending:
+            return
+        await self.channel_layer.send(
+            self.drain_reply_channel,
+            GameWorkerControl.Drained(type="worker_drained", channel_name=self.scope["channel"]),
+        )
+        self.drain_reply_channel = None
+        logger.info("[GameWorker]: worker {%s} has been drained", self.scope["channel"])
+
+    async def _send_to_game_room(
+        self,
+        match: MultiplayerPongMatch,
+        event: GameServerToClient.WorkerToClientOpen | GameServerToClient.WorkerToClientClose,
+    ):
+        """Sends the event to the players of the match, and to its spectators if it has any."""
+        await self.channel_layer.group_send(self._to_game_room_group_name(match), event)
+        if match.spectators:
+            await self.channel_layer.group_send(self._to_spectators_group_name(match), event)
 
     # To avoid typing errors.
     def _to_game_room_group_name(self, match: MultiplayerPongMatch):
         return f"game_room_{match}"
 
+    def _to_spectators_group_name(self, match: MultiplayerPongMatch):
+        """Group of all spectators of the match, for the events of the match. See `GameSpectatorConsumer`."""
+        return f"game_room_{match}_spectators"
+
+    def _to_spectator_states_group_name(self, match: MultiplayerPongMatch):
+        """Group of the spectators who receive the states through the channel layer."""
+        return f"game_room_{match}_spectator_states"
+
     def _to_player_group_name(self, player_id: str):
         return f"player_{player_id}"
@@ -1,12 +1,17 @@
+import asyncio
 import json
 import logging
 from typing import TYPE_CHECKING
 
-from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
 
 from common.close_codes import CloseCodes
-from common.guarded_websocket_consumer import GuardedWebsocketConsumer
+from common.guarded_websocket_consumer import AsyncGuardedWebsocketConsumer
+from pong import local_tick_transport
+from pong.binary_protocol import BINARY_STATE_SUBPROTOCOL, StateEncoder
+from pong.consumers.game_worker import GAME_TICK_INTERVAL
 from pong.game_protocol import ClientToGameServer, GameServerToClient, GameServerToGameWorker
+from pong.game_worker_shards import get_game_worker_channel_name
 from pong.models import GameRoom, GameRoomPlayer
 
 if TYPE_CHECKING:
@@ -15,28 +20,72 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger("server")
 
+PING_INTERVAL = 1.0
 
-class GameServerConsumer(GuardedWebsocketConsumer):
+
+class GameServerConsumer(AsyncGuardedWebsocketConsumer):
     """
     Interface between game worker, which runs an actual game, and the client.
     Sends to the worker events of player inputs and their connecction state for handling.
     Sends to the client the data it receives from the game worker.
+    If the client requested the binary subprotocol, states of the game are sent as binary delta frames instead of JSON.
+    The consumer is async, so inputs and states are passed without taking a thread. Only `connect` and `disconnect`
+    go to the database.
+    Inputs are coalesced per tick window: the first input of the window is sent to the worker immediately, and the
+    consecutive inputs that come after it during the window are sent together as one `player_inputs_batched` event.
+    The consumer pings the client every `PING_INTERVAL` seconds and sends the measured round trip time to the worker.
     """
 
-    def connect(self):
+    async def connect(self):
         self.player: None | GameRoomPlayer = None
         self.user: None | User = self.scope.get("user")
         self.game_room_id: str = self.scope["url_route"]["kwargs"]["game_room_id"]
         self.game_room_group_name = f"game_room_{self.game_room_id}"
-        self.accept()
-        self.init_rate_limiter(
-            *GuardedWebsocketConsumer.RateLimits.GAME_CONSUMER)
+        self.game_worker_channel_name = get_game_worker_channel_name(self.game_room_id)
+        self.state_encoder: StateEncoder | None = None
+        self.pending_inputs: GameServerToGameWorker.PlayerInputsBatched | None = None
+        self.input_window: asyncio.Task | None = None
+        self.ping_task: asyncio.Task | None = None
+        self.ping_id = 0
+        self.ping_sent_at: float | None = None
+        if BINARY_STATE_SUBPROTOCOL in self.scope.get("subprotocols", []):
+            self.state_encoder = StateEncoder()
+            await self.accept(subprotocol=BINARY_STATE_SUBPROTOCOL)
+        else:
+            await self.accept()
+        self.init_rate_limiter(*AsyncGuardedWebsocketConsumer.RateLimits.GAME_CONSUMER)
         if not self.user:
-            logger.warning(
-                "[GameRoom.connect]: unauthorized user tried to join game room {%s}", self.game_room_id)
-            self.close(CloseCodes.ILLEGAL_CONNECTION)
+            logger.warning("[GameRoom.connect]: unauthorized user tried to join game room {%s}", self.game_room_id)
+            await self.close(CloseCodes.ILLEGAL_CONNECTION)
             return
 
+        close_code = await self._join_game_room()
+        if close_code is not None:
+            await self.close(close_code)
+            return
+
+        logger.info(
+            "[GameRoom.connect]: user {%s} successefully joined game room {%s}. Player id of the user is {%s}",
+            self.user.profile,
+            self.game_room_id,
+            str(self.player.id),
+        )
+        await self.channel_layer.group_add(self.game_room_group_name, self.channel_name)
+        await self.channel_layer.group_add(f"player_{self.player.id}", self.channel_name)
+        self.player_connected_event["tick_socket_path"] = await local_tick_transport.register_consumer(
+            self.game_room_id,
+            self,
+        )
+        await self.channel_layer.send(self.game_worker_channel_name, self.player_connected_event)
+        self.ping_task = asyncio.create_task(self._ping_task())
+
+    @database_sync_to_async
+    def _join_game_room(self) -> CloseCodes | None:
+        """
+        All the database work of `connect` in one thread hop: finds the game room and the players, counts the
+        connection and prepares `player_connected_event` for the worker.
+        Returns the close code if the user can't join the game room.
+        """
         game_room_qs: GameRoom = GameRoom.objects.for_id(self.game_room_id)
         if not game_room_qs.exists():
             logger.warning(
@@ -44,34 +93,27 @@ class GameServerConsumer(GuardedWebsocketConsumer):
                 self.user.profile,
                 self.game_room_id,
             )
-            self.close(CloseCodes.ILLEGAL_CONNECTION)
-            return
+            return CloseCodes.ILLEGAL_CONNECTION
 
-        self.game_room: GameRoom = game_room_qs.for_players(
-            self.user.profile).for_ongoing_status().first()
+        self.game_room: GameRoom = game_room_qs.for_players(self.user.profile).for_ongoing_status().first()
         if not self.game_room:
             logger.warning(
                 "[GameRoom.connect]: illegal user {%s} tried to join game room {%s}",
                 self.user.profile,
                 self.game_room_id,
             )
-            self.close(CloseCodes.ILLEGAL_CONNECTION)
-            return
+            return CloseCodes.ILLEGAL_CONNECTION
 
-        self.players = list(GameRoomPlayer.objects.select_related(
-            "profile").filter(game_room=self.game_room))
+        self.players = list(GameRoomPlayer.objects.select_related("profile__user").filter(game_room=self.game_room))
         try:
-            self.player = next(
-                player for player in self.players if player.profile == self.user.profile)
-            self.opponent = next(
-                player for player in self.players if player.profile != self.user.profile)
+            self.player = next(player for player in self.players if player.profile == self.user.profile)
+            self.opponent = next(player for player in self.players if player.profile != self.user.profile)
         except StopIteration:
             logger.warning(
                 "[GameRoom.connect]: invalid game room {%s}: player or opponent are missing",
                 self.game_room_id,
             )
-            self.close(CloseCodes.NORMAL_CLOSURE)
-            return
+            return CloseCodes.NORMAL_CLOSURE
 
         self.player.inc_number_of_connections()
         if self.player.number_of_connections > 1:
@@ -80,21 +122,9 @@ class GameServerConsumer(GuardedWebsocketConsumer):
                 self.user.profile,
                 self.game_room_id,
             )
-            self.close(CloseCodes.ALREADY_IN_GAME)
-            return
+            return CloseCodes.ALREADY_IN_GAME
 
-        logger.info(
-            "[GameRoom.connect]: user {%s} successefully joined game room {%s}. Player id of the user is {%s}",
-            self.user.profile,
-            self.game_room_id,
-            str(self.player.id),
-        )
         profile = self.user.profile
-        player_id = str(self.player.id)
-        async_to_sync(self.channel_layer.group_add)(
-            self.game_room_group_name, self.channel_name)
-        async_to_sync(self.channel_layer.group_add)(
-            f"player_{player_id}", self.channel_name)
         is_in_tournament = self.game_room.is_in_tournament()
         if is_in_tournament:
             bracket: Bracket = self.game_room.bracket
@@ -111,33 +141,38 @@ class GameServerConsumer(GuardedWebsocketConsumer):
             opponents_name = opponents_user.nickname if opponents_user.nickname else opponents_user.username
             bracket_id = None
             tournament_id = None
-        async_to_sync(self.channel_layer.send)(
-            "game",
-            GameServerToGameWorker.PlayerConnected(
-                type="player_connected",
-                game_room_id=self.game_room_id,
-                player_id=player_id,
-                profile_id=str(profile.id),
-                name=name,
-                opponents_name=opponents_name,
-                avatar=profile.avatar,
-                elo=profile.elo,
-                settings=self.game_room.settings,
-                is_in_tournament=is_in_tournament,
-                bracket_id=bracket_id,
-                tournament_id=tournament_id,
-            ),
+        self.player_connected_event = GameServerToGameWorker.PlayerConnected(
+            type="player_connected",
+            game_room_id=self.game_room_id,
+            player_id=str(self.player.id),
+            profile_id=str(profile.id),
+            name=name,
+            opponents_name=opponents_name,
+            avatar=profile.avatar,
+            elo=profile.elo,
+            settings=self.game_room.settings,
+            is_in_tournament=is_in_tournament,
+            bracket_id=bracket_id,
+            tournament_id=tournament_id,
+            tick_socket_path=None,
         )
+        return None
 
-    def disconnect(self, close_code):
+    async def disconnect(self, close_code):
+        if self.ping_task:
+            self.ping_task.cancel()
+            self.ping_task = None
         if close_code == CloseCodes.ILLEGAL_CONNECTION or not self.player:
             return
 
-        async_to_sync(self.channel_layer.group_discard)(
-            self.game_room_group_name, self.channel_name)
-        async_to_sync(self.channel_layer.group_discard)(
-            f"player_{str(self.player.id)}", self.channel_name)
-        self.player.dec_number_of_connections()
+        if self.input_window:
+            self.input_window.cancel()
+            self.input_window = None
+        await self._flush_inputs()
+        await self.channel_layer.group_discard(self.game_room_group_name, self.channel_name)
+        await self.channel_layer.group_discard(f"player_{self.player.id}", self.channel_name)
+        local_tick_transport.unregister_consumer(self.game_room_id, self)
+        await database_sync_to_async(self.player.dec_number_of_connections)()
         if close_code == CloseCodes.NORMAL_CLOSURE:
             logger.info(
                 "[GameRoom.disconnect]: player {%s} has been disconnected from the game room {%s} normally",
@@ -151,8 +186,8 @@ class GameServerConsumer(GuardedWebsocketConsumer):
         if close_code == CloseCodes.ALREADY_IN_GAME:
             return
 
-        async_to_sync(self.channel_layer.send)(
-            "game",
+        await self.channel_layer.send(
+            self.game_worker_channel_name,
             GameServerToGameWorker.PlayerDisconnected(
                 type="player_disconnected",
                 game_room_id=self.game_room_id,
@@ -165,11 +200,11 @@ class GameServerConsumer(GuardedWebsocketConsumer):
             self.game_room_id,
         )
 
-    def receive(self, text_data):
+    async def receive(self, text_data):
         try:
             text_data_json = json.loads(text_data)
         except json.JSONDecodeError:
-            self.close(CloseCodes.BAD_DATA)
+            await self.close(CloseCodes.BAD_DATA)
             logger.warning(
                 "[GameRoom.receive]: user {%s} sent invalid json to the game room {%s}",
                 self.user.profile,
@@ -178,7 +213,7 @@ class GameServerConsumer(GuardedWebsocketConsumer):
             return
 
         if not self.check_rate_limit():
-            self.close(CloseCodes.BAD_DATA)
+            await self.close(CloseCodes.BAD_DATA)
             logger.warning(
                 "[GameRoom.receive]: user {%s} has exceeded the rate limit",
                 self.user.profile,
@@ -193,20 +228,16 @@ class GameServerConsumer(GuardedWebsocketConsumer):
                 "timestamp": int(timestamp),
             }:
                 text_data_json: ClientToGameServer.MoveLeft | ClientToGameServer.MoveRight
-                async_to_sync(self.channel_layer.send)(
-                    "game",
-                    GameServerToGameWorker.PlayerInputed(
-                        type="player_inputed",
-                        action=action,
-                        game_room_id=self.game_room_id,
-                        player_id=player_id,
-                        move_id=move_id,
-                        timestamp=timestamp,
-                    ),
-                )
+                await self._add_input(action, player_id, move_id, timestamp)
+
+            case {"action": "state_ack", "frame": int(frame)} if self.state_encoder:
+                self.state_encoder.acknowledge(frame)
+
+            case {"action": "pong", "ping_id": int(ping_id)}:
+                await self._measure_rtt(ping_id)
 
             case unknown:
-                self.close(CloseCodes.BAD_DATA)
+                await self.close(CloseCodes.BAD_DATA)
                 logger.warning(
                     "[GameRoom.receive]: user {%s} sent an invalid action {%s} to the game room {%s}",
                     self.user.profile,
@@ -214,19 +245,90 @@ class GameServerConsumer(GuardedWebsocketConsumer):
                     self.game_room_id,
                 )
 
+    async def _add_input(self, action: str, player_id: str, move_id: int, timestamp: int):
+        pending = self.pending_inputs
+        if (
+            pending
+            and pending["action"] == action
+            and pending["player_id"] == player_id
+            and pending["last_move_id"] + 1 == move_id
+        ):
+            pending["last_move_id"] = move_id
+            pending["last_timestamp"] = timestamp
+            return
+
+        # batch holds only the run of consecutive moves of the same action, anything else starts a new one
+        await self._flush_inputs()
+        self.pending_inputs = GameServerToGameWorker.PlayerInputsBatched(
+            type="player_inputs_batched",
+            action=action,
+            game_room_id=self.game_room_id,
+            player_id=player_id,
+            first_move_id=move_id,
+            last_move_id=move_id,
+            first_timestamp=timestamp,
+            last_timestamp=timestamp,
+        )
+        if self.input_window is None:
+            await self._flush_inputs()
+            self.input_window = asyncio.create_task(self._close_input_window())
+
+    async def _flush_inputs(self):
+        if self.pending_inputs:
+            pending, self.pending_inputs = self.pending_inputs, None
+            await self.channel_layer.send(self.game_worker_channel_name, pending)
+
+    async def _close_input_window(self):
+        """Sends the batch at the end of the window. The window stays open while the player keeps sending inputs."""
+        while True:
+            await asyncio.sleep(GAME_TICK_INTERVAL)
+            if not self.pending_inputs:
+                self.input_window = None
+                return
+            await self._flush_inputs()
+
+    async def _ping_task(self):
+        """Only the last ping is awaited: the pong that comes after the next ping is too late to be measured."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            self.ping_id += 1
+            self.ping_sent_at = loop.time()
+            await self.send(text_data=json.dumps(GameServerToClient.Ping(action="ping", ping_id=self.ping_id)))
+
+    async def _measure_rtt(self, ping_id: int):
+        if ping_id != self.ping_id or self.ping_sent_at is None:
+            return
+        rtt = asyncio.get_running_loop().time() - self.ping_sent_at
+        self.ping_sent_at = None
+        await self.channel_layer.send(
+            self.game_worker_channel_name,
+            GameServerToGameWorker.PlayerRttMeasured(
+                type="player_rtt_measured",
+                game_room_id=self.game_room_id,
+                player_id=str(self.player.id),
+                rtt=rtt,
+            ),
+        )
+
     ##############################
     # GAME WORKER EVENT HANDLERS #
     ##############################
     # Simple handlers to propagate data from the game worker to the clients.
     # The handlers filter out "type" key from the dicts to avoid leaking implementation details.
     # DO NOT CALL THE `del` ON `type` KEY. This breaks Django Channels.
-    def worker_to_client_close(self, event: GameServerToClient.WorkerToClientClose):
+    async def worker_to_client_close(self, event: GameServerToClient.WorkerToClientClose):
         """Send data to the client and close connection."""
-        self.send(text_data=json.dumps(
-            {k: v for k, v in event.items() if k != "type"}))
-        self.close(event["close_code"])
+        await self.send(text_data=json.dumps({k: v for k, v in event.items() if k != "type"}))
+        await self.close(event["close_code"])
 
-    def worker_to_client_open(self, event: GameServerToClient.WorkerToClientOpen):
+    async def worker_to_client_open(self, event: GameServerToClient.WorkerToClientOpen):
         """Send data to the client without closing connection."""
-        self.send(text_data=json.dumps(
-            {k: v for k, v in event.items() if k != "type"}))
+        await self.send(text_data=json.dumps({k: v for k, v in event.items() if k != "type"}))
+
+    async def worker_to_client_state(self, event: GameServerToClient.WorkerToClientState):
+        """Send the state of the game, already serialized by the worker, to the client."""
+        if self.state_encoder:
+            await self.send(bytes_data=self.state_encoder.encode_packed(event["packed_state"]))
+        else:
+            await self.send(text_data=event["text"])
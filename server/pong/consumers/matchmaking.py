@@ -2,30 +2,30 @@ import json
 import logging
 
 from asgiref.sync import async_to_sync
-from django.db import transaction
 
 from common.close_codes import CloseCodes
 from common.guarded_websocket_consumer import GuardedWebsocketConsumer
-from pong.game_protocol import MatchmakingToClient
-from pong.models import GameRoom, GameRoomPlayer
+from pong.game_protocol import MatchmakingToMatchmakingWorker, MatchmakingWorkerToMatchmaking
+from pong.models import GameRoom
+from users.models.profile import start_matchmaking_search, stop_matchmaking_search
 
 logger = logging.getLogger("server")
 
 
-PLAYERS_REQUIRED = 2
+MATCHMAKING_WORKER_CHANNEL_NAME = "matchmaking"
 
 
 class MatchmakingConsumer(GuardedWebsocketConsumer):
     def connect(self):
         """
-        On connection, join existing pending game room with less than two players, or create a new one.
-        Pending game rooms always have at least one player.
-        To avoid race condition, locks the GameRoom and related objects with `.select_for_update()`.
-        Unfortunately, annotated objects cannot be locked, so `for_valid_game_room`, which uses them to find the
-        conforming room. The room is the re-fetched so to say, and revalidated.
+        On connection, starts the search of the player on the matchmaking worker, which pairs the searches with the
+        compatible settings in memory. Nothing is written to the database until the pair is found: then the worker
+        creates the ongoing game room for both players, and sends `game_found` to both of them.
+        The search is visible to `get_active_game_participation` while it waits. A new connection of the player takes
+        over the search of the previous one, which is closed by the worker.
         """
         self.user = self.scope.get("user")
-        self.game_room: GameRoom | None = None
+        self.is_searching = False
         self.accept()
         self.init_rate_limiter()
         if not self.user:
@@ -33,7 +33,8 @@ class MatchmakingConsumer(GuardedWebsocketConsumer):
             self.close(CloseCodes.ILLEGAL_CONNECTION)
             return
 
-        if any(self.user.profile.get_active_game_participation()):
+        *active_games, _ = self.user.profile.get_active_game_participation()
+        if any(active_games):
             logger.info("[Matchmaking.connect]: user {%s} is already involved in some game", self.user.profile)
             self.close(CloseCodes.ALREADY_IN_GAME)
             return
@@ -46,83 +47,39 @@ class MatchmakingConsumer(GuardedWebsocketConsumer):
             self.close(CloseCodes.BAD_DATA)
             return
 
-        with transaction.atomic():
-            self.game_room: GameRoom = self._with_db_lock_find_valid_game_room()
-
-            if not self.game_room:
-                self.game_room: GameRoom = GameRoom.objects.create(settings=self.game_room_settings)
-                game_room_player: GameRoomPlayer = self.game_room.add_player(self.user.profile)
-                logger.info("[Matchmaking.connect]: game room {%s} was created", self.game_room)
-
-            elif not self.game_room.has_player(self.user.profile):
-                game_room_player: GameRoomPlayer = self.game_room.add_player(self.user.profile)
-                logger.info(
-                    "[Matchmaking.connect]: game room {%s} added profile {%s}. Desired settings of the player: {%s}",
-                    self.game_room,
-                    self.user.profile,
-                    self.game_room_settings,
-                )
-
-            else:
-                game_room_player: GameRoomPlayer = GameRoomPlayer.objects.filter(
-                    game_room=self.game_room,
-                    profile=self.user.profile,
-                ).first()
-
-            logger.info(
-                "[Matchmaking.connect]: player {%s} connected to the game room {%s} {%s} times",
-                self.user.profile,
-                self.game_room,
-                game_room_player.number_of_connections,
-            )
-            self.matchmaking_group_name = f"matchmaking_{self.game_room.id}"
-            async_to_sync(self.channel_layer.group_add)(self.matchmaking_group_name, self.channel_name)
-
-            if self.game_room.players.count() == PLAYERS_REQUIRED:
-                self.game_room.set_ongoing()
-                self.game_room.resolve_settings(self.game_room_settings)
-                logger.info(
-                    "[Matchmaking.connect]: both players were found. Settings were resolved for the game room {%s} ",
-                    self.game_room,
-                )
-                async_to_sync(self.channel_layer.group_send)(
-                    self.matchmaking_group_name,
-                    {"type": "game_found"},
-                )
+        self.is_searching = True
+        start_matchmaking_search(self.user.profile.id, self.channel_name)
+        async_to_sync(self.channel_layer.send)(
+            MATCHMAKING_WORKER_CHANNEL_NAME,
+            MatchmakingToMatchmakingWorker.SearchStarted(
+                type="search_started",
+                channel_name=self.channel_name,
+                profile_id=self.user.profile.id,
+                settings=self.game_room_settings,
+                elo=self.user.profile.elo,
+            ),
+        )
+        logger.info(
+            "[Matchmaking.connect]: player {%s} started the search with settings {%s}",
+            self.user.profile,
+            self.game_room_settings,
+        )
 
     def disconnect(self, code: int):
         """
-        When player disconnects from the existing game room, if they are the only player in this room, it closes
-        automatically. Connection can also be closed by the server if the matchmaking fullfilled its role and
-        found a suitable match.
-        `.select_for_update()` ensures no race conditions.
+        When player disconnects before the game was found, the search is cancelled. Connection is also closed by the
+        server when the matchmaking fullfilled its role and found a suitable match.
         """
-        if not self.game_room or code == CloseCodes.ILLEGAL_CONNECTION:
+        if not self.is_searching:
             return
 
-        async_to_sync(self.channel_layer.group_discard)(self.matchmaking_group_name, self.channel_name)
-        if code == CloseCodes.NORMAL_CLOSURE:
-            logger.info(
-                "[Matchmaking.disconnect]: connection is closed normally",
-            )
-            return
-
-        with transaction.atomic():
-            room_to_clean: GameRoom = GameRoom.objects.select_for_update().filter(id=self.game_room.id).first()
-            logger.info(
-                "[Matchmaking.connect]: player {%s} connected to the game room {%s}",
-                self.user.profile,
-                self.game_room,
-            )
-            room_to_clean.players.remove(self.user.profile)
-            logger.info(
-                "[Matchmaking.disconnect]: game room {%s} removed player {%s}",
-                room_to_clean,
-                self.user.profile,
-            )
-            if room_to_clean.players.count() < 1:
-                room_to_clean.set_closed()
-                logger.info("[Matchmaking.disconnect]: game room {%s} closed", room_to_clean)
+        self.is_searching = False
+        stop_matchmaking_search(self.user.profile.id, self.channel_name)
+        async_to_sync(self.channel_layer.send)(
+            MATCHMAKING_WORKER_CHANNEL_NAME,
+            MatchmakingToMatchmakingWorker.SearchCancelled(type="search_cancelled", channel_name=self.channel_name),
+        )
+        logger.info("[Matchmaking.disconnect]: player {%s} cancelled the search", self.user.profile)
 
     def receive(self, text_data):
         try:
@@ -145,11 +102,7 @@ class MatchmakingConsumer(GuardedWebsocketConsumer):
 
         match text_data_json:
             case {"action": "cancel"}:
-                logger.info(
-                    "[Matchmaking.cancel]: player {%s} sent cancel event to game room {%s}",
-                    self.user.profile,
-                    self.game_room,
-                )
+                logger.info("[Matchmaking.cancel]: player {%s} sent cancel event", self.user.profile)
                 self.close(CloseCodes.CANCELLED)
             case unknown:
                 self.close(CloseCodes.BAD_DATA)
@@ -159,44 +112,32 @@ class MatchmakingConsumer(GuardedWebsocketConsumer):
                     unknown,
                 )
 
-    def game_found(self, event):
+    def game_found(self, event: MatchmakingWorkerToMatchmaking.GameFound):
         """
         Event handler for `game_found`.
-        `game_found` is triggered by the matchmaking consumer itself when the second player joins pending
-        game room.
+        `game_found` is sent by the matchmaking worker when it has paired this player with the opponent.
         """
-        opponent: GameRoomPlayer = self.game_room.players.exclude(user=self.user).first()
-        self.send(
-            text_data=json.dumps(
-                MatchmakingToClient.GameFound(
-                    {
-                        "action": "game_found",
-                        "game_room_id": str(self.game_room.id),
-                        "username": opponent.user.username,
-                        "nickname": opponent.user.nickname,
-                        "avatar": opponent.avatar,
-                        "elo": opponent.elo,
-                    },
-                ),
-            ),
-        )
+        self.is_searching = False
+        stop_matchmaking_search(self.user.profile.id, self.channel_name)
+        self.send(text_data=json.dumps(event["message"]))
         self.close(CloseCodes.NORMAL_CLOSURE)
-        logger.info("[Matchmaking.game_found]: {%s} vs {%s}", self.user.profile, opponent)
+        logger.info("[Matchmaking.game_found]: {%s} vs {%s}", self.user.profile, event["message"]["username"])
 
-    def _with_db_lock_find_valid_game_room(self):
+    def search_replaced(self, event: MatchmakingWorkerToMatchmaking.SearchReplaced):
         """
-        Filter game rooms according to requirements, without locking (due to annotations in .for_valid_game_room()).
-        If room was found, use it's id to get an actually locked room.
-        Revalidate it.
+        Event handler for `search_replaced`.
+        `search_replaced` is sent by the matchmaking worker when the player started the search from another connection.
         """
-        candidate_room = GameRoom.objects.for_valid_game_room(self.user.profile, self.game_room_settings).first()
-        if candidate_room:
-            locked_candidate_room: GameRoom | None = (
-                GameRoom.objects.select_for_update()
-                .for_settings(self.game_room_settings)
-                .filter(id=candidate_room.id, status=GameRoom.PENDING)
-                .first()
-            )
-            if locked_candidate_room and locked_candidate_room.players.count() < PLAYERS_REQUIRED:
-                return locked_candidate_room
-        return None
+        self.is_searching = False
+        self.close(CloseCodes.ALREADY_IN_GAME)
+        logger.info("[Matchmaking.search_replaced]: player {%s} searches from another connection", self.user.profile)
+
+    def search_failed(self, event: MatchmakingWorkerToMatchmaking.SearchFailed):
+        """
+        Event handler for `search_failed`.
+        `search_failed` is sent by the matchmaking worker when it couldn't create the game room for the found pair.
+        """
+        self.is_searching = False
+        stop_matchmaking_search(self.user.profile.id, self.channel_name)
+        self.close(CloseCodes.CANCELLED)
+        logger.warning("[Matchmaking.search_failed]: search of the player {%s} has failed", self.user.profile)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import traceback
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncConsumer
+from django.conf import settings
+from django.db import transaction
+
+from pong.game_protocol import (
+    MatchmakingToClient,
+    MatchmakingToMatchmakingWorker,
+    MatchmakingWorkerControl,
+    MatchmakingWorkerToMatchmaking,
+)
+from pong.matchmaking_metrics import MatchmakingMetrics
+from pong.matchmaking_queue import MatchmakingQueue, MatchmakingSearch
+from pong.models import GameRoom, GameRoomPlayer
+from users.models import Profile
+from users.models.profile import invalidate_active_game_participation
+
+logger = logging.getLogger("server")
+
+# seconds between the matching of the waiting searches with their widened elo ranges
+MATCHMAKING_INTERVAL = 1.0
+
+
+class MatchmakingWorkerConsumer(AsyncConsumer):
+    """
+    Holds the searches of all players in memory and pairs them, see `pong/matchmaking_queue.py`. Listens on the
+    `matchmaking` channel, and there is only one such worker, so every search sees all the others.
+    The new search is paired right away with the opponent of the close elo, and the waiting searches are matched again
+    every `MATCHMAKING_INTERVAL` as their elo ranges widen.
+    The database is touched only once a pair is found: the ongoing game room is created with both players in one
+    transaction, and `game_found` is sent to the `MatchmakingConsumer` of both players.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.queue = MatchmakingQueue(settings.MATCHMAKING_ELO_RANGE, settings.MATCHMAKING_ELO_RANGE_GROWTH)
+        self.metrics = MatchmakingMetrics()
+        self.matching_task: asyncio.Task | None = None
+
+    async def search_started(self, event: MatchmakingToMatchmakingWorker.SearchStarted):
+        search = MatchmakingSearch(event["channel_name"], event["profile_id"], event["settings"], event["elo"])
+        current_time = asyncio.get_running_loop().time()
+        replaced = self.queue.get_search_of_profile(search.profile_id)
+        if replaced is not None and replaced.channel_name != search.channel_name:
+            self.queue.remove(replaced.channel_name)
+            await self.channel_layer.send(
+                replaced.channel_name,
+                MatchmakingWorkerToMatchmaking.SearchReplaced(type="search_replaced"),
+            )
+        opponent = self.queue.add(search, current_time)
+        if opponent is None:
+            logger.info(
+                "[MatchmakingWorker]: profile {%s} is waiting for the opponent, {%s} searches are pending",
+                search.profile_id,
+                len(self.queue),
+            )
+            self._start_matching_loop()
+            return
+        await self._pair(opponent, search, current_time)
+
+    async def search_cancelled(self, event: MatchmakingToMatchmakingWorker.SearchCancelled):
+        if self.queue.remove(event["channel_name"]):
+            logger.info("[MatchmakingWorker]: search {%s} was cancelled", event["channel_name"])
+
+    async def matchmaking_metrics(self, event: MatchmakingWorkerControl.GetMetrics):
+        """Sends the snapshot of the metrics of the worker to the `reply_channel`."""
+        current_time = asyncio.get_running_loop().time()
+        await self.channel_layer.send(
+            event["reply_channel"],
+            MatchmakingWorkerControl.Metrics(
+                type="matchmaking_metrics_reported",
+                metrics=self.metrics.snapshot(len(self.queue), self.queue.get_longest_wait_time(current_time)),
+            ),
+        )
+
+    def _start_matching_loop(self):
+        if self.matching_task is None or self.matching_task.done():
+            self.matching_task = asyncio.create_task(self._matching_loop())
+
+    async def _matching_loop(self):
+        """Pairs the waiting searches whose elo ranges have widened enough, until none of them are left."""
+        loop = asyncio.get_running_loop()
+        while self.queue:
+            await asyncio.sleep(MATCHMAKING_INTERVAL)
+            current_time = loop.time()
+            for first, second in self.queue.match_waiting(current_time):
+                await self._pair(first, second, current_time)
+
+    async def _pair(self, first: MatchmakingSearch, second: MatchmakingSearch, current_time: float):
+        """
+        Creates the game room for the searches that were removed from the queue, and notifies both players.
+        When the game room can't be created, searches of both players are over and their connections are closed.
+        """
+        self.metrics.record_pair(
+            current_time - first.started_at,
+            current_time - second.started_at,
+            abs(first.elo - second.elo),
+        )
+        try:
+            messages = await self._create_game_room(first, second)
+        except Exception:  # noqa: BLE001
+            logger.critical(
+                "[MatchmakingWorker]: game room can't be created for the profiles {%s} and {%s}\n%s",
+                first.profile_id,
+                second.profile_id,
+                traceback.format_exc(),
+            )
+            for search in (first, second):
+                await self.channel_layer.send(
+                    search.channel_name,
+                    MatchmakingWorkerToMatchmaking.SearchFailed(type="search_failed"),
+                )
+            return
+        for channel_name, message in messages:
+            await self.channel_layer.send(
+                channel_name,
+                MatchmakingWorkerToMatchmaking.GameFound(type="game_found", message=message),
+            )
+
+    @database_sync_to_async
+    def _create_game_room(
+        self,
+        first: MatchmakingSearch,
+        second: MatchmakingSearch,
+    ) -> list[tuple[str, MatchmakingToClient.GameFound]]:
+        """
+        Settings of the player who searched first take precedence, see `GameRoom.resolve_settings`.
+        Returns `game_found` messages for the channels of both players, each one with the data of the opponent.
+        """
+        profiles = Profile.objects.select_related("user").in_bulk([first.profile_id, second.profile_id])
+        with transaction.atomic():
+            game_room = GameRoom(settings=first.settings, status=GameRoom.ONGOING).resolve_settings(second.settings)
+            GameRoomPlayer.objects.bulk_create(
+                [
+                    GameRoomPlayer(game_room=game_room, profile=profiles[search.profile_id])
+                    for search in (first, second)
+                ],
+            )
+            invalidate_active_game_participation(first.profile_id, second.profile_id)
+        logger.info("[MatchmakingWorker]: game room {%s} was created", game_room)
+
+        messages = []
+        for search, opponent_search in ((first, second), (second, first)):
+            opponent = profiles[opponent_search.profile_id]
+            messages.append(
+                (
+                    search.channel_name,
+                    MatchmakingToClient.GameFound(
+                        action="game_found",
+                        game_room_id=str(game_room.id),
+                        username=opponent.user.username,
+                        nickname=opponent.user.nickname,
+                        avatar=opponent.avatar,
+                        elo=opponent.elo,
+                    ),
+                ),
+            )
+        return messages
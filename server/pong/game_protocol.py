@@ -8,6 +8,8 @@ from typing import Literal, TypedDict
 from typing_extensions import NotRequired
 
 from common.close_codes import CloseCodes
+from pong.game_worker_metrics import GameWorkerMetricsSnapshot, PlayerNetworkStats
+from pong.matchmaking_metrics import MatchmakingMetricsSnapshot
 
 
 class GameRoomSettings(TypedDict):
@@ -83,6 +85,59 @@ class ClientToMatchmaking:
         action: Literal["cancel"]
 
 
+class MatchmakingToMatchmakingWorker:
+    """Searches are held by the matchmaking worker on the `matchmaking` channel, see `pong/matchmaking_queue.py`."""
+
+    class SearchStarted(TypedDict):
+        """
+        Player connected to the matchmaking. Settings the player left as "any" are missing.
+        `channel_name`: channel of the `MatchmakingConsumer` of the player, which identifies the search.
+        `elo`: elo of the player, the opponent with the closest one is preferred.
+        """
+
+        type: Literal["search_started"]
+        channel_name: str
+        profile_id: int
+        settings: GameRoomSettings
+        elo: int
+
+    class SearchCancelled(TypedDict):
+        """Player disconnected from the matchmaking before the game was found."""
+
+        type: Literal["search_cancelled"]
+        channel_name: str
+
+
+class MatchmakingWorkerToMatchmaking:
+    class GameFound(TypedDict):
+        """Matchmaking worker has created the ongoing game room for the pair of players."""
+
+        type: Literal["game_found"]
+        message: MatchmakingToClient.GameFound
+
+    class SearchReplaced(TypedDict):
+        """Player started the search from another connection, which replaced the search of this one."""
+
+        type: Literal["search_replaced"]
+
+    class SearchFailed(TypedDict):
+        """Game room for the pair of players can't be created, so the search of this player is over."""
+
+        type: Literal["search_failed"]
+
+
+class MatchmakingWorkerControl:
+    class GetMetrics(TypedDict):
+        """Matchmaking worker sends the snapshot of its metrics to the `reply_channel`."""
+
+        type: Literal["matchmaking_metrics"]
+        reply_channel: str
+
+    class Metrics(TypedDict):
+        type: Literal["matchmaking_metrics_reported"]
+        metrics: MatchmakingMetricsSnapshot
+
+
 class GameServerToClient:
     class WorkerToClientOpen(TypedDict):
         """Events sent from the worker to the client trough GameServer which don't close the connection."""
@@ -124,6 +179,17 @@ class GameServerToClient:
         action: Literal["state_updated"]
         state: SerializedGameState
 
+    class WorkerToClientState(TypedDict):
+        """
+        `StateUpdated` that the worker serializes once per tick for all clients of the match, and consumers send as is.
+        `text`: JSON of `StateUpdated` without the `type` key, for the regular clients.
+        `packed_state`: the state packed as the keyframe of the binary protocol, for the clients who opted in for it.
+        """
+
+        type: Literal["worker_to_client_state"]
+        text: str
+        packed_state: bytes
+
     class GamePaused(WorkerToClientOpen):
         """Game is paused due to one of the players disconnecting from the game."""
 
@@ -156,6 +222,42 @@ class GameServerToClient:
         elo_change: int
         tournament_id: str | None
 
+    class NetworkStats(WorkerToClientOpen):
+        """Round trip time and jitter of both players, sent every couple of seconds. Empty for unmeasured players."""
+
+        action: Literal["network_stats"]
+        bumper_1: PlayerNetworkStats
+        bumper_2: PlayerNetworkStats
+
+    class Ping(TypedDict):
+        """
+        Sent by the websocket server, and not by the worker, every second. The client replies with
+        `ClientToGameServer.Pong` with the same `ping_id` right away, so the server measures the round trip time.
+        """
+
+        action: Literal["ping"]
+        ping_id: int
+
+    class SpectatorJoined(WorkerToClientOpen):
+        """Spectator started to watch the match. States are sent to spectators less often than to the players."""
+
+        action: Literal["spectator_joined"]
+        player_1_name: str
+        player_2_name: str
+        is_paused: bool
+        settings: GameRoomSettings
+
+    class SpectatingRefused(WorkerToClientClose):
+        """
+        Spectator can't watch the match.
+        `match_not_found` means that the match is not running on the game worker, for example both players are yet to
+        connect.
+        `too_many_spectators` means that the match has reached `GAME_MAX_SPECTATORS_PER_MATCH`.
+        """
+
+        action: Literal["spectating_refused"]
+        reason: Literal["match_not_found", "too_many_spectators"]
+
 
 class ClientToGameServer:
     """
@@ -180,6 +282,18 @@ class ClientToGameServer:
 
     PlayerInput = MoveLeft | MoveRight
 
+    class StateAck(TypedDict):
+        """Client that uses the binary protocol received the frame of the state. See `pong/binary_protocol.py`."""
+
+        action: Literal["state_ack"]
+        frame: int
+
+    class Pong(TypedDict):
+        """Reply to `GameServerToClient.Ping`."""
+
+        action: Literal["pong"]
+        ping_id: int
+
     class Resign(TypedDict):
         """Player resigns."""
 
@@ -188,7 +302,11 @@ class ClientToGameServer:
 
 class GameServerToGameWorker:
     class PlayerConnected(TypedDict):
-        """Player is connected to websocket server, and it sends the player information to the worker."""
+        """
+        Player is connected to websocket server, and it sends the player information to the worker.
+        `tick_socket_path`: socket of the websocket server process, through which the worker can send the states of the
+        game bypassing the channel layer. See `pong/local_tick_transport.py`.
+        """
 
         type: Literal["player_connected"]
         game_room_id: str
@@ -201,6 +319,8 @@ class GameServerToGameWorker:
         is_in_tournament: bool
         bracket_id: None | str
         tournament_id: None | str
+        drained_channels: NotRequired[list[str]]
+        tick_socket_path: NotRequired[str | None]
 
     class PlayerInputed(TypedDict):
         """Player has inputed the controls, websocket server sends it to the game worker."""
@@ -212,9 +332,88 @@ class GameServerToGameWorker:
         move_id: int
         player_id: str
 
+    class PlayerInputsBatched(TypedDict):
+        """
+        Consecutive inputs of the same action that the player made during one tick window, coalesced by the websocket
+        server into one event. Each move between `first_move_id` and `last_move_id` moves the bumper for one tick, just
+        like separate `PlayerInputed` events would.
+        """
+
+        type: Literal["player_inputs_batched"]
+        action: Literal["move_left", "move_right"]
+        game_room_id: str
+        player_id: str
+        first_move_id: int
+        last_move_id: int
+        first_timestamp: int
+        last_timestamp: int
+
+    class PlayerRttMeasured(TypedDict):
+        """Websocket server measured the round trip time to the client of the player, in seconds."""
+
+        type: Literal["player_rtt_measured"]
+        game_room_id: str
+        player_id: str
+        rtt: float
+
     class PlayerDisconnected(TypedDict):
         """Player is disconnected from the websocket server, and it sends the relevant IDs to the worker."""
 
         type: Literal["player_disconnected"]
         game_room_id: str
         player_id: str
+
+    class SpectatorJoined(TypedDict):
+        """
+        User connected to the websocket server to watch the match. The worker replies to the `channel_name` of the
+        spectator with `GameServerToClient.SpectatorJoined` or `GameServerToClient.SpectatingRefused`.
+        `tick_socket_path`: see `PlayerConnected`.
+        """
+
+        type: Literal["spectator_joined"]
+        game_room_id: str
+        channel_name: str
+        tick_socket_path: NotRequired[str | None]
+
+    class SpectatorLeft(TypedDict):
+        type: Literal["spectator_left"]
+        game_room_id: str
+        channel_name: str
+
+
+class GameWorkerControl:
+    """Events for the management of the game workers themselves, and not of the specific matches."""
+
+    class Drain(TypedDict):
+        """
+        Game worker stops to accept new matches and hands them over to the other workers, while finishing its own.
+        When the last match is finished, `worker_drained` is sent to the `reply_channel`.
+        """
+
+        type: Literal["worker_drain"]
+        reply_channel: str | None
+
+    class Drained(TypedDict):
+        """Game worker doesn't run any matches anymore and can be safely stopped."""
+
+        type: Literal["worker_drained"]
+        channel_name: str
+
+    class ForwardedGameFinished(TypedDict):
+        """
+        Match that was handed over by the draining worker is finished. Sent to every worker in `drained_channels` of the
+        match, so they stop forwarding the events of its game room, and can be drained.
+        """
+
+        type: Literal["worker_forwarded_game_finished"]
+        game_room_id: str
+
+    class GetMetrics(TypedDict):
+        """Game worker sends the snapshot of its metrics to the `reply_channel` in the `worker_metrics_reported`."""
+
+        type: Literal["worker_metrics"]
+        reply_channel: str
+
+    class Metrics(TypedDict):
+        type: Literal["worker_metrics_reported"]
+        metrics: GameWorkerMetricsSnapshot
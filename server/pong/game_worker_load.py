@@ -0,0 +1,53 @@
+"""
+Load of the game worker, and how the worker degrades its matches when it can't keep up with the ticks.
+The load is the part of the tick interval the worker spends on the tick and on the events that delayed it, smoothed over
+about a second of the ticks, so a single slow tick doesn't change anything. While the load stays above
+`OVERLOADED_LOAD`, the worker goes through `DEGRADATION_LEVELS`: first the states of the matches are broadcasted less
+often while the physics keeps its rate, then the physics is resolved less often too, with the bigger `delta_time`. Every
+match has its own phase, so each tick only resolves and broadcasts its share of the matches instead of all of them at
+once. When the load goes below `RECOVERED_LOAD`, the worker goes back one level.
+"""
+
+# ticks between the physics steps of one match, and ticks between the broadcasts of its states
+DEGRADATION_LEVELS = ((1, 1), (1, 2), (2, 2), (3, 3))
+OVERLOADED_LOAD = 0.8
+RECOVERED_LOAD = 0.4
+# weight of the last tick in the smoothed load, about the last second of the ticks counts
+LOAD_SMOOTHING = 1 / 30
+# the level is kept for 2 seconds of the ticks, so the load has time to show the effect of the previous change
+LEVEL_CHANGE_COOLDOWN_TICKS = 60
+
+
+class GameWorkerLoad:
+    def __init__(self, tick_interval: float):
+        self.tick_interval = tick_interval
+        self.load = 0.0
+        self.level = 0
+        self._ticks_since_level_change = 0
+
+    def record(self, tick_seconds: float) -> bool:
+        """Records how long the tick took, including its lateness. Returns `True` if the level has changed."""
+        self.load += (tick_seconds / self.tick_interval - self.load) * LOAD_SMOOTHING
+        self._ticks_since_level_change += 1
+        if self._ticks_since_level_change < LEVEL_CHANGE_COOLDOWN_TICKS:
+            return False
+        if self.load > OVERLOADED_LOAD and self.level < len(DEGRADATION_LEVELS) - 1:
+            self.level += 1
+        elif self.load < RECOVERED_LOAD and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self._ticks_since_level_change = 0
+        return True
+
+    def is_exhausted(self) -> bool:
+        """Worker is overloaded at the last level, so it can't degrade its matches any further."""
+        return self.level == len(DEGRADATION_LEVELS) - 1 and self.load > OVERLOADED_LOAD
+
+    @property
+    def physics_interval(self) -> int:
+        return DEGRADATION_LEVELS[self.level][0]
+
+    @property
+    def broadcast_interval(self) -> int:
+        return DEGRADATION_LEVELS[self.level][1]
@@ -0,0 +1,127 @@
+"""
+Metrics of the game worker: how long the ticks take, how late they start, how many matches it runs, how many inputs
+wait to be processed, how many spectators watch the matches and how good the connections of the players are. They show
+that the worker is overloaded before the players feel it as rubber-banding.
+The worker collects them in `GameWorkerMetrics` and sends the snapshot in reply to the `worker_metrics` event, see
+the `game_worker_metrics` management command.
+"""
+
+import bisect
+from typing import TypedDict
+
+# upper bounds of the buckets of the time histograms, in milliseconds. The tick of the game is 33.3 ms
+TIME_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 33.3, 50, 100, 250, float("inf"))
+
+
+class HistogramSnapshot(TypedDict):
+    count: int
+    sum_ms: float
+    max_ms: float
+    p50_ms: float
+    p99_ms: float
+    # counts of the values per upper bound of the bucket
+    buckets: dict[str, int]
+
+
+class Histogram:
+    """Histogram of the durations with fixed buckets. Recording is O(log buckets) and doesn't allocate."""
+
+    def __init__(self, buckets_ms: tuple[float, ...] = TIME_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * len(buckets_ms)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        self.record_value(seconds * 1000)
+
+    def record_value(self, value_ms: float):
+        """Records the value in the units of the buckets, for the histograms of something else than durations."""
+        self.counts[bisect.bisect_left(self.buckets_ms, value_ms)] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket where the quantile falls. The last bucket is reported as the maximum value."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for upper_bound, count in zip(self.buckets_ms, self.counts, strict=True):
+            seen += count
+            if seen >= rank:
+                return min(upper_bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> HistogramSnapshot:
+        return HistogramSnapshot(
+            count=self.count,
+            sum_ms=self.sum_ms,
+            max_ms=self.max_ms,
+            p50_ms=self.quantile(0.5),
+            p99_ms=self.quantile(0.99),
+            buckets={str(upper_bound): count for upper_bound, count in zip(self.buckets_ms, self.counts, strict=True)},
+        )
+
+
+class PlayerNetworkStats(TypedDict):
+    """Smoothed round trip time between the websocket server and the client, and its jitter."""
+
+    rtt_ms: float
+    jitter_ms: float
+
+
+class GameWorkerMetricsSnapshot(TypedDict):
+    channel_name: str
+    tick_compute: HistogramSnapshot
+    tick_lateness: HistogramSnapshot
+    broadcast: HistogramSnapshot
+    ongoing_matches: int
+    paused_matches: int
+    pending_matches: int
+    # number of the inputs waiting in the queue, by `"{game_room_id}:{player_id}"`
+    input_queue_depth: dict[str, int]
+    # number of the spectators of the matches that have them, by game room id
+    spectators: dict[str, int]
+    # network of the players who have answered the pings, by `"{game_room_id}:{player_id}"`
+    network: dict[str, PlayerNetworkStats]
+    # smoothed part of the tick interval the worker is busy, and the level of the degradation of its matches
+    load: float
+    degradation_level: int
+
+
+class GameWorkerMetrics:
+    def __init__(self):
+        self.tick_compute = Histogram()
+        self.tick_lateness = Histogram()
+        self.broadcast = Histogram()
+
+    def snapshot(
+        self,
+        *,
+        channel_name: str,
+        ongoing_matches: int,
+        paused_matches: int,
+        pending_matches: int,
+        input_queue_depth: dict[str, int],
+        spectators: dict[str, int],
+        network: dict[str, PlayerNetworkStats],
+        load: float,
+        degradation_level: int,
+    ) -> GameWorkerMetricsSnapshot:
+        return GameWorkerMetricsSnapshot(
+            channel_name=channel_name,
+            tick_compute=self.tick_compute.snapshot(),
+            tick_lateness=self.tick_lateness.snapshot(),
+            broadcast=self.broadcast.snapshot(),
+            ongoing_matches=ongoing_matches,
+            paused_matches=paused_matches,
+            pending_matches=pending_matches,
+            input_queue_depth=input_queue_depth,
+            spectators=spectators,
+            network=network,
+            load=load,
+            degradation_level=degradation_level,
+        )
@@ -0,0 +1,69 @@
+"""
+Routing of the pong matches between multiple game worker processes.
+Every game worker listens on its own channel (`game.0` ... `game.N-1`). Game rooms are assigned to the workers with
+consistent hashing of their ids, so every event of the same game room always reaches the same worker, and adding or
+removing a worker moves only the game rooms of this worker.
+"""
+
+import functools
+import hashlib
+from bisect import bisect_right
+from collections.abc import Iterable
+
+from django.conf import settings
+
+GAME_WORKER_CHANNEL_PREFIX = "game"
+# number of points each worker occupies on the hash ring. More points give more even distribution of game rooms.
+VIRTUAL_NODES_PER_WORKER = 64
+
+
+def _hash(key: str) -> int:
+    """Stable hash that gives the same result in every process, unlike the builtin `hash` of strings."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def get_game_worker_channel_names(number_of_workers: int | None = None) -> list[str]:
+    """Names of the channels on which game workers listen. Defaults to the `GAME_WORKER_SHARDS` setting."""
+    if number_of_workers is None:
+        number_of_workers = settings.GAME_WORKER_SHARDS
+    return [f"{GAME_WORKER_CHANNEL_PREFIX}.{i}" for i in range(max(number_of_workers, 1))]
+
+
+class GameWorkerRing:
+    """Consistent hash ring that maps game room ids to the channels of the game workers."""
+
+    def __init__(self, channel_names: Iterable[str], virtual_nodes: int = VIRTUAL_NODES_PER_WORKER):
+        self.channel_names = list(channel_names)
+        if not self.channel_names:
+            raise ValueError("Game worker ring needs at least one channel")
+        ring = sorted(
+            (_hash(f"{channel_name}#{i}"), channel_name)
+            for channel_name in self.channel_names
+            for i in range(virtual_nodes)
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [channel_name for _, channel_name in ring]
+
+    def get_channel_name(self, game_room_id: str, excluded: Iterable[str] = ()) -> str | None:
+        """
+        Returns the channel of the worker responsible for the game room.
+        `excluded` channels are skipped, and the next worker on the ring is chosen instead. It is used by the draining
+        workers to hand over new game rooms. Returns `None` if every worker is excluded.
+        """
+        excluded = set(excluded)
+        start = bisect_right(self._points, _hash(str(game_room_id)))
+        for i in range(len(self._owners)):
+            channel_name = self._owners[(start + i) % len(self._owners)]
+            if channel_name not in excluded:
+                return channel_name
+        return None
+
+
+@functools.cache
+def get_game_worker_ring() -> GameWorkerRing:
+    return GameWorkerRing(get_game_worker_channel_names())
+
+
+def get_game_worker_channel_name(game_room_id: str) -> str:
+    """Channel of the game worker that runs the match of the given game room."""
+    return get_game_worker_ring().get_channel_name(game_room_id)
@@ -0,0 +1,407 @@
+"""
+Load test of the whole stack with simulated players. Every player logs in, connects to `UserEventsConsumer`, finds a
+game with `MatchmakingConsumer`, and plays it through `GameServerConsumer`: it follows the ball with the moves sent at
+the rate of the ticks, answers the pings, and chats with its chat partner in the meantime.
+The websockets are driven in this process through the ASGI application of the server, so the test runs with the
+in-memory channel layer as well as with the local Redis. With the in-memory channel layer, game workers run in this
+process too. With Redis, they can also be the `runworker` processes of the stack.
+Measures how long the connections take to be set up, how long the matchmaking takes, how regularly the states of the
+ticks arrive, the latency of the moves until they are seen in the states, the latency of the chat messages, and the CPU
+and memory used by this process.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import resource
+import secrets
+import tempfile
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Literal, TypedDict
+
+from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.routing import ChannelNameRouter, URLRouter
+from channels.testing import WebsocketCommunicator
+from channels.worker import Worker
+from django.db import transaction
+from django.test import override_settings
+
+from chat.models import Chat
+from common.close_codes import CloseCodes
+from pong.consumers.game_worker import GAME_TICK_INTERVAL, GameWorkerConsumer
+from pong.consumers.matchmaking import MATCHMAKING_WORKER_CHANNEL_NAME
+from pong.consumers.matchmaking_worker import MatchmakingWorkerConsumer
+from pong.game_worker_shards import get_game_worker_channel_names
+from pong.models import GameRoom
+from users.models import RefreshToken, User
+
+logger = logging.getLogger("server")
+
+Workers = Literal["auto", "in_process", "external"]
+ConnectionKind = Literal["events", "matchmaking", "game"]
+
+LOAD_TEST_USERNAME_PREFIX = "load_test_"
+# longest settings, so the games last for the whole test
+GAME_ROOM_SETTINGS_QUERY = b"score_to_win=20&time_limit=5&cool_mode=true&ranked=false&game_speed=medium"
+CONNECTION_TIMEOUT = 10.0
+MATCHMAKING_TIMEOUT = 30.0
+GAME_START_TIMEOUT = 30.0
+
+
+class LatencySummary(TypedDict):
+    count: int
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+@dataclass(slots=True)
+class LoadTestResult:
+    players: int
+    duration: float
+    workers: Workers
+    games_started: int
+    connection_setup: dict[str, LatencySummary]
+    matchmaking: LatencySummary
+    # time between the states of two consecutive ticks, and how far it is from the tick interval
+    tick_interval: LatencySummary
+    tick_jitter: LatencySummary
+    # from sending the move until it's seen as processed in the state of the tick
+    input_latency: LatencySummary
+    chat_latency: LatencySummary
+    errors: dict[str, int]
+    # of this process, which runs the server, the simulated players and the game workers if they are in process
+    cpu_percent: float
+    max_rss_mb: float
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class _LoadTestStats:
+    connection_setup: dict[str, list[float]] = field(
+        default_factory=lambda: {"events": [], "matchmaking": [], "game": []},
+    )
+    matchmaking: list[float] = field(default_factory=list)
+    tick_intervals: list[float] = field(default_factory=list)
+    input_latency: list[float] = field(default_factory=list)
+    chat_latency: list[float] = field(default_factory=list)
+    games_started: int = 0
+    errors: Counter[str] = field(default_factory=Counter)
+
+
+@dataclass(slots=True)
+class _SimulatedPlayer:
+    user: User
+    access_token: str
+    chat_id: str
+
+
+async def _receive(communicator: WebsocketCommunicator, timeout: float | None) -> dict:
+    """Unlike `receive_output`, doesn't cancel the consumer when nothing arrives in time."""
+    return await asyncio.wait_for(communicator.output_queue.get(), timeout)
+
+
+def _summarize(samples: list[float]) -> LatencySummary:
+    if not samples:
+        return LatencySummary(count=0, p50_ms=0.0, p99_ms=0.0, max_ms=0.0)
+    samples = sorted(samples)
+    return LatencySummary(
+        count=len(samples),
+        p50_ms=samples[len(samples) // 2] * 1000,
+        p99_ms=samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1000,
+        max_ms=samples[-1] * 1000,
+    )
+
+
+@database_sync_to_async
+def _create_players(number_of_players: int, run_id: str) -> list[_SimulatedPlayer]:
+    """Players are paired with the chat partners in the order of their creation."""
+    players = []
+    with transaction.atomic():
+        users = [User.objects.create_user(f"{LOAD_TEST_USERNAME_PREFIX}{run_id}_{i}") for i in range(number_of_players)]
+        for i in range(0, number_of_players, 2):
+            pair = users[i : i + 2]
+            chat = Chat.objects.create(*(user.profile for user in pair))
+            players.extend(_SimulatedPlayer(user, RefreshToken.objects.create(user)[0], str(chat.id)) for user in pair)
+    return players
+
+
+@database_sync_to_async
+def _delete_players(run_id: str):
+    prefix = f"{LOAD_TEST_USERNAME_PREFIX}{run_id}_"
+    with transaction.atomic():
+        GameRoom.objects.filter(players__user__username__startswith=prefix).delete()
+        Chat.objects.filter(participants__user__username__startswith=prefix).delete()
+        User.objects.filter(username__startswith=prefix).delete()
+
+
+class LoadTest:
+    def __init__(self, number_of_players: int, duration: float, chat_interval: float, workers: Workers):
+        # server stack without the check of the origin, like in the tests
+        from server.asgi import combined_patterns
+        from users.middleware import JWTWebsocketAuthMiddleware
+
+        self.application = JWTWebsocketAuthMiddleware(URLRouter(combined_patterns))
+        self.number_of_players = number_of_players - number_of_players % 2
+        self.duration = duration
+        self.chat_interval = chat_interval
+        if workers == "auto":
+            workers = "in_process" if isinstance(get_channel_layer(), InMemoryChannelLayer) else "external"
+        self.workers: Workers = workers
+        self.stats = _LoadTestStats()
+        self._connecting = asyncio.Semaphore(50)
+
+    async def run(self) -> LoadTestResult:
+        run_id = secrets.token_hex(3)
+        players = await _create_players(self.number_of_players, run_id)
+        logger.info("[LoadTest]: {%s} players were created, starting the test", len(players))
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        start_time = time.perf_counter()
+        try:
+            async with self._in_process_workers():
+                await asyncio.gather(*(self._play(player) for player in players))
+        finally:
+            await _delete_players(run_id)
+        wall_seconds = time.perf_counter() - start_time
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_seconds = usage_after.ru_utime + usage_after.ru_stime - usage_before.ru_utime - usage_before.ru_stime
+
+        stats = self.stats
+        return LoadTestResult(
+            players=len(players),
+            duration=self.duration,
+            workers=self.workers,
+            games_started=stats.games_started,
+            connection_setup={kind: _summarize(samples) for kind, samples in stats.connection_setup.items()},
+            matchmaking=_summarize(stats.matchmaking),
+            tick_interval=_summarize(stats.tick_intervals),
+            tick_jitter=_summarize([abs(interval - GAME_TICK_INTERVAL) for interval in stats.tick_intervals]),
+            input_latency=_summarize(stats.input_latency),
+            chat_latency=_summarize(stats.chat_latency),
+            errors=dict(stats.errors),
+            cpu_percent=cpu_seconds / wall_seconds * 100,
+            max_rss_mb=usage_after.ru_maxrss / 1024,
+        )
+
+    @contextlib.asynccontextmanager
+    async def _in_process_workers(self):
+        """
+        Game and matchmaking workers listen on their channels in this process. Files of the game workers are kept apart
+        from the real workers.
+        """
+        if self.workers != "in_process":
+            yield
+            return
+        game_worker_channel_names = get_game_worker_channel_names()
+        worker = Worker(
+            ChannelNameRouter(
+                {
+                    **{channel_name: GameWorkerConsumer.as_asgi() for channel_name in game_worker_channel_names},
+                    MATCHMAKING_WORKER_CHANNEL_NAME: MatchmakingWorkerConsumer.as_asgi(),
+                },
+            ),
+            [*game_worker_channel_names, MATCHMAKING_WORKER_CHANNEL_NAME],
+            get_channel_layer(),
+        )
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            override_settings(
+                GAME_SNAPSHOT_DIR=directory,
+                GAME_RESULT_SPOOL_DIR=directory,
+                GAME_REPLAY_DIR=directory,
+            ),
+        ):
+            worker_task = asyncio.create_task(worker.handle())
+            try:
+                yield
+            finally:
+                worker_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await worker_task
+
+    async def _connect(
+        self,
+        path: str,
+        player: _SimulatedPlayer,
+        kind: ConnectionKind,
+        query_string: bytes = b"",
+    ) -> WebsocketCommunicator | None:
+        async with self._connecting:
+            communicator = WebsocketCommunicator(
+                self.application,
+                f"{path}?{query_string.decode()}" if query_string else path,
+                headers=[(b"cookie", f"access_token={player.access_token}".encode())],
+            )
+            start_time = time.perf_counter()
+            connected, _ = await communicator.connect(timeout=CONNECTION_TIMEOUT)
+        if not connected:
+            self.stats.errors[f"{kind}_refused"] += 1
+            return None
+        self.stats.connection_setup[kind].append(time.perf_counter() - start_time)
+        return communicator
+
+    async def _play(self, player: _SimulatedPlayer):
+        events = await self._connect("/ws/events/", player, "events")
+        if events is None:
+            return
+        chat_tasks = [
+            asyncio.create_task(self._receive_chat(events, player)),
+            asyncio.create_task(self._send_chat(events, player)),
+        ]
+        try:
+            game_room_id = await self._find_game(player)
+            if game_room_id:
+                await self._play_game(game_room_id, player)
+        except Exception:  # noqa: BLE001
+            self.stats.errors["exception"] += 1
+            logger.exception("[LoadTest]: player {%s} has failed", player.user.username)
+        finally:
+            for task in chat_tasks:
+                task.cancel()
+            await asyncio.gather(*chat_tasks, return_exceptions=True)
+            await events.disconnect()
+
+    async def _find_game(self, player: _SimulatedPlayer) -> str | None:
+        start_time = time.perf_counter()
+        matchmaking = await self._connect("/ws/matchmaking/", player, "matchmaking", GAME_ROOM_SETTINGS_QUERY)
+        if matchmaking is None:
+            return None
+        try:
+            output = await _receive(matchmaking, MATCHMAKING_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.stats.errors["matchmaking_timeout"] += 1
+            await matchmaking.disconnect(CloseCodes.CANCELLED)
+            return None
+        if output["type"] != "websocket.send":
+            self.stats.errors["matchmaking_closed"] += 1
+            await matchmaking.disconnect(output["code"])
+            return None
+        self.stats.matchmaking.append(time.perf_counter() - start_time)
+        # the server closes the matchmaking after the game is found, and the client answers with the same code
+        close = await _receive(matchmaking, CONNECTION_TIMEOUT)
+        await matchmaking.disconnect(close.get("code", CloseCodes.NORMAL_CLOSURE))
+        return json.loads(output["text"])["game_room_id"]
+
+    async def _play_game(self, game_room_id: str, player: _SimulatedPlayer):
+        """Plays until the end of the test or of the game. Moves are sent only while the game is running."""
+        game = await self._connect(f"/ws/pong/{game_room_id}/", player, "game")
+        if game is None:
+            return
+        # player id and number are known from `player_joined`, last state from `state_updated`
+        context = {"player_id": None, "player_number": 1, "state": None}
+        moves_sent_at: dict[int, float] = {}
+        moving = asyncio.Event()
+        mover = asyncio.create_task(self._send_moves(game, context, moves_sent_at, moving))
+        end_time = time.perf_counter() + self.duration
+        last_state_at = None
+        try:
+            while (timeout := end_time - time.perf_counter()) > 0:
+                try:
+                    output = await _receive(game, min(timeout, GAME_START_TIMEOUT))
+                except asyncio.TimeoutError:
+                    if not moving.is_set():
+                        self.stats.errors["game_start_timeout"] += 1
+                        return
+                    continue
+                if output["type"] == "websocket.close":
+                    return
+                message = json.loads(output["text"])
+                match message.get("action"):
+                    case "player_joined":
+                        context["player_id"] = message["player_id"]
+                        context["player_number"] = message["player_number"]
+                        if message["is_paused"]:
+                            moving.set()
+                    case "game_started" | "game_unpaused":
+                        if not moving.is_set() and message["action"] == "game_started":
+                            self.stats.games_started += 1
+                        moving.set()
+                    case "game_paused":
+                        last_state_at = None
+                    case "state_updated":
+                        received_at = time.perf_counter()
+                        if last_state_at is not None:
+                            self.stats.tick_intervals.append(received_at - last_state_at)
+                        last_state_at = received_at
+                        context["state"] = state = message["state"]
+                        sent_at = moves_sent_at.pop(state[f"bumper_{context['player_number']}"]["move_id"], None)
+                        if sent_at is not None:
+                            self.stats.input_latency.append(received_at - sent_at)
+                    case "ping":
+                        await game.send_json_to({"action": "pong", "ping_id": message["ping_id"]})
+                    case "player_won" | "player_resigned" | "game_cancelled":
+                        return
+        finally:
+            mover.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await mover
+            await game.disconnect()
+
+    async def _send_moves(
+        self,
+        game: WebsocketCommunicator,
+        context: dict,
+        moves_sent_at: dict[int, float],
+        moving: asyncio.Event,
+    ):
+        """Follows the ball at the rate of the ticks, like the player who holds the key down."""
+        await moving.wait()
+        move_id = 0
+        next_move_time = time.perf_counter()
+        while True:
+            state = context["state"]
+            if state:
+                ball_x, bumper_x = state["ball"]["x"], state[f"bumper_{context['player_number']}"]["x"]
+                move_id += 1
+                moves_sent_at[move_id] = time.perf_counter()
+                await game.send_json_to(
+                    {
+                        "action": "move_left" if ball_x > bumper_x else "move_right",
+                        "move_id": move_id,
+                        "player_id": context["player_id"],
+                        "timestamp": int(time.time() * 1000),
+                    },
+                )
+                # moves that are merged with the later ones are never seen in the states
+                for old_move_id in [old for old in moves_sent_at if old < move_id - 30]:
+                    del moves_sent_at[old_move_id]
+            next_move_time += GAME_TICK_INTERVAL
+            await asyncio.sleep(max(next_move_time - time.perf_counter(), 0))
+
+    async def _send_chat(self, events: WebsocketCommunicator, player: _SimulatedPlayer):
+        """Timestamp of the message is echoed to the chat partner, which measures the latency."""
+        while True:
+            await asyncio.sleep(self.chat_interval)
+            await events.send_json_to(
+                {
+                    "action": "new_message",
+                    "data": {"content": "load test", "chat_id": player.chat_id, "timestamp": str(time.perf_counter())},
+                },
+            )
+
+    async def _receive_chat(self, events: WebsocketCommunicator, player: _SimulatedPlayer):
+        while True:
+            output = await _receive(events, None)
+            if output["type"] != "websocket.send":
+                return
+            message = json.loads(output["text"])
+            if message.get("action") != "new_message" or message["data"]["sender"] == player.user.username:
+                continue
+            with contextlib.suppress(TypeError, ValueError):
+                self.stats.chat_latency.append(time.perf_counter() - float(message["data"]["timestamp"]))
+
+
+def run_load_test(
+    number_of_players: int,
+    duration: float,
+    chat_interval: float = 2.0,
+    workers: Workers = "auto",
+) -> LoadTestResult:
+    """Runs the test in its own event loop. The number of the players is rounded down to the even number."""
+    return asyncio.run(LoadTest(number_of_players, duration, chat_interval, workers).run())
@@ -0,0 +1,239 @@
+"""
+Direct transport of the game states from the game workers to the websocket server that bypasses the channel layer.
+States are sent 30 times a second for every match, and passing each of them through Redis costs network round trips and
+msgpack serialization. When the game workers run on the same host as the websocket server, which is the case in
+production, the websocket server process listens on a unix socket, and the game workers connect to it and write the
+states directly. Control events (connections, pauses, results of the matches) still go through the channel layer.
+
+The websocket consumer registers itself in `LocalTickServer` of its process, and sends the path of its socket to the
+game worker with the `player_connected` event. The worker falls back to the channel layer for the players whose socket
+it can't reach. Spectators are registered under the key of their own, see `get_spectators_key`, because they receive
+fewer states than the players. Every registered consumer receives the states from the task of its own, so the consumer
+that is slow to send them to its client doesn't hold back the others.
+
+Frame: `uint32` size of the rest of the frame, `uint16` size of the game room id, game room id, `uint32` size of the
+JSON text, JSON text, packed state. See `GameServerToClient.WorkerToClientState`.
+"""
+
+import asyncio
+import collections
+import logging
+import os
+import struct
+from pathlib import Path
+
+from django.conf import settings
+
+from pong.game_protocol import GameServerToClient
+
+logger = logging.getLogger("server")
+
+_FRAME_SIZE = struct.Struct("<I")
+_ROOM_ID_SIZE = struct.Struct("<H")
+_TEXT_SIZE = struct.Struct("<I")
+# states are outdated by the next tick, so the states for the reader that can't keep up are dropped instead of buffered
+MAX_WRITE_BUFFER_SIZE = 64 * 1024
+# for the same reason, only the latest states wait for the consumer that is still sending the previous one
+MAX_PENDING_STATES = 3
+
+
+def get_spectators_key(game_room_id: str) -> str:
+    """Key under which the spectators of the game room are registered and their states are sent."""
+    return f"{game_room_id}/spectators"
+
+
+def encode_frame(game_room_id: str, event: GameServerToClient.WorkerToClientState) -> bytes:
+    room_id = game_room_id.encode()
+    text = event["text"].encode()
+    body = b"".join(
+        (_ROOM_ID_SIZE.pack(len(room_id)), room_id, _TEXT_SIZE.pack(len(text)), text, event["packed_state"]),
+    )
+    return _FRAME_SIZE.pack(len(body)) + body
+
+
+def decode_frame(body: bytes) -> tuple[str, GameServerToClient.WorkerToClientState]:
+    (room_id_size,) = _ROOM_ID_SIZE.unpack_from(body)
+    offset = _ROOM_ID_SIZE.size
+    game_room_id = body[offset : offset + room_id_size].decode()
+    offset += room_id_size
+    (text_size,) = _TEXT_SIZE.unpack_from(body, offset)
+    offset += _TEXT_SIZE.size
+    text = body[offset : offset + text_size].decode()
+    return game_room_id, GameServerToClient.WorkerToClientState(
+        type="worker_to_client_state",
+        text=text,
+        packed_state=body[offset + text_size :],
+    )
+
+
+class _StateDelivery:
+    """States of the game room for one registered consumer, dispatched in order by the task of their own."""
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+        self._states: collections.deque[GameServerToClient.WorkerToClientState] = collections.deque(
+            maxlen=MAX_PENDING_STATES,
+        )
+        self._has_states = asyncio.Event()
+        self._is_registered = True
+        self._task = asyncio.create_task(self._deliver())
+
+    def put(self, event: GameServerToClient.WorkerToClientState):
+        """Doesn't wait for the consumer. The oldest pending state is dropped if the consumer can't keep up."""
+        self._states.append(event)
+        self._has_states.set()
+
+    def close(self):
+        """The states that are still pending are dropped, and the state that is being dispatched is the last one."""
+        self._is_registered = False
+        self._states.clear()
+        self._has_states.set()
+
+    async def _deliver(self):
+        while self._is_registered:
+            await self._has_states.wait()
+            self._has_states.clear()
+            while self._states and self._is_registered:
+                try:
+                    await self.consumer.dispatch(self._states.popleft())
+                except Exception:  # noqa: BLE001, PERF203
+                    logger.exception("[LocalTickServer]: unable to dispatch the state to {%s}", self.consumer)
+
+
+class LocalTickServer:
+    """
+    Listens on the unix socket in the websocket server process, and dispatches the states written by the game workers
+    to the consumers of the game rooms, as if they came from the channel layer.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._consumers: dict[str, dict[object, _StateDelivery]] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def _prepare_socket_file(self):
+        """Removes the socket file left by the previous process with the same pid."""
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.unlink(missing_ok=True)
+
+    async def start(self):
+        self._prepare_socket_file()
+        self.loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_unix_server(self._handle_worker, self.path)
+        logger.info("[LocalTickServer]: listening for game states on {%s}", self.path)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for deliveries in self._consumers.values():
+            for delivery in deliveries.values():
+                delivery.close()
+        self._consumers.clear()
+
+    def is_running(self) -> bool:
+        return (
+            self._server is not None
+            and self._server.is_serving()
+            and self.loop is asyncio.get_running_loop()
+            and Path(self.path).exists()
+        )
+
+    def register(self, game_room_id: str, consumer):
+        deliveries = self._consumers.setdefault(game_room_id, {})
+        if consumer not in deliveries:
+            deliveries[consumer] = _StateDelivery(consumer)
+
+    def unregister(self, game_room_id: str, consumer):
+        deliveries = self._consumers.get(game_room_id)
+        if deliveries is None:
+            return
+        delivery = deliveries.pop(consumer, None)
+        if delivery is not None:
+            delivery.close()
+        if not deliveries:
+            del self._consumers[game_room_id]
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (frame_size,) = _FRAME_SIZE.unpack(await reader.readexactly(_FRAME_SIZE.size))
+                game_room_id, event = decode_frame(await reader.readexactly(frame_size))
+                for delivery in self._consumers.get(game_room_id, {}).values():
+                    delivery.put(event)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.info("[LocalTickServer]: game worker has disconnected")
+        finally:
+            writer.close()
+
+
+_local_tick_server: LocalTickServer | None = None
+
+
+async def register_consumer(game_room_id: str, consumer) -> str | None:
+    """
+    Registers the consumer to receive states of the game room through the local socket of this process.
+    Returns the path of the socket to send to the game worker, or `None` if the local transport is unavailable.
+    """
+    global _local_tick_server  # noqa: PLW0603
+    if not settings.GAME_TICK_SOCKET_DIR:
+        return None
+
+    if _local_tick_server is None or not _local_tick_server.is_running():
+        path = Path(settings.GAME_TICK_SOCKET_DIR) / f"server-{os.getpid()}.sock"
+        server = LocalTickServer(path)
+        try:
+            await server.start()
+        except OSError:
+            logger.warning("[LocalTickServer]: unable to listen on {%s}, using channel layer instead", path)
+            return None
+        _local_tick_server = server
+
+    _local_tick_server.register(game_room_id, consumer)
+    return _local_tick_server.path
+
+
+def unregister_consumer(game_room_id: str, consumer):
+    if _local_tick_server is not None:
+        _local_tick_server.unregister(game_room_id, consumer)
+
+
+class LocalTickClient:
+    """Connections of the game worker to the sockets of the websocket server processes."""
+
+    def __init__(self):
+        self._writers: dict[str, asyncio.StreamWriter] = {}
+
+    async def connect(self, path: str) -> bool:
+        """Returns `True` if the states can be sent to the socket on the `path`."""
+        writer = self._writers.get(path)
+        if writer is not None and not writer.is_closing():
+            return True
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+        except OSError:
+            logger.warning("[GameWorker]: unable to connect to {%s}, using channel layer instead", path)
+            return False
+        self._writers[path] = writer
+        return True
+
+    def send(self, path: str, game_room_id: str, event: GameServerToClient.WorkerToClientState) -> bool:
+        """
+        Writes the state without waiting. Returns `False` if the connection is lost.
+        If the reader can't keep up, the state is dropped: the next one will come in the next tick anyway.
+        """
+        writer = self._writers.get(path)
+        if writer is None or writer.is_closing():
+            self._writers.pop(path, None)
+            return False
+        if writer.transport.get_write_buffer_size() < MAX_WRITE_BUFFER_SIZE:
+            writer.write(encode_frame(game_room_id, event))
+        return True
+
+    async def close(self):
+        for writer in self._writers.values():
+            writer.close()
+            await writer.wait_closed()
+        self._writers.clear()
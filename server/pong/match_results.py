@@ -0,0 +1,238 @@
+"""
+Write-behind persistence of the finished matches of the game worker.
+The worker doesn't wait for the database when a match ends: it announces the winner right away, with the ELO change
+calculated from the ELO that the players had when they connected, and submits the result to `MatchResultWriter`.
+The change is added to the ELO the players have when the result is written, so the delayed results don't overwrite the
+ones written in the meantime.
+The writer saves the results in batches, one transaction per batch, and retries with backoff if the database is
+unavailable. Until a result is written, it's kept in the spool file on disk, so it survives the restart of the worker.
+
+Writing of the result is idempotent: the game room is closed in the same transaction, and the results of the already
+closed game rooms are skipped.
+"""
+
+import asyncio
+import json
+import logging
+import traceback
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Literal, TypedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
+from typing_extensions import NotRequired
+
+from pong.models import GameRoom, GameRoomPlayer, Match
+from tournaments.models import Bracket
+from users.models import Profile
+from users.models.profile import invalidate_active_game_participation
+
+logger = logging.getLogger("server")
+
+# results that come during this time are written together
+RESULTS_FLUSH_INTERVAL = 0.25
+RESULTS_MAX_BATCH_SIZE = 100
+# in seconds, the last one is repeated until the database is back
+RESULTS_RETRY_DELAYS = (0.5, 1, 2, 5, 10, 30)
+
+
+class MatchResult(TypedDict):
+    winner_profile_id: int
+    loser_profile_id: int
+    winners_score: int
+    losers_score: int
+    elo_change: int
+    winners_elo: int
+    losers_elo: int
+
+
+class BracketResult(TypedDict):
+    bracket_id: str
+    tournament_id: str
+    winner_profile_id: int
+    winners_score: int
+    losers_score: int
+    status: Literal["finished", "cancelled"]
+
+
+class FinishedGameRoom(TypedDict):
+    """Game room to close, with the result of the match if it was played. JSON serializable for the spool."""
+
+    game_room_id: str
+    date: str
+    match: NotRequired[MatchResult]
+    bracket: NotRequired[BracketResult]
+
+
+def write_finished_game_rooms(finished_game_rooms: list[FinishedGameRoom]) -> list[FinishedGameRoom]:
+    """
+    Writes the results and closes the game rooms in one transaction.
+    Returns the ones that were written, without the game rooms that were already closed before.
+    """
+    with transaction.atomic():
+        open_game_room_ids = {
+            str(game_room_id)
+            for game_room_id in GameRoom.objects.select_for_update()
+            .filter(id__in=[finished["game_room_id"] for finished in finished_game_rooms])
+            .exclude(status=GameRoom.CLOSED)
+            .values_list("id", flat=True)
+        }
+        written = [finished for finished in finished_game_rooms if finished["game_room_id"] in open_game_room_ids]
+
+        matches = []
+        for finished in written:
+            if match_result := finished.get("match"):
+                winners_elo, losers_elo = match_result["winners_elo"], match_result["losers_elo"]
+                if elo_change := match_result["elo_change"]:
+                    winners_elo, losers_elo = _apply_elo_change(match_result)
+                matches.append(
+                    Match(
+                        # match has the id of its game room, its replay is named by it
+                        id=finished["game_room_id"],
+                        winner_id=match_result["winner_profile_id"],
+                        loser_id=match_result["loser_profile_id"],
+                        winners_score=match_result["winners_score"],
+                        losers_score=match_result["losers_score"],
+                        elo_change=elo_change,
+                        winners_elo=winners_elo,
+                        losers_elo=losers_elo,
+                        date=datetime.fromisoformat(finished["date"]),
+                    ),
+                )
+            if bracket_result := finished.get("bracket"):
+                Bracket.objects.update_finished_bracket(
+                    bracket_id=bracket_result["bracket_id"],
+                    winner_profile_id=bracket_result["winner_profile_id"],
+                    winners_score=bracket_result["winners_score"],
+                    losers_score=bracket_result["losers_score"],
+                    status=bracket_result["status"],
+                )
+        Match.objects.bulk_create(matches)
+        GameRoom.objects.filter(id__in=open_game_room_ids).update(status=GameRoom.CLOSED)
+        invalidate_active_game_participation(
+            *GameRoomPlayer.objects.filter(game_room_id__in=open_game_room_ids).values_list("profile_id", flat=True),
+        )
+    return written
+
+
+def _apply_elo_change(match_result: MatchResult) -> tuple[int, int]:
+    """
+    Adds the change to the current ELO of the players, and not to the one the worker had when they connected, so the
+    results of the other matches written in the meantime are kept. Returns the new ELO of the winner and the loser.
+    """
+    winner_profile_id, loser_profile_id = match_result["winner_profile_id"], match_result["loser_profile_id"]
+    elo_change = match_result["elo_change"]
+    Profile.objects.filter(id=winner_profile_id).update(
+        elo=Greatest(Least(F("elo") + elo_change, Match.MAXIMUM_ELO), Match.MINIMUM_ELO),
+    )
+    Profile.objects.filter(id=loser_profile_id).update(
+        elo=Greatest(Least(F("elo") - elo_change, Match.MAXIMUM_ELO), Match.MINIMUM_ELO),
+    )
+    elos = dict(Profile.objects.filter(id__in=[winner_profile_id, loser_profile_id]).values_list("id", "elo"))
+    return (
+        elos.get(winner_profile_id, match_result["winners_elo"]),
+        elos.get(loser_profile_id, match_result["losers_elo"]),
+    )
+
+
+def get_spool_path(channel_name: str) -> Path | None:
+    """Every game worker has its own spool. Spooling is disabled if `GAME_RESULT_SPOOL_DIR` is empty."""
+    if not settings.GAME_RESULT_SPOOL_DIR:
+        return None
+    return Path(settings.GAME_RESULT_SPOOL_DIR) / f"{channel_name}.jsonl"
+
+
+class MatchResultWriter:
+    """
+    Queue of the finished game rooms of one game worker, mirrored in the spool file.
+    `on_written` is called with the game rooms of every written batch, for the notifications that have to wait for
+    the database, like the one for the tournament worker.
+    """
+
+    def __init__(
+        self,
+        spool_path: str | Path | None,
+        on_written: Callable[[list[FinishedGameRoom]], Awaitable[None]],
+    ):
+        self.spool_path = Path(spool_path) if spool_path else None
+        self.on_written = on_written
+        self.pending: list[FinishedGameRoom] = []
+        self._flush_task: asyncio.Task | None = None
+
+    def load_spool(self):
+        """Takes the results left in the spool by the previous run of the worker."""
+        if not self.spool_path or not self.spool_path.exists():
+            return
+        for line in self.spool_path.read_text().splitlines():
+            try:
+                self.pending.append(json.loads(line))
+            except json.JSONDecodeError:  # noqa: PERF203
+                logger.warning("[MatchResultWriter]: skipping corrupted line of the spool {%s}", self.spool_path)
+        if self.pending:
+            logger.info("[MatchResultWriter]: {%s} results were left in the spool", len(self.pending))
+            self._start_flushing()
+
+    def submit(self, finished: FinishedGameRoom):
+        self.pending.append(finished)
+        if self.spool_path:
+            try:
+                self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.spool_path.open("a") as spool:
+                    spool.write(json.dumps(finished) + "\n")
+            except OSError:
+                logger.critical("[MatchResultWriter]: unable to spool the result\n%s", traceback.format_exc())
+        self._start_flushing()
+
+    async def flush(self) -> bool:
+        """
+        Writes one batch. If the batch fails, its results are written one by one, so one broken result doesn't hold
+        the others. Returns `False` if some of them failed, they stay pending then.
+        """
+        batch = self.pending[:RESULTS_MAX_BATCH_SIZE]
+        if not batch:
+            return True
+        failed = []
+        try:
+            written = await database_sync_to_async(write_finished_game_rooms)(batch)
+        except Exception:  # noqa: BLE001
+            logger.error("[MatchResultWriter]: unable to write {%s} results\n%s", len(batch), traceback.format_exc())
+            if len(batch) == 1:
+                return False
+            written = []
+            for finished in batch:
+                try:
+                    written.extend(await database_sync_to_async(write_finished_game_rooms)([finished]))
+                except Exception:  # noqa: BLE001, PERF203
+                    failed.append(finished)
+
+        self.pending[: len(batch)] = failed
+        self._rewrite_spool()
+        if written:
+            await self.on_written(written)
+        return not failed
+
+    def _start_flushing(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_task_loop())
+
+    async def _flush_task_loop(self):
+        failures = 0
+        while self.pending:
+            retry_delay = RESULTS_RETRY_DELAYS[min(failures, len(RESULTS_RETRY_DELAYS)) - 1]
+            await asyncio.sleep(retry_delay if failures else RESULTS_FLUSH_INTERVAL)
+            failures = 0 if await self.flush() else failures + 1
+
+    def _rewrite_spool(self):
+        if not self.spool_path:
+            return
+        try:
+            temporary_path = self.spool_path.with_suffix(".tmp")
+            temporary_path.write_text("".join(json.dumps(finished) + "\n" for finished in self.pending))
+            temporary_path.replace(self.spool_path)
+        except OSError:
+            logger.critical("[MatchResultWriter]: unable to update the spool\n%s", traceback.format_exc())
@@ -0,0 +1,143 @@
+"""
+Snapshots of the matches of the game worker, so the restarted worker resumes its matches instead of losing them.
+The worker saves the snapshots of all of its matches every `GAME_SNAPSHOT_INTERVAL` seconds between the ticks, and the
+file is written by a thread, so the game loop doesn't wait for the disk. Only the state that can't be derived is saved:
+the engine state, the players and the timers. Queued inputs are dropped, the clients send new ones.
+
+Clock of the event loop starts anew in the restarted process, so every time is saved relative to the moment of the
+snapshot and rebased when the match is restored. The time during which the worker was down doesn't count.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import traceback
+from pathlib import Path
+from typing import Literal, TypedDict
+
+from django.conf import settings
+
+from pong.game_protocol import ClientToGameServer, GameRoomSettings
+
+logger = logging.getLogger("server")
+
+# older snapshots are not resumed: clients have given up on these matches, and their events have expired
+SNAPSHOT_MAX_AGE = 60
+
+
+class BumperSnapshot(TypedDict):
+    x: float
+    width_half: float
+    lenght_half: float
+    score: int
+    speed: float
+    control_reversed: bool
+
+
+class EngineSnapshot(TypedDict):
+    game_speed: Literal[0.75, 1.0, 1.25]
+    started_ago: float
+    is_someone_scored: bool
+    bumpers: list[BumperSnapshot]
+    # x, z, velocity x, velocity z, temporal speed x, temporal speed z
+    ball: list[float]
+    # x, z, velocity x, velocity z. None if the match is not in cool mode
+    coin: list[float] | None
+    last_coin_hit_ago: float
+    # bumpers are referenced by their number: 1, 2, or 0 for none
+    last_bumper_collided: int
+    buff: int
+    buff_started_ago: float
+    buff_target: int
+
+
+class PlayerSnapshot(TypedDict):
+    id: str
+    connection: str
+    connected_ago: float
+    # remaining time to reconnect
+    reconnection_time: float
+    profile_id: int
+    name: str
+    opponents_name: str
+    avatar: str
+    elo: int
+    tick_socket_path: str | None
+    last_processed_move: ClientToGameServer.PlayerInput
+
+
+class MatchSnapshot(TypedDict):
+    id: str
+    settings: GameRoomSettings
+    is_in_tournament: bool
+    bracket_id: None | str
+    tournament_id: None | str
+    status: str
+    time_limit_reached: bool
+    total_paused_time: float
+    # 0.0 if the match is not paused
+    paused_ago: float
+    engine: EngineSnapshot
+    players: list[PlayerSnapshot]
+
+
+class WorkerSnapshot(TypedDict):
+    # unix time
+    saved_at: float
+    matches: list[MatchSnapshot]
+
+
+class MatchSnapshotStore:
+    """File with the latest snapshot of the matches of one game worker. Disabled if `path` is `None`."""
+
+    def __init__(self, path: str | Path | None, interval: float):
+        self.path = Path(path) if path else None
+        self.interval = interval
+        self.last_save_time = float("-inf")
+        self._save_task: asyncio.Task | None = None
+
+    @classmethod
+    def for_worker(cls, channel_name: str) -> "MatchSnapshotStore":
+        path = Path(settings.GAME_SNAPSHOT_DIR) / f"{channel_name}.json" if settings.GAME_SNAPSHOT_DIR else None
+        return cls(path, settings.GAME_SNAPSHOT_INTERVAL)
+
+    def is_due(self, current_time: float) -> bool:
+        """Snapshot is skipped if the previous one is still being written."""
+        return (
+            self.path is not None
+            and self.interval > 0
+            and current_time - self.last_save_time >= self.interval
+            and (self._save_task is None or self._save_task.done())
+        )
+
+    async def save(self, current_time: float, matches: list[MatchSnapshot]):
+        """Starts writing the snapshot after the previous one is written. No matches remove the file."""
+        if self.path is None:
+            return
+        if self._save_task is not None:
+            await self._save_task
+        self.last_save_time = current_time
+        snapshot = WorkerSnapshot(saved_at=time.time(), matches=matches)
+        self._save_task = asyncio.create_task(asyncio.to_thread(self._write, snapshot))
+
+    def load(self) -> WorkerSnapshot | None:
+        if self.path is None or not self.path.exists():
+            return None
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, json.JSONDecodeError):
+            logger.critical("[MatchSnapshotStore]: unable to read the snapshot\n%s", traceback.format_exc())
+            return None
+
+    def _write(self, snapshot: WorkerSnapshot):
+        try:
+            if not snapshot["matches"]:
+                self.path.unlink(missing_ok=True)
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_path = self.path.with_suffix(".tmp")
+            temporary_path.write_text(json.dumps(snapshot, separators=(",", ":")))
+            temporary_path.replace(self.path)
+        except OSError:
+            logger.critical("[MatchSnapshotStore]: unable to save the snapshot\n%s", traceback.format_exc())
@@ -0,0 +1,56 @@
+"""
+Metrics of the matchmaking worker: how many searches wait, how long the paired players have waited, and how far apart
+their elo was. Long waits show that the elo range widens too slowly, large gaps that it widens too fast.
+The worker collects them in `MatchmakingMetrics` and sends the snapshot in reply to the `matchmaking_metrics` event, see
+the `matchmaking_metrics` management command.
+"""
+
+from typing import TypedDict
+
+from pong.game_worker_metrics import Histogram, HistogramSnapshot
+
+WAIT_TIME_BUCKETS_MS = (1000, 2000, 5000, 10000, 20000, 30000, 60000, 120000, 300000, float("inf"))
+ELO_GAP_BUCKETS = (0, 10, 25, 50, 100, 150, 200, 300, 500, 1000, float("inf"))
+
+
+class EloGapSnapshot(TypedDict):
+    count: int
+    max: float
+    p50: float
+    p99: float
+    # counts of the gaps per upper bound of the bucket
+    buckets: dict[str, int]
+
+
+class MatchmakingMetricsSnapshot(TypedDict):
+    waiting_searches: int
+    # how long the oldest of the waiting searches waits, in milliseconds
+    longest_wait_ms: float
+    wait_time: HistogramSnapshot
+    elo_gap: EloGapSnapshot
+
+
+class MatchmakingMetrics:
+    def __init__(self):
+        self.wait_time = Histogram(WAIT_TIME_BUCKETS_MS)
+        self.elo_gap = Histogram(ELO_GAP_BUCKETS)
+
+    def record_pair(self, first_wait_time: float, second_wait_time: float, elo_gap: int):
+        self.wait_time.record(first_wait_time)
+        self.wait_time.record(second_wait_time)
+        self.elo_gap.record_value(elo_gap)
+
+    def snapshot(self, waiting_searches: int, longest_wait_time: float) -> MatchmakingMetricsSnapshot:
+        elo_gap = self.elo_gap.snapshot()
+        return MatchmakingMetricsSnapshot(
+            waiting_searches=waiting_searches,
+            longest_wait_ms=longest_wait_time * 1000,
+            wait_time=self.wait_time.snapshot(),
+            elo_gap=EloGapSnapshot(
+                count=elo_gap["count"],
+                max=elo_gap["max_ms"],
+                p50=elo_gap["p50_ms"],
+                p99=elo_gap["p99_ms"],
+                buckets=elo_gap["buckets"],
+            ),
+        )
@@ -0,0 +1,177 @@
+"""
+Pending searches of the matchmaking, held in memory by `MatchmakingWorkerConsumer`.
+Two searches can be paired if every setting that both of them have is the same: a setting that the player left as "any"
+is missing in the settings of the search, and accepts any value of the other one. The searches are indexed by these
+settings, so finding the opponent doesn't depend on the number of the searches.
+
+A search with the specified settings `specified` (a mask of `SETTINGS_KEYS`) is added to a bucket for every subset
+`shared` of them, under the key `(specified, shared, values of the shared settings)`. The new search finds its opponent
+among the searches with any `specified`: it looks up the bucket where `shared` are the settings that both of them have,
+so there are at most `2 ** len(SETTINGS_KEYS)` lookups and additions for every search.
+
+Every bucket is sorted by elo, so the closest opponent in the bucket is found by the binary search. The player accepts
+the opponent whose elo is within the elo range of the player, which widens the longer the player waits: the searches
+that still wait are matched again with their wider ranges by `match_waiting`.
+"""
+
+import bisect
+import itertools
+from dataclasses import dataclass, field
+
+from pong.game_protocol import GameRoomSettings
+from pong.models import get_default_game_room_settings
+
+SETTINGS_KEYS = tuple(get_default_game_room_settings())
+ALL_SETTINGS_MASK = (1 << len(SETTINGS_KEYS)) - 1
+
+BucketKey = tuple[int, int, tuple]
+# elo, number and channel name of the search, in the sorted bucket
+BucketEntry = tuple[int, int, str]
+
+
+@dataclass(slots=True)
+class MatchmakingSearch:
+    # channel of `MatchmakingConsumer` of the player
+    channel_name: str
+    profile_id: int
+    settings: GameRoomSettings
+    elo: int
+    # when the search was added to the queue, and its order among the other searches
+    started_at: float = 0.0
+    number: int = 0
+    specified_mask: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        self.specified_mask = sum(1 << i for i, key in enumerate(SETTINGS_KEYS) if key in self.settings)
+
+    def get_bucket_key(self, specified_mask: int, shared_mask: int) -> BucketKey:
+        values = tuple(self.settings[key] for i, key in enumerate(SETTINGS_KEYS) if shared_mask & (1 << i))
+        return specified_mask, shared_mask, values
+
+    def get_bucket_keys(self) -> list[BucketKey]:
+        """Keys of the buckets of this search: its specified settings, and every subset of them."""
+        mask = self.specified_mask
+        return [self.get_bucket_key(mask, shared_mask) for shared_mask in _get_submasks(mask)]
+
+    def get_bucket_entry(self) -> BucketEntry:
+        return self.elo, self.number, self.channel_name
+
+
+def _get_submasks(mask: int) -> list[int]:
+    submasks = []
+    submask = mask
+    while True:
+        submasks.append(submask)
+        if not submask:
+            return submasks
+        submask = (submask - 1) & mask
+
+
+class MatchmakingQueue:
+    """
+    `elo_range`: the largest elo difference with the opponent the player accepts right away.
+    `elo_range_growth`: how much the range widens for every second of the wait.
+    """
+
+    def __init__(self, elo_range: float, elo_range_growth: float):
+        self.elo_range = elo_range
+        self.elo_range_growth = elo_range_growth
+        self._buckets: dict[BucketKey, list[BucketEntry]] = {}
+        # the first search is the oldest
+        self._searches: dict[str, MatchmakingSearch] = {}
+        self._searches_by_profile: dict[int, str] = {}
+        self._numbers = itertools.count()
+
+    def __len__(self):
+        return len(self._searches)
+
+    def __contains__(self, channel_name: str):
+        return channel_name in self._searches
+
+    def get_search_of_profile(self, profile_id: int) -> MatchmakingSearch | None:
+        channel_name = self._searches_by_profile.get(profile_id)
+        return None if channel_name is None else self._searches[channel_name]
+
+    def get_longest_wait_time(self, current_time: float) -> float:
+        oldest = next(iter(self._searches.values()), None)
+        return 0.0 if oldest is None else current_time - oldest.started_at
+
+    def get_elo_range(self, search: MatchmakingSearch, current_time: float) -> float:
+        return self.elo_range + self.elo_range_growth * (current_time - search.started_at)
+
+    def add(self, search: MatchmakingSearch, current_time: float) -> MatchmakingSearch | None:
+        """
+        Returns the compatible search with the closest elo within the range of the new one, which is removed from the
+        queue, or None if the new search has to wait. A new search of the player replaces the previous one.
+        """
+        if (previous_channel_name := self._searches_by_profile.get(search.profile_id)) is not None:
+            self.remove(previous_channel_name)
+
+        search.started_at = current_time
+        search.number = next(self._numbers)
+        opponent = self._find_opponent(search, self.elo_range)
+        if opponent is not None:
+            self.remove(opponent.channel_name)
+            return opponent
+
+        self._searches[search.channel_name] = search
+        self._searches_by_profile[search.profile_id] = search.channel_name
+        entry = search.get_bucket_entry()
+        for key in search.get_bucket_keys():
+            bisect.insort(self._buckets.setdefault(key, []), entry)
+        return None
+
+    def remove(self, channel_name: str) -> MatchmakingSearch | None:
+        search = self._searches.pop(channel_name, None)
+        if search is None:
+            return None
+        del self._searches_by_profile[search.profile_id]
+        entry = search.get_bucket_entry()
+        for key in search.get_bucket_keys():
+            bucket = self._buckets[key]
+            del bucket[bisect.bisect_left(bucket, entry)]
+            if not bucket:
+                del self._buckets[key]
+        return search
+
+    def match_waiting(self, current_time: float) -> list[tuple[MatchmakingSearch, MatchmakingSearch]]:
+        """
+        Pairs the waiting searches whose elo ranges have widened enough, the oldest ones first. The pairs are removed
+        from the queue, and the older search of the pair is the first.
+        """
+        pairs = []
+        for search in list(self._searches.values()):
+            if search.channel_name not in self._searches:
+                continue
+            opponent = self._find_opponent(search, self.get_elo_range(search, current_time))
+            if opponent is not None:
+                self.remove(search.channel_name)
+                self.remove(opponent.channel_name)
+                pairs.append((search, opponent))
+        return pairs
+
+    def _find_opponent(self, search: MatchmakingSearch, elo_range: float) -> MatchmakingSearch | None:
+        """Compatible search with the closest elo within `elo_range`. The older one is preferred on ties."""
+        closest = None
+        for specified_mask in range(ALL_SETTINGS_MASK + 1):
+            bucket = self._buckets.get(search.get_bucket_key(specified_mask, specified_mask & search.specified_mask))
+            if not bucket:
+                continue
+            for candidate in _get_closest_entries(bucket, search):
+                elo_gap = abs(candidate[0] - search.elo)
+                if elo_gap <= elo_range and (closest is None or (elo_gap, candidate[1]) < closest[0]):
+                    closest = (elo_gap, candidate[1]), candidate[2]
+        return None if closest is None else self._searches[closest[1]]
+
+
+def _get_closest_entries(bucket: list[BucketEntry], search: MatchmakingSearch) -> list[BucketEntry]:
+    """The oldest entries with the closest elo below and above the elo of the search, skipping the search itself."""
+    entries = []
+    index = bisect.bisect_left(bucket, (search.elo,))
+    if index > 0:
+        entries.append(bucket[bisect.bisect_left(bucket, (bucket[index - 1][0],), 0, index)])
+    if index < len(bucket) and bucket[index][2] == search.channel_name:
+        index += 1
+    if index < len(bucket):
+        entries.append(bucket[index])
+    return entries
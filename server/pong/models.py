@@ -3,8 +3,8 @@ from datetime import datetime
 from urllib.parse import parse_qs
 
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
-from django.db import models, transaction
-from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db import connection, models, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
 from django.db.models.functions import TruncDate
 from django.utils import timezone
 
@@ -193,41 +193,33 @@ class GameRoomPlayer(models.Model):
         return f"{self.profile.user.username} in Room {self.game_room.id}"
 
     def inc_number_of_connections(self) -> int:
-        self.number_of_connections = F("number_of_connections") + 1
-        self.save()
-        self.refresh_from_db()
-        return self.number_of_connections
+        return self._add_to_number_of_connections(1)
 
     def dec_number_of_connections(self) -> int:
-        if self.number_of_connections > 0:
-            self.number_of_connections = F("number_of_connections") - 1
-            self.save()
-            self.refresh_from_db()
-        return self.number_of_connections
-
+        return self._add_to_number_of_connections(-1)
 
-class GameRoomQuerySet(models.QuerySet):
-    def for_settings(self, settings: GameRoomSettings) -> models.QuerySet:
+    def _add_to_number_of_connections(self, delta: int) -> int:
         """
-        Returns a QuerySet based on the GameRoomSettings. Excludes all the game rooms with conflicting settings.
+        Changes the counter atomically in one `UPDATE ... RETURNING` query, which neither writes the rest of the row
+        nor reads it again. The counter doesn't go below 0. Drift left by the crashed servers is fixed on the startup by
+        the `reset_game_room_connection_counters` management command.
         """
-        compatible_settings_query = Q()
-        for key, value in settings.items():
-            compatible_settings_query &= ~Q(settings__has_key=key) | Q(settings__contains={key: value})
-
-        return self.filter(compatible_settings_query)
-
-    def for_valid_game_room(self, profile: Profile, settings: GameRoomSettings):
-        """Valid game room is a pending game room with less than 2 players."""
-        return (
-            self.annotate(players_count=Count("players"))
-            .filter(
-                status=GameRoom.PENDING,
-                players_count__lt=2,
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._meta.db_table)
+        column = quote_name("number_of_connections")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET {column} = GREATEST({column} + %s, 0) "  # noqa: S608
+                f"WHERE {quote_name(self._meta.pk.column)} = %s RETURNING {column}",
+                [delta, self.pk],
             )
-            .for_settings(settings)
-        )
+            row = cursor.fetchone()
+        if row is not None:
+            self.number_of_connections = row[0]
+        return self.number_of_connections
+
 
+class GameRoomQuerySet(models.QuerySet):
     def for_id(self, game_room_id: str):
         try:
             return self.filter(id=game_room_id)
@@ -256,6 +248,9 @@ def get_default_game_room_settings() -> GameRoomSettings:
     )
 
 
+GAME_SPEEDS = ("slow", "medium", "fast")
+
+
 class GameRoom(models.Model):
     """
     Represents a game room where the players either look for an opponent or play a match.
@@ -374,11 +369,7 @@ class GameRoom(models.Model):
                 else:
                     result[setting_key] = setting_type(setting_value)
 
-            if "game_speed" in result and result["game_speed"] not in [
-                "slow",
-                "medium",
-                "fast",
-            ]:
+            if "game_speed" in result and result["game_speed"] not in GAME_SPEEDS:
                 return None
 
             provided_time_limit = result.get("time_limit")
@@ -0,0 +1,286 @@
+"""
+Replays of the matches. Instead of every frame, only what can't be calculated is recorded: the inputs of the players on
+every tick, and periodic keyframes of the engine state. Playback runs `BasePong` through the same ticks with the same
+inputs, and the engine is deterministic, so it produces the same states as the live match.
+The random choices of the engine (buffs of the coin) are reseeded with a recorded seed on every keyframe.
+
+The file is named by the id of the match, which is the id of its game room, and consists of:
+- `REPLAY_MAGIC`.
+- chunks: uint32 length of the chunk followed by the zlib-compressed records. Every chunk starts with a keyframe, a new
+  one is written every `REPLAY_KEYFRAME_INTERVAL` ticks. Chunk is written to the file when it's complete, so the file
+  is never rewritten, and the file of a worker that crashed is valid up to the last complete chunk.
+Records have fixed size:
+- `TICK_RECORD`: kind, time of the tick in seconds, flags of the inputs and the number of the game ticks resolved at
+  once, which is more than one when the worker is overloaded, see `pong/game_worker_load.py`.
+- `KEYFRAME_RECORD`: kind, seed of the random choices and the engine state, see `EngineSnapshot`.
+- `LAG_RECORD`: kind, catch-up moves and lag compensation in milliseconds of both bumpers, for the following ticks.
+  Written only when they change, and after every keyframe.
+"""
+
+import logging
+import random
+import struct
+import traceback
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+
+from pong.game_protocol import SerializedGameState
+from pong.match_snapshots import BumperSnapshot, EngineSnapshot
+
+if TYPE_CHECKING:
+    from pong.consumers.game_worker import MultiplayerPongMatch
+
+logger = logging.getLogger("server")
+
+REPLAY_MAGIC = b"PONGRPL1"
+# 10 seconds of the game ticks
+REPLAY_KEYFRAME_INTERVAL = 300
+
+RECORD_TICK = 1
+RECORD_KEYFRAME = 2
+RECORD_LAG = 3
+
+FLAG_BUMPER_1_MOVES_LEFT = 1 << 0
+FLAG_BUMPER_1_MOVES_RIGHT = 1 << 1
+FLAG_BUMPER_2_MOVES_LEFT = 1 << 2
+FLAG_BUMPER_2_MOVES_RIGHT = 1 << 3
+# time limit was reached at this tick, and the ball was set to the max speed
+FLAG_SUDDEN_DEATH = 1 << 4
+# the rest of the flags is the number of the game ticks resolved at once, minus one
+TICKS_SHIFT = 5
+
+CHUNK_LENGTH = struct.Struct("<I")
+TICK_RECORD = struct.Struct("<BdB")
+LAG_RECORD = struct.Struct("<B4B")
+NO_LAG = (0, 0, 0, 0)
+_BUMPER_FIELDS = "ddd B d?"
+KEYFRAME_RECORD = struct.Struct(f"<BQ d d? {_BUMPER_FIELDS} {_BUMPER_FIELDS} 6d ?4d dBBdB".replace(" ", ""))
+RECORD_SIZES = {RECORD_TICK: TICK_RECORD.size, RECORD_KEYFRAME: KEYFRAME_RECORD.size, RECORD_LAG: LAG_RECORD.size}
+
+
+def get_replay_path(match_id: str) -> Path | None:
+    """Recording is disabled if `GAME_REPLAY_DIR` is empty."""
+    if not settings.GAME_REPLAY_DIR:
+        return None
+    return Path(settings.GAME_REPLAY_DIR) / f"{match_id}.replay"
+
+
+def _pack_keyframe(seed: int, engine: EngineSnapshot) -> bytes:
+    bumper_fields = []
+    for bumper in engine["bumpers"]:
+        bumper_fields.extend(
+            (
+                bumper["x"],
+                bumper["width_half"],
+                bumper["lenght_half"],
+                bumper["score"],
+                bumper["speed"],
+                bumper["control_reversed"],
+            ),
+        )
+    return KEYFRAME_RECORD.pack(
+        RECORD_KEYFRAME,
+        seed,
+        engine["game_speed"],
+        engine["started_ago"],
+        engine["is_someone_scored"],
+        *bumper_fields,
+        *engine["ball"],
+        engine["coin"] is not None,
+        *(engine["coin"] or (0.0, 0.0, 0.0, 0.0)),
+        engine["last_coin_hit_ago"],
+        engine["last_bumper_collided"],
+        engine["buff"],
+        engine["buff_started_ago"],
+        engine["buff_target"],
+    )
+
+
+def _unpack_keyframe(record: bytes) -> tuple[int, EngineSnapshot]:
+    _, seed, game_speed, started_ago, is_someone_scored, *fields = KEYFRAME_RECORD.unpack(record)
+    bumpers = [
+        BumperSnapshot(
+            x=x,
+            width_half=width_half,
+            lenght_half=lenght_half,
+            score=score,
+            speed=speed,
+            control_reversed=control_reversed,
+        )
+        for x, width_half, lenght_half, score, speed, control_reversed in (fields[0:6], fields[6:12])
+    ]
+    ball, has_coin, coin = fields[12:18], fields[18], fields[19:23]
+    last_coin_hit_ago, last_bumper_collided, buff, buff_started_ago, buff_target = fields[23:]
+    return seed, EngineSnapshot(
+        game_speed=game_speed,
+        started_ago=started_ago,
+        is_someone_scored=is_someone_scored,
+        bumpers=bumpers,
+        ball=list(ball),
+        coin=list(coin) if has_coin else None,
+        last_coin_hit_ago=last_coin_hit_ago,
+        last_bumper_collided=last_bumper_collided,
+        buff=buff,
+        buff_started_ago=buff_started_ago,
+        buff_target=buff_target,
+    )
+
+
+class ReplayRecorder:
+    """Appends the ticks of one match to its replay file. Errors of the disk are logged, the match goes on."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._chunk = bytearray()
+        self._ticks_since_keyframe = 0
+        self._time_limit_reached = False
+        self._lag = NO_LAG
+        self._rng = random.Random()  # noqa: S311
+
+    @classmethod
+    def open(cls, match_id: str) -> "ReplayRecorder | None":
+        """
+        Creates the file, or continues the existing one, for example when the match was resumed from the snapshot.
+        The incomplete chunk that was left by the crashed worker is cut off.
+        """
+        path = get_replay_path(match_id)
+        if path is None:
+            return None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a+b") as replay:
+                replay.seek(0)
+                data = replay.read()
+                if not data.startswith(REPLAY_MAGIC):
+                    replay.truncate(0)
+                    replay.write(REPLAY_MAGIC)
+                else:
+                    replay.truncate(_get_complete_chunks_end(data))
+        except OSError:
+            logger.critical("[ReplayRecorder]: unable to open the replay {%s}\n%s", path, traceback.format_exc())
+            return None
+        return cls(path)
+
+    def record_tick(self, match: "MultiplayerPongMatch", current_time: float, ticks: int = 1):
+        """Called after the physics of the tick, while the inputs of the tick are still applied to the bumpers."""
+        bumper_1, bumper_2 = match.get_bumpers()
+        flags = (
+            (ticks - 1) << TICKS_SHIFT
+            | bumper_1.moves_left * FLAG_BUMPER_1_MOVES_LEFT
+            | bumper_1.moves_right * FLAG_BUMPER_1_MOVES_RIGHT
+            | bumper_2.moves_left * FLAG_BUMPER_2_MOVES_LEFT
+            | bumper_2.moves_right * FLAG_BUMPER_2_MOVES_RIGHT
+        )
+        if match.time_limit_reached and not self._time_limit_reached:
+            self._time_limit_reached = True
+            flags |= FLAG_SUDDEN_DEATH
+        lag = (
+            bumper_1.catch_up_moves,
+            bumper_2.catch_up_moves,
+            round(bumper_1.lag_compensation * 1000),
+            round(bumper_2.lag_compensation * 1000),
+        )
+        if lag != self._lag:
+            self._lag = lag
+            self._chunk += LAG_RECORD.pack(RECORD_LAG, *lag)
+        self._chunk += TICK_RECORD.pack(RECORD_TICK, current_time, flags)
+
+        self._ticks_since_keyframe += 1
+        if self._ticks_since_keyframe >= REPLAY_KEYFRAME_INTERVAL:
+            self.record_keyframe(match)
+
+    def record_keyframe(self, match: "MultiplayerPongMatch"):
+        """Writes the previous chunk and starts the new one. Random choices of the match are reseeded."""
+        self._write_chunk()
+        self._time_limit_reached = match.time_limit_reached
+        seed = self._rng.getrandbits(64)
+        match.reseed(seed)
+        # times are saved as they are, snapshot relative to 0.0 doesn't lose their precision
+        self._chunk += _pack_keyframe(seed, match.get_engine_snapshot(0.0))
+        self._ticks_since_keyframe = 0
+        self._lag = NO_LAG
+
+    def close(self):
+        self._write_chunk()
+
+    def _write_chunk(self):
+        if not self._chunk:
+            return
+        compressed = zlib.compress(self._chunk)
+        self._chunk.clear()
+        try:
+            with self.path.open("ab") as replay:
+                replay.write(CHUNK_LENGTH.pack(len(compressed)) + compressed)
+        except OSError:
+            logger.critical("[ReplayRecorder]: unable to write the replay {%s}\n%s", self.path, traceback.format_exc())
+
+
+def _get_complete_chunks_end(data: bytes) -> int:
+    offset = len(REPLAY_MAGIC)
+    while offset + CHUNK_LENGTH.size <= len(data):
+        (length,) = CHUNK_LENGTH.unpack_from(data, offset)
+        if offset + CHUNK_LENGTH.size + length > len(data):
+            break
+        offset += CHUNK_LENGTH.size + length
+    return offset
+
+
+def read_records(data: bytes) -> Iterator[bytes]:
+    """Records of the replay file, up to the last complete chunk."""
+    if not data.startswith(REPLAY_MAGIC):
+        msg = "Not a replay file"
+        raise ValueError(msg)
+    offset = len(REPLAY_MAGIC)
+    end = _get_complete_chunks_end(data)
+    while offset < end:
+        (length,) = CHUNK_LENGTH.unpack_from(data, offset)
+        offset += CHUNK_LENGTH.size
+        records = zlib.decompress(data[offset : offset + length])
+        offset += length
+        position = 0
+        while position < len(records):
+            size = RECORD_SIZES[records[position]]
+            yield records[position : position + size]
+            position += size
+
+
+def play_replay(data: bytes) -> Iterator[tuple[float, SerializedGameState]]:
+    """Plays the replay on `BasePong`, yields the time and the state of every recorded tick."""
+    # engine is built on top of this module
+    from pong.consumers.game_worker import GAME_TICK_INTERVAL, BasePong
+
+    pong = None
+    lag = NO_LAG
+    for record in read_records(data):
+        if record[0] == RECORD_KEYFRAME:
+            seed, engine = _unpack_keyframe(record)
+            if pong is None:
+                pong = BasePong(cool_mode=engine["coin"] is not None, game_speed=engine["game_speed"], start_time=0.0)
+            pong.restore_engine_snapshot(engine, 0.0)
+            pong.reseed(seed)
+            lag = NO_LAG
+            continue
+        if record[0] == RECORD_LAG:
+            lag = LAG_RECORD.unpack(record)[1:]
+            continue
+        if pong is None:
+            continue
+
+        _, current_time, flags = TICK_RECORD.unpack(record)
+        bumper_1, bumper_2 = pong.get_bumpers()
+        bumper_1.moves_left = bool(flags & FLAG_BUMPER_1_MOVES_LEFT)
+        bumper_1.moves_right = bool(flags & FLAG_BUMPER_1_MOVES_RIGHT)
+        bumper_2.moves_left = bool(flags & FLAG_BUMPER_2_MOVES_LEFT)
+        bumper_2.moves_right = bool(flags & FLAG_BUMPER_2_MOVES_RIGHT)
+        ticks = (flags >> TICKS_SHIFT) + 1
+        for bumper, catch_up_moves, lag_compensation in zip((bumper_1, bumper_2), lag[:2], lag[2:], strict=True):
+            pong.set_catch_up_moves(bumper, catch_up_moves, ticks)
+            bumper.lag_compensation = lag_compensation / 1000
+        if flags & FLAG_SUDDEN_DEATH:
+            pong.set_ball_to_max_speed()
+        pong.resolve_next_tick(ticks * GAME_TICK_INTERVAL, current_time)
+        yield current_time, pong.as_dict()
@@ -1,4 +1,4 @@
-from django.http import HttpRequest
+from django.http import FileResponse, HttpRequest
 from ninja import Router
 from ninja.errors import HttpError
 from ninja.pagination import paginate
@@ -6,6 +6,7 @@ from ninja.pagination import paginate
 from common.routers import get_profile_queryset_by_username_or_404
 from common.schemas import MessageSchema
 from pong.models import Match
+from pong.replays import get_replay_path
 from pong.schemas import EloDataPointSchema, FullMatchStatsSchema, ProfileMatchPreviewSchema
 
 game_stats_router = Router()
@@ -65,3 +66,21 @@ def get_match(request: HttpRequest, game_id: str):
     if not match:
         raise HttpError(404, "Match not found")
     return match
+
+
+@game_stats_router.get(
+    "matches/{game_id}/replay",
+    response={frozenset({401, 404}): MessageSchema},
+)
+def get_match_replay(request: HttpRequest, game_id: str):
+    """
+    Streams the replay of a specific match by its id, in chunks, as `application/octet-stream`.
+    Format of the replay is described in `pong.replays`.
+    """
+    match = Match.objects.filter(id=game_id).first()
+    if not match:
+        raise HttpError(404, "Match not found")
+    replay_path = get_replay_path(str(match.pk))
+    if replay_path is None or not replay_path.exists():
+        raise HttpError(404, "Replay not found")
+    return FileResponse(replay_path.open("rb"), content_type="application/octet-stream")
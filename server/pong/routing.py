@@ -6,4 +6,5 @@ from . import consumers
 websocket_urlpatterns = [
     path("ws/matchmaking/", consumers.MatchmakingConsumer.as_asgi()),
     path("ws/pong/<game_room_id>/", consumers.GameServerConsumer.as_asgi()),
+    path("ws/pong/<game_room_id>/spectate/", consumers.GameSpectatorConsumer.as_asgi()),
 ]
@@ -4,6 +4,7 @@ from ninja import Field, Schema
 
 from common.schemas import ProfileMinimalSchema
 from pong.models import Match
+from pong.replays import get_replay_path
 from users.models import Profile
 
 
@@ -54,3 +55,9 @@ class FullMatchStatsSchema(Schema):
     winners_score: int
     losers_score: int
     date: datetime
+    has_replay: bool = Field(description="Whether the replay can be downloaded from `matches/{game_id}/replay`.")
+
+    @staticmethod
+    def resolve_has_replay(obj: Match):
+        replay_path = get_replay_path(str(obj.pk))
+        return replay_path is not None and replay_path.exists()
@@ -0,0 +1,149 @@
+"""
+Headless simulation of many pong matches played by bots, without channels, Redis or the database.
+Everything random is seeded (settings of the matches, the bots and the buffs of the coin), so the same arguments always
+produce the same games, and `state_checksum` of the result changes only when the behaviour of the engine changes.
+"""
+
+import hashlib
+import random
+import statistics
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Literal
+
+from pong import batch_pong
+from pong.consumers.game_worker import GAME_TICK_INTERVAL, GAME_TICKS_PER_SECOND, Ball, BasePong, Bumper
+
+Engine = Literal["auto", "scalar", "batch"]
+# sets `moves_left` and `moves_right` of the bumper before the tick, like the inputs of the player would
+Bot = Callable[[Bumper, Ball, random.Random], None]
+
+FOLLOW_BALL_CHANCE = 0.7
+# the bot that doesn't follow the ball moves left, doesn't move or moves right
+MISTAKE_MOVE_LEFT_CHANCE = 0.8
+MISTAKE_MOVE_RIGHT_CHANCE = 0.9
+COOL_MODE_CHANCE = 0.75
+GAME_SPEEDS = (0.75, 1.0, 1.25)
+
+
+def follow_ball_bot(bumper: Bumper, ball: Ball, rng: random.Random):
+    """Mostly follows the ball, so there are a lot of bumper hits, coins and scores."""
+    roll = rng.random()
+    follows_ball = roll < FOLLOW_BALL_CHANCE
+    bumper.moves_left = (follows_ball and ball.x > bumper.x) or (not follows_ball and roll < MISTAKE_MOVE_LEFT_CHANCE)
+    bumper.moves_right = (follows_ball and ball.x < bumper.x) or (not follows_ball and roll > MISTAKE_MOVE_RIGHT_CHANCE)
+
+
+def random_bot(bumper: Bumper, ball: Ball, rng: random.Random):
+    roll = rng.random()
+    bumper.moves_left = roll < 1 / 3
+    bumper.moves_right = roll > 2 / 3
+
+
+BOTS: dict[str, Bot] = {"follow_ball": follow_ball_bot, "random": random_bot}
+
+
+@dataclass(slots=True)
+class SimulationResult:
+    matches: int
+    ticks: int
+    seed: int
+    bot: str
+    engine: Engine
+    total_seconds: float
+    match_ticks_per_second: float
+    tick_time_avg_ms: float
+    tick_time_p99_ms: float
+    tick_time_max_ms: float
+    sub_ticks_per_match_tick: float
+    scores: int
+    state_checksum: str
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def create_matches(number_of_matches: int, seed: int) -> list[BasePong]:
+    rng = random.Random(seed)  # noqa: S311
+    return [
+        BasePong(
+            cool_mode=rng.random() < COOL_MODE_CHANCE,
+            game_speed=rng.choice(GAME_SPEEDS),
+            start_time=0.0,
+            rng=random.Random(f"{seed}-{i}"),  # noqa: S311
+        )
+        for i in range(number_of_matches)
+    ]
+
+
+def _play(pongs: list[BasePong], bot: Bot, rng: random.Random):
+    for pong in pongs:
+        ball = pong._ball  # noqa: SLF001
+        bot(pong._bumper_1, ball, rng)  # noqa: SLF001
+        bot(pong._bumper_2, ball, rng)  # noqa: SLF001
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * percentile), len(sorted_values) - 1)]
+
+
+def simulate(
+    number_of_matches: int,
+    number_of_ticks: int = GAME_TICKS_PER_SECOND * 60,
+    seed: int = 0,
+    bot: str = "follow_ball",
+    engine: Engine = "auto",
+) -> SimulationResult:
+    """
+    Plays all the matches for `number_of_ticks` ticks, the same way one game worker advances its matches.
+    Tick time is the time that resolving all the matches during one tick takes, the time of the bots is not counted.
+    `engine` is `"scalar"` for `BasePong.resolve_next_tick`, `"batch"` for `pong.batch_pong` regardless of the number
+    of matches, and `"auto"` for what the worker would use.
+    """
+    pongs = create_matches(number_of_matches, seed)
+    play = BOTS[bot]
+    bots_rng = random.Random(seed)  # noqa: S311
+    use_batch = engine == "batch" or (engine == "auto" and number_of_matches >= batch_pong.BATCH_PHYSICS_MIN_MATCHES)
+    # forced batch engine stays vectorized even for the few last matches with collisions
+    min_batch_size = 1 if engine == "batch" else None
+
+    tick_times = []
+    sub_ticks = 0
+    for tick in range(1, number_of_ticks + 1):
+        current_time = tick * GAME_TICK_INTERVAL
+        _play(pongs, play, bots_rng)
+
+        start = time.perf_counter()
+        if use_batch:
+            sub_ticks += batch_pong.resolve_next_tick(pongs, GAME_TICK_INTERVAL, current_time, min_batch_size)
+        else:
+            for pong in pongs:
+                sub_ticks += pong.resolve_next_tick(GAME_TICK_INTERVAL, current_time)
+        tick_times.append(time.perf_counter() - start)
+
+    checksum = hashlib.sha256()
+    scores = 0
+    for pong in pongs:
+        state = pong.as_dict()
+        checksum.update(repr(state).encode())
+        scores += state["bumper_1"]["score"] + state["bumper_2"]["score"]
+
+    total_seconds = sum(tick_times)
+    match_ticks = number_of_matches * number_of_ticks
+    tick_times.sort()
+    return SimulationResult(
+        matches=number_of_matches,
+        ticks=number_of_ticks,
+        seed=seed,
+        bot=bot,
+        engine=engine,
+        total_seconds=total_seconds,
+        match_ticks_per_second=match_ticks / total_seconds if total_seconds else 0.0,
+        tick_time_avg_ms=statistics.fmean(tick_times) * 1000 if tick_times else 0.0,
+        tick_time_p99_ms=_percentile(tick_times, 0.99) * 1000 if tick_times else 0.0,
+        tick_time_max_ms=tick_times[-1] * 1000 if tick_times else 0.0,
+        sub_ticks_per_match_tick=sub_ticks / match_ticks if match_ticks else 0.0,
+        scores=scores,
+        state_checksum=checksum.hexdigest(),
+    )
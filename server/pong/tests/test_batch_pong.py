@@ -0,0 +1,72 @@
+import random
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from pong import batch_pong
+from pong.consumers.game_worker import GAME_TICK_INTERVAL, BasePong
+
+
+def create_corpus(seed: int, number_of_matches: int) -> list[BasePong]:
+    rng = random.Random(seed)
+    return [
+        BasePong(
+            cool_mode=rng.random() < 0.75,
+            game_speed=rng.choice([0.75, 1.0, 1.25]),
+            start_time=0.0,
+            rng=random.Random(seed * 1000 + i),
+        )
+        for i in range(number_of_matches)
+    ]
+
+
+def play_inputs(pongs: list[BasePong], rng: random.Random):
+    """Bots that mostly follow the ball, so that there are a lot of bumper hits, coins and scores."""
+    for pong in pongs:
+        for bumper in (pong._bumper_1, pong._bumper_2):
+            roll = rng.random()
+            follows_ball = roll < 0.7
+            bumper.moves_left = (follows_ball and pong._ball.x > bumper.x) or (not follows_ball and roll < 0.8)
+            bumper.moves_right = (follows_ball and pong._ball.x < bumper.x) or (not follows_ball and roll > 0.9)
+
+
+def snapshot(pong: BasePong) -> str:
+    """`repr` of floats is exact, and also distinguishes `-0.0` from `0.0`."""
+    coin_velocity = pong._coin.velocity.x if pong._coin else None
+    return repr((pong.as_dict(), coin_velocity, pong._bumper_1, pong._bumper_2, pong._active_buff_or_debuff_target))
+
+
+class BatchPongTests(SimpleTestCase):
+    def replay(self, seed: int, number_of_matches: int, number_of_ticks: int):
+        scalar_pongs = create_corpus(seed, number_of_matches)
+        batch_pongs = create_corpus(seed, number_of_matches)
+        scalar_inputs_rng = random.Random(seed)
+        batch_inputs_rng = random.Random(seed)
+
+        scores = 0
+        for tick in range(1, number_of_ticks + 1):
+            current_time = tick * GAME_TICK_INTERVAL
+            play_inputs(scalar_pongs, scalar_inputs_rng)
+            play_inputs(batch_pongs, batch_inputs_rng)
+            for pong in scalar_pongs:
+                pong.resolve_next_tick(GAME_TICK_INTERVAL, current_time)
+            batch_pong.resolve_next_tick(batch_pongs, GAME_TICK_INTERVAL, current_time)
+
+            for i, (scalar_pong, batch_pong_) in enumerate(zip(scalar_pongs, batch_pongs, strict=True)):
+                self.assertEqual(
+                    snapshot(scalar_pong),
+                    snapshot(batch_pong_),
+                    f"Match {i} diverged at the tick {tick}",
+                )
+                scores += scalar_pong._is_someone_scored
+        self.assertGreater(scores, 0, "Replay corpus should cover scoring")
+
+    def test_batch_engine_is_identical_to_scalar_engine(self):
+        self.replay(seed=42, number_of_matches=batch_pong.BATCH_PHYSICS_MIN_MATCHES * 2, number_of_ticks=600)
+
+    def test_every_sub_tick_is_vectorized(self):
+        with patch.object(batch_pong, "BATCH_PHYSICS_MIN_MATCHES", 1):
+            self.replay(seed=7, number_of_matches=24, number_of_ticks=1500)
+
+    def test_few_matches_use_scalar_engine(self):
+        self.replay(seed=3, number_of_matches=2, number_of_ticks=300)
@@ -0,0 +1,68 @@
+import random
+
+from django.test import SimpleTestCase
+
+from pong.binary_protocol import (
+    FRAME_DELTA,
+    FRAME_KEYFRAME,
+    KEYFRAME_INTERVAL,
+    StateDecoder,
+    StateEncoder,
+    dequantize_state,
+    quantize_state,
+)
+from pong.consumers.game_worker import GAME_TICK_INTERVAL, BasePong
+
+
+def generate_states(number_of_ticks: int):
+    pong = BasePong(cool_mode=True, game_speed=1.0, start_time=0.0, rng=random.Random(0))
+    for tick in range(1, number_of_ticks + 1):
+        pong._bumper_1.moves_left = tick % 40 < 20
+        pong._bumper_2.moves_right = tick % 50 < 10
+        pong.resolve_next_tick(GAME_TICK_INTERVAL, tick * GAME_TICK_INTERVAL)
+        state = pong.as_dict()
+        state["elapsed_seconds"] = int(tick * GAME_TICK_INTERVAL)
+        yield state
+
+
+class BinaryProtocolTests(SimpleTestCase):
+    def test_quantized_state_is_close_to_original(self):
+        for state in generate_states(100):
+            decoded_state = dequantize_state(quantize_state(state))
+            self.assertAlmostEqual(decoded_state["ball"]["x"], state["ball"]["x"], places=3)
+            self.assertAlmostEqual(decoded_state["ball"]["velocity"]["z"], state["ball"]["velocity"]["z"], places=3)
+            self.assertAlmostEqual(decoded_state["bumper_1"]["x"], state["bumper_1"]["x"], places=3)
+            self.assertEqual(decoded_state["coin"] is None, state["coin"] is None)
+            self.assertEqual(decoded_state["is_someone_scored"], state["is_someone_scored"])
+
+    def test_first_frames_are_keyframes_until_acknowledged(self):
+        encoder = StateEncoder()
+        states = generate_states(3)
+        self.assertEqual(encoder.encode(next(states))[0], FRAME_KEYFRAME)
+        self.assertEqual(encoder.encode(next(states))[0], FRAME_KEYFRAME)
+        encoder.acknowledge(2)
+        self.assertEqual(encoder.encode(next(states))[0], FRAME_DELTA)
+
+    def test_deltas_are_smaller_and_decoded_to_same_states(self):
+        encoder, decoder = StateEncoder(), StateDecoder()
+        keyframes_sizes, delta_sizes = [], []
+        for i, state in enumerate(generate_states(KEYFRAME_INTERVAL * 4)):
+            frame = encoder.encode(state)
+            (keyframes_sizes if frame[0] == FRAME_KEYFRAME else delta_sizes).append(len(frame))
+            frame_id, decoded_state = decoder.decode(frame)
+            self.assertEqual(decoded_state, dequantize_state(quantize_state(state)))
+            # the client acknowledges frames from time to time
+            if i % 5 == 0:
+                encoder.acknowledge(frame_id)
+
+        self.assertGreaterEqual(len(keyframes_sizes), 4, "There should be a keyframe every second")
+        self.assertLess(sum(delta_sizes) / len(delta_sizes), keyframes_sizes[0] / 2)
+
+    def test_delta_based_on_unknown_frame_cannot_be_decoded(self):
+        encoder = StateEncoder()
+        states = generate_states(2)
+        encoder.encode(next(states))
+        encoder.acknowledge(1)
+        delta = encoder.encode(next(states))
+        self.assertEqual(delta[0], FRAME_DELTA)
+        self.assertIsNone(StateDecoder().decode(delta), "Client which didn't receive the base frame can't decode delta")
@@ -1,5 +1,6 @@
 import logging
 
+from django.core.management import call_command
 from django.test import TestCase
 
 from chat.models import GameInvitation
@@ -63,67 +64,29 @@ class GameRoomModelTests(TestCase):
 
         self.assertIsNone(GameRoom.handle_game_room_settings_types({'game_speed': 'asd'}), 'Game speed in parsed settings should be "fast", "medium" or "slow"')
 
-    def test_for_settings_finding_correct_games(self):
-        gr1 = GameRoom.objects.create()
-        gr2 = GameRoom.objects.create(settings={})
-        gr3 = GameRoom.objects.create(settings={'game_speed': 'fast', 'score_to_win': 7})
-        gr4 = GameRoom.objects.create(settings={'game_speed': 'fast', 'time_limit': 4})
-        gr5 = GameRoom.objects.create(settings={'game_speed': 'slow', 'time_limit': 4})
-        gr6 = GameRoom.objects.create(settings={'time_limit': 5, 'score_to_win': 6})
-        gr7 = GameRoom.objects.create(settings={'ranked': True, 'cool_mode': True, 'score_to_win': 7})
-        gr8 = GameRoom.objects.create(settings={'ranked': True, 'cool_mode': False, 'score_to_win': 7})
-
-        q1 = list(GameRoom.objects.for_settings({}))
-        self.assertTrue(gr1 in q1 and
-                        gr2 in q1 and
-                        gr3 in q1 and
-                        gr4 in q1 and
-                        gr5 in q1 and
-                        gr6 in q1 and
-                        gr7 in q1 and
-                        gr8 in q1, 'All settings should find empty settings')
-
-        q2 = list(GameRoom.objects.for_settings({'game_speed': 'fast'}))
-        self.assertTrue(gr1 not in q2 and
-                        gr2 in q2 and
-                        gr3 in q2 and
-                        gr4 in q2 and
-                        gr5 not in q2 and
-                        gr6 in q2 and
-                        gr7 in q2 and
-                        gr8 in q2, '')
-
-        q3 = list(GameRoom.objects.for_settings({'game_speed': 'fast', 'time_limit': 4}))
-        self.assertTrue(gr1 not in q3 and
-                        gr2 in q3 and
-                        gr3 in q3 and
-                        gr4 in q3 and
-                        gr5 not in q3 and
-                        gr6 not in q3 and
-                        gr7 in q3 and
-                        gr8 in q3, '')
-
-        q4 = list(GameRoom.objects.for_settings({'game_speed': 'fast', 'time_limit': 4, 'cool_mode': True}))
-        self.assertTrue(gr1 not in q4 and
-                        gr2 in q4 and
-                        gr3 in q4 and
-                        gr4 in q4 and
-                        gr5 not in q4 and
-                        gr6 not in q4 and
-                        gr7 in q4 and
-                        gr8 not in q4, '')
-
-        q5 = list(GameRoom.objects.for_settings({'game_speed': 'slow', 'ranked': True}))
-        self.assertTrue(gr1 not in q5 and
-                        gr2 in q5 and
-                        gr3 not in q5 and
-                        gr4 not in q5 and
-                        gr5 in q5 and
-                        gr6 in q5 and
-                        gr7 in q5 and
-                        gr8 in q5, '')
-
-
+    def test_number_of_connections_is_counted_in_one_query(self):
+        game_room: GameRoom = GameRoom.objects.create(status=GameRoom.ONGOING)
+        player = game_room.add_player(self.user1.profile)
+        same_player = GameRoomPlayer.objects.get(id=player.id)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(player.inc_number_of_connections(), 1)
+        self.assertEqual(same_player.inc_number_of_connections(), 2, 'Connections from other servers should be counted')
+        self.assertEqual(player.dec_number_of_connections(), 1)
+        self.assertEqual(same_player.dec_number_of_connections(), 0)
+        self.assertEqual(player.dec_number_of_connections(), 0, 'Number of connections should not go below 0')
+
+    def test_reset_game_room_connection_counters(self):
+        game_room: GameRoom = GameRoom.objects.create(status=GameRoom.ONGOING)
+        player = game_room.add_player(self.user1.profile)
+        player.inc_number_of_connections()
+
+        logging.disable(logging.CRITICAL)
+        call_command('reset_game_room_connection_counters')
+        logging.disable(logging.NOTSET)
+
+        player.refresh_from_db()
+        self.assertEqual(player.number_of_connections, 0)
 
     def test_is_in_tournament_when_it_is_not_in_tournament(self):
         game_room: GameRoom = GameRoom.objects.create()
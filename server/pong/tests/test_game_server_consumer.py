@@ -4,11 +4,16 @@ import json
 
 from channels.routing import URLRouter
 from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
 from channels.testing import WebsocketCommunicator
 from django.test import TransactionTestCase
+from unittest.mock import patch
 
 from common.close_codes import CloseCodes
+from pong.binary_protocol import BINARY_STATE_SUBPROTOCOL, StateDecoder, pack_state
+from pong.consumers.game_worker import BasePong
 from pong.consumers.game_ws_server import GameServerConsumer
+from pong.game_worker_shards import get_game_worker_channel_name
 from pong.models import GameRoom
 from users.models import User, RefreshToken
 from users.middleware import JWTWebsocketAuthMiddleware
@@ -89,3 +94,115 @@ class GameServerConsumerTests(TransactionTestCase):
 
         await communicator1.disconnect()
         await communicator2.disconnect()
+
+    async def test_binary_protocol_is_opt_in(self):
+        user_in_game_room1 = await database_sync_to_async(User.objects.create_user)("TestUser1", password="123")
+        user_in_game_room2 = await database_sync_to_async(User.objects.create_user)("TestUser2", password="123")
+        game_room: GameRoom = await database_sync_to_async(GameRoom.objects.create)(status="ongoing")
+        await database_sync_to_async(game_room.add_player)(user_in_game_room1.profile)
+        await database_sync_to_async(game_room.add_player)(user_in_game_room2.profile)
+        access_token1, _ = await database_sync_to_async(RefreshToken.objects.create)(user_in_game_room1)
+        access_token2, _ = await database_sync_to_async(RefreshToken.objects.create)(user_in_game_room2)
+
+        binary_communicator = WebsocketCommunicator(
+            JWTWebsocketAuthMiddleware(URLRouter(combined_patterns)),
+            f"/ws/pong/{game_room.id}/",
+            headers=[(b"cookie", f"access_token={access_token1}".encode("utf-8"))],
+            subprotocols=[BINARY_STATE_SUBPROTOCOL],
+        )
+        connected, subprotocol = await binary_communicator.connect()
+        assert connected and subprotocol == BINARY_STATE_SUBPROTOCOL, "Server should accept the binary subprotocol"
+        json_communicator = await self.connect_to_route(user_in_game_room2, access_token2, game_room.id)
+        # consumers join the group of the game room after accepting the connection
+        await json_communicator.receive_nothing(timeout=0.5)
+
+        state = BasePong(cool_mode=True, game_speed=1.0, start_time=0.0).as_dict()
+        state["elapsed_seconds"] = 0
+        await get_channel_layer().group_send(
+            f"game_room_{game_room.id}",
+            {
+                "type": "worker_to_client_state",
+                "text": json.dumps({"action": "state_updated", "state": state}),
+                "packed_state": pack_state(state),
+            },
+        )
+
+        frame = await binary_communicator.receive_from()
+        assert isinstance(frame, bytes), "Client who opted in should receive the state as binary"
+        frame_id, decoded_state = StateDecoder().decode(frame)
+        assert frame_id == 1
+        assert decoded_state["ball"] == state["ball"]
+        assert decoded_state["bumper_2"] == state["bumper_2"]
+        json_message = json.loads(await json_communicator.receive_from())
+        assert json_message["action"] == "state_updated", "Other clients should still receive the state as JSON"
+
+        await binary_communicator.send_json_to({"action": "state_ack", "frame": frame_id})
+        await binary_communicator.disconnect()
+        await json_communicator.disconnect()
+
+    async def receive_game_worker_event(self, game_worker_channel_name: str, game_room_id: str):
+        """Skips the events left in the shared channel of the worker by the other tests."""
+        while True:
+            event = await asyncio.wait_for(get_channel_layer().receive(game_worker_channel_name), timeout=1)
+            if event["game_room_id"] == game_room_id:
+                return event
+
+    async def test_connect_and_coalesced_inputs_are_sent_to_game_worker(self):
+        user_in_game_room1 = await database_sync_to_async(User.objects.create_user)("TestUser1", password="123")
+        user_in_game_room2 = await database_sync_to_async(User.objects.create_user)("TestUser2", password="123")
+        game_room: GameRoom = await database_sync_to_async(GameRoom.objects.create)(status="ongoing")
+        await database_sync_to_async(game_room.add_player)(user_in_game_room1.profile)
+        await database_sync_to_async(game_room.add_player)(user_in_game_room2.profile)
+        access_token, _ = await database_sync_to_async(RefreshToken.objects.create)(user_in_game_room1)
+        game_worker_channel_name = get_game_worker_channel_name(str(game_room.id))
+
+        communicator = await self.connect_to_route(user_in_game_room1, access_token, game_room.id)
+        player_connected = await self.receive_game_worker_event(game_worker_channel_name, str(game_room.id))
+        assert player_connected["type"] == "player_connected"
+        assert player_connected["name"] == "TestUser1"
+        assert player_connected["opponents_name"] == "TestUser2"
+
+        for move_id in range(1, 5):
+            await communicator.send_json_to(
+                {
+                    "action": "move_left",
+                    "move_id": move_id,
+                    "player_id": player_connected["player_id"],
+                    "timestamp": 1000 + move_id,
+                },
+            )
+        first_input = await self.receive_game_worker_event(game_worker_channel_name, str(game_room.id))
+        assert first_input["type"] == "player_inputs_batched"
+        assert first_input["action"] == "move_left"
+        assert (first_input["first_move_id"], first_input["last_move_id"]) == (1, 1), "First input is not delayed"
+        coalesced_inputs = await self.receive_game_worker_event(game_worker_channel_name, str(game_room.id))
+        assert (coalesced_inputs["first_move_id"], coalesced_inputs["last_move_id"]) == (2, 4)
+        assert (coalesced_inputs["first_timestamp"], coalesced_inputs["last_timestamp"]) == (1002, 1004)
+
+        await communicator.disconnect()
+        player_disconnected = await self.receive_game_worker_event(game_worker_channel_name, str(game_room.id))
+        assert player_disconnected["type"] == "player_disconnected"
+
+    async def test_round_trip_time_is_measured_and_sent_to_game_worker(self):
+        user_in_game_room1 = await database_sync_to_async(User.objects.create_user)("TestUser1", password="123")
+        user_in_game_room2 = await database_sync_to_async(User.objects.create_user)("TestUser2", password="123")
+        game_room: GameRoom = await database_sync_to_async(GameRoom.objects.create)(status="ongoing")
+        await database_sync_to_async(game_room.add_player)(user_in_game_room1.profile)
+        await database_sync_to_async(game_room.add_player)(user_in_game_room2.profile)
+        access_token, _ = await database_sync_to_async(RefreshToken.objects.create)(user_in_game_room1)
+        game_worker_channel_name = get_game_worker_channel_name(str(game_room.id))
+
+        with patch("pong.consumers.game_ws_server.PING_INTERVAL", 0.01):
+            communicator = await self.connect_to_route(user_in_game_room1, access_token, game_room.id)
+            player_connected = await self.receive_game_worker_event(game_worker_channel_name, str(game_room.id))
+            ping = await communicator.receive_json_from()
+        assert ping["action"] == "ping"
+
+        await communicator.send_json_to({"action": "pong", "ping_id": ping["ping_id"] - 1})
+        await communicator.send_json_to({"action": "pong", "ping_id": ping["ping_id"]})
+        rtt_measured = await self.receive_game_worker_event(game_worker_channel_name, str(game_room.id))
+        assert rtt_measured["type"] == "player_rtt_measured", "Pong of the old ping is ignored"
+        assert rtt_measured["player_id"] == player_connected["player_id"]
+        assert 0 < rtt_measured["rtt"] < 1
+
+        await communicator.disconnect()
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from common.close_codes import CloseCodes
+from pong.consumers.game_worker import (
+    SPECTATOR_STATE_INTERVAL_TICKS,
+    GameWorkerConsumer,
+    MultiplayerPongMatch,
+    MultiplayerPongMatchStatus,
+)
+from pong.game_worker_shards import get_game_worker_channel_name
+from pong.models import GameRoom
+from server.asgi import combined_patterns
+from users.middleware import JWTWebsocketAuthMiddleware
+from users.models import RefreshToken, User
+
+SETTINGS = {"cool_mode": True, "game_speed": "fast", "time_limit": 3, "ranked": False, "score_to_win": 5}
+
+
+class GameWorkerSpectatorsTests(SimpleTestCase):
+    async def set_up_worker(self):
+        self.channel_layer = get_channel_layer()
+        self.worker = GameWorkerConsumer()
+        self.worker.scope = {"channel": "game.0"}
+        match = MultiplayerPongMatch("game", SETTINGS, is_in_tournament=True, bracket_id="1", tournament_id="1")
+        for number, player in enumerate(match.get_players(), start=1):
+            player.id = f"player_{number}"
+            player.name = f"Player {number}"
+            player.set_as_connected(match.start_time)
+        match.status = MultiplayerPongMatchStatus.ONGOING
+        self.match = self.worker.matches[match.id] = match
+
+    async def join(self) -> tuple[str, dict]:
+        channel_name = await self.channel_layer.new_channel()
+        await self.worker.spectator_joined(
+            {"type": "spectator_joined", "game_room_id": "game", "channel_name": channel_name},
+        )
+        return channel_name, await self.channel_layer.receive(channel_name)
+
+    async def test_spectators_receive_down_sampled_states(self):
+        await self.set_up_worker()
+        channel_name, joined = await self.join()
+        self.assertEqual(joined["action"], "spectator_joined")
+        self.assertEqual((joined["player_1_name"], joined["player_2_name"]), ("Player 1", "Player 2"))
+
+        for _ in range(SPECTATOR_STATE_INTERVAL_TICKS * 2):
+            await self.worker._tick_matches(asyncio.get_event_loop().time())
+        for _ in range(2):
+            state = await asyncio.wait_for(self.channel_layer.receive(channel_name), timeout=1)
+            self.assertEqual(state["type"], "worker_to_client_state")
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.channel_layer.receive(channel_name), timeout=0.1)
+
+        await self.worker.spectator_left({"type": "spectator_left", "game_room_id": "game", "channel_name": channel_name})
+        self.assertEqual(self.match.spectators, {})
+        self.assertEqual(self.match.get_spectator_transports(), [])
+
+    async def test_spectators_are_capped_and_counted_in_metrics(self):
+        await self.set_up_worker()
+        with override_settings(GAME_MAX_SPECTATORS_PER_MATCH=2):
+            for _ in range(2):
+                await self.join()
+            _, refused = await self.join()
+        self.assertEqual(refused["action"], "spectating_refused")
+        self.assertEqual(refused["reason"], "too_many_spectators")
+
+        reply_channel = await self.channel_layer.new_channel()
+        await self.worker.worker_metrics({"type": "worker_metrics", "reply_channel": reply_channel})
+        message = await self.channel_layer.receive(reply_channel)
+        self.assertEqual(message["metrics"]["spectators"], {"game": 2})
+
+
+class GameSpectatorConsumerTests(TransactionTestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    async def connect_spectator(self, game_room_id: str) -> WebsocketCommunicator:
+        user = await database_sync_to_async(User.objects.create_user)("Spectator", password="123")
+        access_token, _ = await database_sync_to_async(RefreshToken.objects.create)(user)
+        communicator = WebsocketCommunicator(
+            JWTWebsocketAuthMiddleware(URLRouter(combined_patterns)),
+            f"/ws/pong/{game_room_id}/spectate/",
+            headers=[(b"cookie", f"access_token={access_token}".encode())],
+        )
+        await communicator.connect()
+        return communicator
+
+    async def test_spectator_of_ongoing_game_room_joins_game_worker(self):
+        game_room: GameRoom = await database_sync_to_async(GameRoom.objects.create)(status=GameRoom.ONGOING)
+        game_worker_channel_name = get_game_worker_channel_name(str(game_room.id))
+        communicator = await self.connect_spectator(str(game_room.id))
+
+        while True:
+            event = await asyncio.wait_for(get_channel_layer().receive(game_worker_channel_name), timeout=1)
+            if event["game_room_id"] == str(game_room.id):
+                break
+        self.assertEqual(event["type"], "spectator_joined")
+
+        await communicator.send_json_to({"action": "move_left"})
+        output = await communicator.receive_output()
+        self.assertEqual(output["code"], CloseCodes.BAD_DATA, "Spectators are read-only")
+        await communicator.disconnect()
+
+    async def test_spectator_of_closed_game_room_is_refused(self):
+        game_room: GameRoom = await database_sync_to_async(GameRoom.objects.create)(status=GameRoom.CLOSED)
+        communicator = await self.connect_spectator(str(game_room.id))
+
+        output = await communicator.receive_output()
+        self.assertEqual(output["type"], "websocket.close")
+        self.assertEqual(output["code"], CloseCodes.ILLEGAL_CONNECTION)
+        await communicator.disconnect()
@@ -1,7 +1,9 @@
 import logging
+import tempfile
 from datetime import date, timedelta
+from pathlib import Path
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from pong.models import Match
@@ -333,3 +335,29 @@ class GameStatsEndpointsTests(TestCase):
         response_data = response.json()
         self.assertIn("winner", response_data)
         self.assertIn("loser", response_data)
+        self.assertFalse(response_data["has_replay"])
+
+    def test_get_match_replay(self):
+        match, _, _ = Match.objects.resolve(
+            winner_profile_or_id=self.user1.profile,
+            loser_profile_or_id=self.user2.profile,
+            winners_score=11,
+            losers_score=5,
+            date=timezone.now(),
+        )
+        with tempfile.TemporaryDirectory() as replay_dir, override_settings(GAME_REPLAY_DIR=replay_dir):
+            response = self.client.get(f"/api/game-stats/matches/{match.id}/replay")
+            self.assertContains(response, "Replay not found", status_code=404)
+
+            (Path(replay_dir) / f"{match.id}.replay").write_bytes(b"replay data")
+            response = self.client.get(f"/api/game-stats/matches/{match.id}/replay")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.getvalue(), b"replay data")
+            self.assertTrue(self.client.get(f"/api/game-stats/matches/{match.id}").json()["has_replay"])
+
+            response = self.client.get(f"/api/game-stats/matches/{match.id.hex.upper()}/replay")
+            self.assertEqual(response.status_code, 200, "Replay should be found by the non-canonical id of the match")
+
+    def test_get_match_replay_nonexistent_match(self):
+        response = self.client.get("/api/game-stats/matches/00000000-0000-0000-0000-000000000000/replay")
+        self.assertContains(response, "Match not found", status_code=404)
@@ -0,0 +1,163 @@
+import asyncio
+import tempfile
+import uuid
+from unittest import mock
+
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from pong.consumers.game_worker import (
+    GAME_TICK_INTERVAL,
+    GameWorkerConsumer,
+    MultiplayerPongMatch,
+    MultiplayerPongMatchStatus,
+)
+from pong.game_worker_load import DEGRADATION_LEVELS, LEVEL_CHANGE_COOLDOWN_TICKS, GameWorkerLoad
+from pong.models import GameRoom
+
+SETTINGS = {"cool_mode": True, "game_speed": "fast", "time_limit": 3, "ranked": False, "score_to_win": 5}
+
+
+def _create_ongoing_match(game_id: str) -> MultiplayerPongMatch:
+    match = MultiplayerPongMatch(game_id, SETTINGS, is_in_tournament=False, bracket_id=None, tournament_id=None)
+    for number, player in enumerate(match.get_players(), start=1):
+        player.id = f"player_{number}"
+        player.set_as_connected(match.start_time)
+    match.status = MultiplayerPongMatchStatus.ONGOING
+    return match
+
+
+class GameWorkerLoadTests(SimpleTestCase):
+    def test_sustained_overload_degrades_and_recovers(self):
+        load = GameWorkerLoad(GAME_TICK_INTERVAL)
+        # a single slow tick is not an overload
+        self.assertFalse(load.record(GAME_TICK_INTERVAL * 10))
+
+        for _ in range(LEVEL_CHANGE_COOLDOWN_TICKS * len(DEGRADATION_LEVELS) * 2):
+            load.record(GAME_TICK_INTERVAL * 2)
+        self.assertEqual(load.level, len(DEGRADATION_LEVELS) - 1)
+        self.assertTrue(load.is_exhausted())
+        self.assertEqual(load.physics_interval, DEGRADATION_LEVELS[-1][0])
+
+        for _ in range(LEVEL_CHANGE_COOLDOWN_TICKS * len(DEGRADATION_LEVELS) * 2):
+            load.record(GAME_TICK_INTERVAL * 0.1)
+        self.assertEqual(load.level, 0)
+        self.assertFalse(load.is_exhausted())
+
+    async def test_degraded_match_is_resolved_with_longer_steps(self):
+        worker = GameWorkerConsumer()
+        match = worker.matches["game"] = _create_ongoing_match("game")
+        reference = _create_ongoing_match("reference")
+        worker.load.level = next(level for level, (physics, _) in enumerate(DEGRADATION_LEVELS) if physics == 2)
+
+        current_time = match.start_time
+        for _ in range(4):
+            current_time += GAME_TICK_INTERVAL
+            await worker._tick_matches(current_time)
+            reference.resolve_next_tick(GAME_TICK_INTERVAL, current_time)
+
+        self.assertEqual(match._ticks_in_step, 2)
+        self.assertAlmostEqual(match.as_dict()["ball"]["z"], reference.as_dict()["ball"]["z"])
+
+    async def test_match_is_resolved_by_ticks_since_last_resolution_when_load_changes(self):
+        worker = GameWorkerConsumer()
+        match = worker.matches["game"] = _create_ongoing_match("game")
+        reference = _create_ongoing_match("reference")
+        levels = [
+            next(level for level, (physics, _) in enumerate(DEGRADATION_LEVELS) if physics == interval)
+            for interval in (1, 2)
+        ]
+
+        current_time = match.start_time
+        for tick in range(12):
+            worker.load.level = levels[tick // 3 % 2]
+            current_time += GAME_TICK_INTERVAL
+            await worker._tick_matches(current_time)
+            reference.resolve_next_tick(GAME_TICK_INTERVAL, current_time)
+            if match.last_resolved_tick == worker.tick_number:
+                self.assertAlmostEqual(match.as_dict()["ball"]["z"], reference.as_dict()["ball"]["z"])
+
+    async def test_crashed_match_is_cancelled_and_others_go_on(self):
+        for min_matches in (1, 100):
+            with (
+                self.subTest(min_matches=min_matches),
+                mock.patch("pong.batch_pong.BATCH_PHYSICS_MIN_MATCHES", min_matches),
+            ):
+                worker = GameWorkerConsumer()
+                worker.result_writer = mock.Mock()
+                match = worker.matches["game"] = _create_ongoing_match("game")
+                crashed_match = worker.matches["crashed"] = _create_ongoing_match("crashed")
+                crashed_match.finish_tick = mock.Mock(side_effect=RuntimeError)
+                reference = _create_ongoing_match("reference")
+
+                current_time = match.start_time
+                for _ in range(2):
+                    current_time += GAME_TICK_INTERVAL
+                    await worker._tick_matches(current_time)
+                    reference.resolve_next_tick(GAME_TICK_INTERVAL, current_time)
+                    await asyncio.gather(*worker._background_tasks)
+
+                self.assertEqual(match.as_dict()["ball"], reference.as_dict()["ball"])
+                self.assertEqual(crashed_match.finish_tick.call_count, 1, "Crashed match shouldn't be ticked again")
+                self.assertNotIn("crashed", worker.matches)
+                worker.result_writer.submit.assert_called_once()
+
+
+class GameWorkerOverloadTests(TransactionTestCase):
+    async def test_overloaded_worker_cancels_new_match(self):
+        game_room = await GameRoom.objects.acreate(status=GameRoom.ONGOING)
+        channel_layer = get_channel_layer()
+        player_channel = await channel_layer.new_channel()
+        await channel_layer.group_add("player_new_player", player_channel)
+        worker = GameWorkerConsumer()
+        worker.scope = {"channel": "game.0"}
+        worker.matches["game"] = _create_ongoing_match("game")
+
+        with (
+            tempfile.TemporaryDirectory() as spool_dir,
+            override_settings(
+                GAME_WORKER_MAX_MATCHES=1,
+                GAME_RESULT_SPOOL_DIR=spool_dir,
+            ),
+        ):
+            await worker.player_connected(
+                {
+                    "type": "player_connected",
+                    "game_room_id": str(game_room.id),
+                    "player_id": "new_player",
+                    "is_in_tournament": False,
+                    "tournament_id": None,
+                },
+            )
+            message = await channel_layer.receive(player_channel)
+            worker.result_writer._flush_task.cancel()
+            await worker.result_writer.flush()
+
+        self.assertEqual(message["action"], "game_cancelled")
+        self.assertNotIn(str(game_room.id), worker.matches)
+        await game_room.arefresh_from_db()
+        self.assertEqual(game_room.status, GameRoom.CLOSED)
+
+    async def test_other_player_of_refused_match_is_refused_too(self):
+        game_room_id = str(uuid.uuid4())
+        channel_layer = get_channel_layer()
+        player_channel = await channel_layer.new_channel()
+        await channel_layer.group_add("player_other_player", player_channel)
+        worker = GameWorkerConsumer()
+        worker.scope = {"channel": "game.0"}
+        worker.result_writer = mock.Mock()
+        worker.refused_game_rooms.add(game_room_id)
+
+        await worker.player_connected(
+            {
+                "type": "player_connected",
+                "game_room_id": game_room_id,
+                "player_id": "other_player",
+                "is_in_tournament": False,
+                "tournament_id": None,
+            },
+        )
+
+        self.assertEqual((await channel_layer.receive(player_channel))["action"], "game_cancelled")
+        self.assertNotIn(game_room_id, worker.matches, "Worker that is not overloaded anymore still refuses the match")
+        worker.result_writer.submit.assert_not_called()
@@ -0,0 +1,69 @@
+from channels.layers import get_channel_layer
+from channels.testing import ApplicationCommunicator
+from django.test import SimpleTestCase
+
+from pong.consumers.game_worker import GameWorkerConsumer, MultiplayerPongMatch
+from pong.game_worker_metrics import Histogram
+
+
+class HistogramTests(SimpleTestCase):
+    def test_quantiles_are_upper_bounds_of_buckets(self):
+        histogram = Histogram(buckets_ms=(1, 10, 100, float("inf")))
+        for _ in range(98):
+            histogram.record(0.0005)
+        histogram.record(0.05)
+        histogram.record(0.3)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 100)
+        self.assertEqual(snapshot["p50_ms"], 1)
+        self.assertEqual(snapshot["p99_ms"], 100)
+        self.assertAlmostEqual(snapshot["max_ms"], 300)
+        self.assertEqual(snapshot["buckets"], {"1": 98, "10": 0, "100": 1, "inf": 1})
+
+    def test_empty_histogram(self):
+        self.assertEqual(Histogram().snapshot()["p99_ms"], 0.0)
+
+
+class GameWorkerMetricsTests(SimpleTestCase):
+    async def test_worker_reports_metrics_to_reply_channel(self):
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        worker = ApplicationCommunicator(GameWorkerConsumer.as_asgi(), {"type": "channel", "channel": "game.0"})
+
+        await worker.send_input({"type": "worker_metrics", "reply_channel": reply_channel})
+        message = await channel_layer.receive(reply_channel)
+
+        self.assertEqual(message["type"], "worker_metrics_reported")
+        metrics = message["metrics"]
+        self.assertEqual(metrics["channel_name"], "game.0")
+        self.assertEqual(metrics["ongoing_matches"], 0)
+        self.assertEqual(metrics["tick_compute"]["count"], 0)
+        worker.stop()
+
+    async def test_worker_reports_network_of_players(self):
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        worker = GameWorkerConsumer()
+        worker.scope = {"channel": "game.0"}
+        match = worker.matches["game"] = MultiplayerPongMatch(
+            "game",
+            {"cool_mode": False, "game_speed": "medium", "time_limit": 3, "ranked": False, "score_to_win": 5},
+            is_in_tournament=False,
+            bracket_id=None,
+            tournament_id=None,
+        )
+        match._player_1.id, match._player_2.id = "player_1", "player_2"
+
+        for rtt in (0.1, 0.1, 0.14):
+            await worker.player_rtt_measured(
+                {"type": "player_rtt_measured", "game_room_id": "game", "player_id": "player_1", "rtt": rtt},
+            )
+        await worker.worker_metrics({"type": "worker_metrics", "reply_channel": reply_channel})
+        message = await channel_layer.receive(reply_channel)
+
+        network = message["metrics"]["network"]
+        self.assertEqual(list(network), ["game:player_1"], "Players without measured round trip time are skipped")
+        self.assertEqual(network["game:player_1"], {"rtt_ms": 105.0, "jitter_ms": 38.1})
+        self.assertEqual(match.get_network_stats()["bumper_2"], {})
+        self.assertEqual(match._player_1.bumper.lag_compensation, 0.053, "Lag is compensated by half of the rtt")
@@ -0,0 +1,133 @@
+import uuid
+from unittest import mock
+
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase
+
+from pong.consumers.game_worker import HANDED_OFF_GAME_ROOM_TTL, GameWorkerConsumer, MultiplayerPongMatch
+from pong.game_worker_shards import GameWorkerRing, get_game_worker_channel_names
+
+
+class GameWorkerRingTests(SimpleTestCase):
+    def setUp(self):
+        self.game_room_ids = [str(uuid.UUID(int=i)) for i in range(2000)]
+
+    def test_channel_names(self):
+        self.assertEqual(get_game_worker_channel_names(3), ["game.0", "game.1", "game.2"])
+        self.assertEqual(get_game_worker_channel_names(0), ["game.0"], "There should always be at least one worker")
+
+    def test_same_game_room_is_always_routed_to_the_same_worker(self):
+        ring1 = GameWorkerRing(get_game_worker_channel_names(4))
+        ring2 = GameWorkerRing(get_game_worker_channel_names(4))
+        for game_room_id in self.game_room_ids:
+            self.assertEqual(ring1.get_channel_name(game_room_id), ring2.get_channel_name(game_room_id))
+
+    def test_game_rooms_are_spread_between_workers(self):
+        ring = GameWorkerRing(get_game_worker_channel_names(4))
+        counts = {}
+        for game_room_id in self.game_room_ids:
+            channel_name = ring.get_channel_name(game_room_id)
+            counts[channel_name] = counts.get(channel_name, 0) + 1
+        self.assertEqual(len(counts), 4, "Every worker should get some game rooms")
+        for count in counts.values():
+            self.assertGreater(count, len(self.game_room_ids) / 4 / 2, "Game rooms should be spread evenly enough")
+
+    def test_removing_worker_moves_only_its_game_rooms(self):
+        ring = GameWorkerRing(get_game_worker_channel_names(4))
+        smaller_ring = GameWorkerRing(get_game_worker_channel_names(3))
+        for game_room_id in self.game_room_ids:
+            channel_name = ring.get_channel_name(game_room_id)
+            if channel_name != "game.3":
+                self.assertEqual(channel_name, smaller_ring.get_channel_name(game_room_id))
+
+    def test_excluded_workers_are_skipped(self):
+        ring = GameWorkerRing(get_game_worker_channel_names(3))
+        for game_room_id in self.game_room_ids[:100]:
+            channel_name = ring.get_channel_name(game_room_id)
+            other_channel_name = ring.get_channel_name(game_room_id, excluded=[channel_name])
+            self.assertNotEqual(channel_name, other_channel_name)
+            self.assertIsNotNone(other_channel_name)
+        self.assertIsNone(ring.get_channel_name("some_id", excluded=get_game_worker_channel_names(3)))
+
+
+SETTINGS = {"cool_mode": False, "game_speed": "medium", "time_limit": 3, "ranked": False, "score_to_win": 5}
+
+
+def make_player_connected(game_room_id: str, player_id: str) -> dict:
+    return {
+        "type": "player_connected",
+        "game_room_id": game_room_id,
+        "player_id": player_id,
+        "is_in_tournament": False,
+        "tournament_id": None,
+    }
+
+
+class GameWorkerHandOverTests(SimpleTestCase):
+    def setUp(self):
+        self.worker = GameWorkerConsumer()
+        self.worker.scope = {"channel": "game.0"}
+        self.worker.result_writer = mock.Mock(pending=0)
+
+    @mock.patch(
+        "pong.consumers.game_worker.get_game_worker_ring",
+        return_value=GameWorkerRing(get_game_worker_channel_names(2)),
+    )
+    async def test_handed_over_game_room_is_forgotten_after_ttl(self, _):
+        worker = self.worker
+        worker.is_draining = True
+        event = make_player_connected("game", "player")
+        with mock.patch("pong.consumers.game_worker.time.monotonic", return_value=0.0) as monotonic:
+            await worker.player_connected(event)
+            handed_over = await get_channel_layer().receive("game.1")
+            self.assertEqual(handed_over["drained_channels"], ["game.0"])
+
+            monotonic.return_value = HANDED_OFF_GAME_ROOM_TTL - 1
+            self.assertTrue(await worker._forward_to_other_worker(event))
+            self.assertEqual((await get_channel_layer().receive("game.1"))["player_id"], "player")
+
+            monotonic.return_value = HANDED_OFF_GAME_ROOM_TTL
+            self.assertFalse(await worker._forward_to_other_worker(event))
+            self.assertEqual(worker.forwarded_game_rooms, {})
+
+    @mock.patch(
+        "pong.consumers.game_worker.get_game_worker_ring",
+        return_value=GameWorkerRing(get_game_worker_channel_names(1)),
+    )
+    async def test_new_match_is_refused_when_every_worker_is_draining(self, _):
+        channel_layer = get_channel_layer()
+        player_channel = await channel_layer.new_channel()
+        await channel_layer.group_add("player_player", player_channel)
+        self.worker.is_draining = True
+
+        await self.worker.player_connected(make_player_connected("game", "player"))
+
+        self.assertEqual((await channel_layer.receive(player_channel))["action"], "game_cancelled")
+        self.assertNotIn("game", self.worker.matches)
+
+    async def test_worker_is_drained_when_handed_over_matches_are_finished(self):
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        self.worker.forwarded_game_rooms["game"] = "game.1"
+
+        await self.worker.worker_drain({"type": "worker_drain", "reply_channel": reply_channel})
+        self.assertEqual(self.worker.drain_reply_channel, reply_channel, "Handed over match is still played")
+
+        await self.worker.worker_forwarded_game_finished(
+            {"type": "worker_forwarded_game_finished", "game_room_id": "game"}
+        )
+        self.assertEqual((await channel_layer.receive(reply_channel))["type"], "worker_drained")
+
+    async def test_finished_match_is_reported_to_workers_that_handed_it_over(self):
+        self.worker.scope = {"channel": "game.1"}
+        match = MultiplayerPongMatch("game", SETTINGS, is_in_tournament=False, bracket_id=None, tournament_id=None)
+        drained_channel = await get_channel_layer().new_channel()
+        match.drained_channels = [drained_channel]
+        self.worker.matches["game"] = match
+
+        await self.worker._do_after_match_cleanup(match)
+
+        self.assertEqual(
+            await get_channel_layer().receive(drained_channel),
+            {"type": "worker_forwarded_game_finished", "game_room_id": "game"},
+        )
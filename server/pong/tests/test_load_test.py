@@ -0,0 +1,27 @@
+import logging
+
+from django.test import TransactionTestCase
+
+from pong.load_test import LoadTest
+from users.models import User
+
+
+class LoadTestTests(TransactionTestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    async def test_simulated_players_play_and_chat(self):
+        result = await LoadTest(4, duration=2, chat_interval=0.2, workers="auto").run()
+
+        self.assertEqual(result.workers, "in_process")
+        self.assertEqual(result.errors, {})
+        self.assertEqual(result.connection_setup["events"]["count"], 4)
+        self.assertEqual(result.matchmaking["count"], 4)
+        self.assertEqual(result.games_started, 4)
+        self.assertGreater(result.tick_interval["count"], 0)
+        self.assertGreater(result.input_latency["count"], 0)
+        self.assertGreater(result.chat_latency["count"], 0)
+        self.assertFalse(await User.objects.filter(username__startswith="load_test_").aexists())
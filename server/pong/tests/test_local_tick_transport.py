@@ -0,0 +1,100 @@
+import asyncio
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from pong import local_tick_transport
+from pong.local_tick_transport import MAX_PENDING_STATES, LocalTickClient, decode_frame, encode_frame
+
+
+class FakeConsumer:
+    def __init__(self):
+        self.events = []
+        self.received = asyncio.Event()
+
+    async def dispatch(self, event):
+        self.events.append(event)
+        self.received.set()
+
+
+class SlowConsumer(FakeConsumer):
+    """Fails to send the first state, and sends the rest only when it's allowed to."""
+
+    def __init__(self):
+        super().__init__()
+        self.can_send = asyncio.Event()
+
+    async def dispatch(self, event):
+        if not self.events:
+            self.events.append(event)
+            raise ConnectionResetError
+        await self.can_send.wait()
+        await super().dispatch(event)
+
+
+def make_event(text: str):
+    return {"type": "worker_to_client_state", "text": text, "packed_state": b"\x00\x01\x02"}
+
+
+class LocalTickTransportTests(SimpleTestCase):
+    def test_frame_roundtrip(self):
+        event = make_event('{"action": "state_updated"}')
+        frame = encode_frame("some-game-room", event)
+        self.assertEqual(decode_frame(frame[4:]), ("some-game-room", event))
+
+    async def test_states_are_dispatched_to_consumers_of_the_game_room(self):
+        with tempfile.TemporaryDirectory() as socket_dir, override_settings(GAME_TICK_SOCKET_DIR=socket_dir):
+            consumer, other_consumer = FakeConsumer(), FakeConsumer()
+            path = await local_tick_transport.register_consumer("room_1", consumer)
+            self.assertEqual(await local_tick_transport.register_consumer("room_2", other_consumer), path)
+
+            client = LocalTickClient()
+            self.assertTrue(await client.connect(path))
+            self.assertTrue(client.send(path, "room_1", make_event("first")))
+            await asyncio.wait_for(consumer.received.wait(), 1)
+            self.assertEqual(consumer.events, [make_event("first")])
+            self.assertEqual(other_consumer.events, [], "Consumers of other game rooms should not receive the state")
+
+            local_tick_transport.unregister_consumer("room_1", consumer)
+            local_tick_transport.unregister_consumer("room_2", other_consumer)
+
+    async def test_slow_consumer_does_not_hold_back_others(self):
+        with tempfile.TemporaryDirectory() as socket_dir, override_settings(GAME_TICK_SOCKET_DIR=socket_dir):
+            slow_consumer, consumer = SlowConsumer(), FakeConsumer()
+            path = await local_tick_transport.register_consumer("room_1", slow_consumer)
+            await local_tick_transport.register_consumer("room_1", consumer)
+
+            client = LocalTickClient()
+            await client.connect(path)
+            events = [make_event(str(i)) for i in range(MAX_PENDING_STATES + 3)]
+            for event in events:
+                consumer.received.clear()
+                client.send(path, "room_1", event)
+                await asyncio.wait_for(consumer.received.wait(), 1)
+            self.assertEqual(consumer.events, events)
+
+            slow_consumer.can_send.set()
+            await asyncio.wait_for(slow_consumer.received.wait(), 1)
+            await asyncio.sleep(0)
+            self.assertEqual(slow_consumer.events[0], events[0], "Failed dispatch shouldn't stop the delivery")
+            self.assertEqual(slow_consumer.events[-MAX_PENDING_STATES:], events[-MAX_PENDING_STATES:])
+            self.assertLess(len(slow_consumer.events), len(events), "Outdated states should be dropped")
+
+            local_tick_transport.unregister_consumer("room_1", slow_consumer)
+            client.send(path, "room_1", make_event("last"))
+            consumer.received.clear()
+            await asyncio.wait_for(consumer.received.wait(), 1)
+            await asyncio.sleep(0)
+            self.assertNotIn(make_event("last"), slow_consumer.events, "Unregistered consumer shouldn't receive states")
+
+            local_tick_transport.unregister_consumer("room_1", consumer)
+            await client.close()
+
+    async def test_worker_falls_back_when_socket_is_unavailable(self):
+        client = LocalTickClient()
+        self.assertFalse(await client.connect("/nonexistent/server.sock"))
+        self.assertFalse(client.send("/nonexistent/server.sock", "room_1", make_event("state")))
+
+    @override_settings(GAME_TICK_SOCKET_DIR="")
+    async def test_local_transport_can_be_disabled(self):
+        self.assertIsNone(await local_tick_transport.register_consumer("room_1", FakeConsumer()))
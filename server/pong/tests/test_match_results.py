@@ -0,0 +1,134 @@
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from pong.match_results import FinishedGameRoom, MatchResult, MatchResultWriter, write_finished_game_rooms
+from pong.models import GameRoom, Match
+from users.models import User
+
+
+def _finished_game_room(game_room: GameRoom, winner: User, loser: User) -> FinishedGameRoom:
+    return FinishedGameRoom(
+        game_room_id=str(game_room.id),
+        date=timezone.now().isoformat(),
+        match=MatchResult(
+            winner_profile_id=winner.profile.id,
+            loser_profile_id=loser.profile.id,
+            winners_score=5,
+            losers_score=2,
+            elo_change=16,
+            winners_elo=1016,
+            losers_elo=984,
+        ),
+    )
+
+
+class WriteFinishedGameRoomsTests(TestCase):
+    def setUp(self):
+        self.user1: User = User.objects.create_user("Pedro", email="user1@gmail.com", password="123")
+        self.user2: User = User.objects.create_user("Juan", email="user2@gmail.com", password="123")
+
+    def test_writing_is_idempotent(self):
+        game_room = GameRoom.objects.create(status=GameRoom.ONGOING)
+        finished = _finished_game_room(game_room, self.user1, self.user2)
+
+        self.assertEqual(write_finished_game_rooms([finished]), [finished])
+        self.assertEqual(write_finished_game_rooms([finished]), [], "Closed game room should be skipped")
+
+        self.assertEqual(Match.objects.count(), 1)
+        game_room.refresh_from_db()
+        self.assertEqual(game_room.status, GameRoom.CLOSED)
+        self.user1.profile.refresh_from_db()
+        self.user2.profile.refresh_from_db()
+        self.assertEqual(self.user1.profile.elo, 1016)
+        self.assertEqual(self.user2.profile.elo, 984)
+
+    def test_delayed_result_keeps_elo_changed_in_meantime(self):
+        first_game_room = GameRoom.objects.create(status=GameRoom.ONGOING)
+        second_game_room = GameRoom.objects.create(status=GameRoom.ONGOING)
+        # both results were calculated from the ELO of 1000 the players had when they connected
+        delayed = _finished_game_room(first_game_room, self.user1, self.user2)
+        write_finished_game_rooms([_finished_game_room(second_game_room, self.user1, self.user2)])
+
+        write_finished_game_rooms([delayed])
+        write_finished_game_rooms([delayed])
+
+        self.user1.profile.refresh_from_db()
+        self.user2.profile.refresh_from_db()
+        self.assertEqual(self.user1.profile.elo, 1032)
+        self.assertEqual(self.user2.profile.elo, 968)
+        self.assertEqual(Match.objects.get(id=first_game_room.id).winners_elo, 1032)
+
+    def test_elo_change_is_clamped(self):
+        self.user2.profile.elo = Match.MINIMUM_ELO + 4
+        self.user2.profile.save()
+        write_finished_game_rooms(
+            [_finished_game_room(GameRoom.objects.create(status=GameRoom.ONGOING), self.user1, self.user2)],
+        )
+
+        self.user2.profile.refresh_from_db()
+        self.assertEqual(self.user2.profile.elo, Match.MINIMUM_ELO)
+
+    def test_game_room_without_result_is_only_closed(self):
+        game_room = GameRoom.objects.create(status=GameRoom.ONGOING)
+
+        write_finished_game_rooms([FinishedGameRoom(game_room_id=str(game_room.id), date=timezone.now().isoformat())])
+
+        game_room.refresh_from_db()
+        self.assertEqual(game_room.status, GameRoom.CLOSED)
+        self.assertFalse(Match.objects.exists())
+
+
+class MatchResultWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.user1: User = User.objects.create_user("Pedro", email="user1@gmail.com", password="123")
+        self.user2: User = User.objects.create_user("Juan", email="user2@gmail.com", password="123")
+        # profiles are cached here, as the tests are async
+        self.user1.profile.refresh_from_db()
+        self.user2.profile.refresh_from_db()
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.spool_path = Path(self.spool_dir.name) / "game.0.jsonl"
+        self.written = []
+
+    def tearDown(self):
+        self.spool_dir.cleanup()
+
+    async def _on_written(self, written: list[FinishedGameRoom]):
+        self.written.extend(written)
+
+    async def test_spooled_results_are_written_after_restart(self):
+        game_room = await GameRoom.objects.acreate(status=GameRoom.ONGOING)
+        writer = MatchResultWriter(self.spool_path, self._on_written)
+        writer.submit(_finished_game_room(game_room, self.user1, self.user2))
+        # worker stops before the result is written
+        writer._flush_task.cancel()
+        self.assertEqual(len(self.spool_path.read_text().splitlines()), 1)
+
+        restarted_writer = MatchResultWriter(self.spool_path, self._on_written)
+        restarted_writer.load_spool()
+        restarted_writer._flush_task.cancel()
+        self.assertTrue(await restarted_writer.flush())
+
+        self.assertEqual(await Match.objects.acount(), 1)
+        self.assertEqual(len(self.written), 1)
+        self.assertEqual(restarted_writer.pending, [])
+        self.assertEqual(self.spool_path.read_text(), "")
+
+    async def test_broken_result_does_not_hold_others(self):
+        game_room = await GameRoom.objects.acreate(status=GameRoom.ONGOING)
+        other_game_room = await GameRoom.objects.acreate(status=GameRoom.ONGOING)
+        broken = _finished_game_room(other_game_room, self.user1, self.user2)
+        broken["match"]["loser_profile_id"] = 0
+        writer = MatchResultWriter(self.spool_path, self._on_written)
+        writer.submit(broken)
+        writer.submit(_finished_game_room(game_room, self.user1, self.user2))
+        writer._flush_task.cancel()
+
+        self.assertFalse(await writer.flush())
+
+        self.assertEqual(await Match.objects.acount(), 1)
+        self.assertEqual(self.written[0]["game_room_id"], str(game_room.id))
+        self.assertEqual(writer.pending, [broken])
+        self.assertEqual(len(self.spool_path.read_text().splitlines()), 1)
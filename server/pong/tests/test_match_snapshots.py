@@ -0,0 +1,92 @@
+import json
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from channels.layers import get_channel_layer
+from channels.testing import ApplicationCommunicator
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from pong.consumers.game_worker import (
+    GAME_TICK_INTERVAL,
+    GameWorkerConsumer,
+    MultiplayerPongMatch,
+    MultiplayerPongMatchStatus,
+    PlayerConnectionState,
+)
+from pong.match_snapshots import MatchSnapshotStore, WorkerSnapshot
+
+SETTINGS = {"cool_mode": True, "game_speed": "fast", "time_limit": 3, "ranked": False, "score_to_win": 5}
+
+
+def _create_ongoing_match(game_id: str = "game") -> MultiplayerPongMatch:
+    match = MultiplayerPongMatch(game_id, SETTINGS, is_in_tournament=False, bracket_id=None, tournament_id=None)
+    for number, player in enumerate(match.get_players(), start=1):
+        player.id = f"player_{number}"
+        player.set_as_connected(match.start_time)
+    match.status = MultiplayerPongMatchStatus.ONGOING
+    return match
+
+
+class MatchSnapshotTests(SimpleTestCase):
+    async def test_restored_match_plays_like_the_original(self):
+        match = _create_ongoing_match()
+        current_time = match.start_time
+        for _ in range(200):
+            current_time += GAME_TICK_INTERVAL
+            match._player_1.bumper.moves_left = True
+            match.resolve_next_tick(GAME_TICK_INTERVAL, current_time)
+
+        snapshot = json.loads(json.dumps(match.get_snapshot(current_time)))
+        # clock of the restarted process is different
+        restored_time = current_time + 1000
+        restored = MultiplayerPongMatch.from_snapshot(snapshot, restored_time)
+        restored._rng.setstate(match._rng.getstate())
+
+        for _ in range(200):
+            current_time += GAME_TICK_INTERVAL
+            restored_time += GAME_TICK_INTERVAL
+            match.resolve_next_tick(GAME_TICK_INTERVAL, current_time)
+            restored.resolve_next_tick(GAME_TICK_INTERVAL, restored_time)
+            restored_state = dict(restored.as_dict_with_multiplayer_data(restored_time))
+            state = dict(match.as_dict_with_multiplayer_data(current_time))
+            # whole seconds of the shifted clock may be rounded the other way
+            self.assertAlmostEqual(restored_state.pop("elapsed_seconds"), state.pop("elapsed_seconds"), delta=1)
+            self.assertEqual(restored_state, state)
+        self.assertEqual(restored.status, MultiplayerPongMatchStatus.ONGOING)
+        self.assertEqual(restored._player_2.connection, PlayerConnectionState.CONNECTED)
+
+    async def test_empty_snapshot_removes_file(self):
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            store = MatchSnapshotStore(Path(snapshot_dir) / "game.0.json", interval=1.0)
+            await store.save(0.0, [_create_ongoing_match().get_snapshot(0.0)])
+            self.assertFalse(store.is_due(0.5))
+            await store.save(1.0, [])
+            await store._save_task
+
+            self.assertIsNone(store.load())
+
+
+class GameWorkerRestoreTests(TransactionTestCase):
+    async def test_worker_resumes_matches_from_snapshot(self):
+        # the stopped worker can still be writing its snapshot from the thread while the directory is removed
+        with (
+            tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as snapshot_dir,
+            override_settings(GAME_SNAPSHOT_DIR=snapshot_dir),
+        ):
+            match = _create_ongoing_match(str(uuid.uuid4()))
+            match.status = MultiplayerPongMatchStatus.PAUSED
+            match.pause_start_time = match.start_time
+            match._player_2.connection = PlayerConnectionState.DISCONNECTED
+            snapshot = WorkerSnapshot(saved_at=time.time(), matches=[match.get_snapshot(match.start_time)])
+            (Path(snapshot_dir) / "game.0.json").write_text(json.dumps(snapshot))
+
+            channel_layer = get_channel_layer()
+            reply_channel = await channel_layer.new_channel()
+            worker = ApplicationCommunicator(GameWorkerConsumer.as_asgi(), {"type": "channel", "channel": "game.0"})
+            await worker.send_input({"type": "worker_metrics", "reply_channel": reply_channel})
+            message = await channel_layer.receive(reply_channel)
+            worker.stop()
+
+        self.assertEqual(message["metrics"]["paused_matches"], 1)
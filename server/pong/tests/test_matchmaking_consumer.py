@@ -1,25 +1,44 @@
 import asyncio
 import logging
 import json
+from unittest import mock
 
 from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import ChannelNameRouter
 from channels.testing import WebsocketCommunicator
+from channels.worker import Worker
+from django.core.cache import cache
 from django.test import TransactionTestCase
 
 from common.close_codes import CloseCodes
-from pong.consumers.matchmaking import MatchmakingConsumer
+from pong.consumers.matchmaking import MATCHMAKING_WORKER_CHANNEL_NAME, MatchmakingConsumer
+from pong.consumers.matchmaking_worker import MatchmakingWorkerConsumer
 from pong.models import GameRoom
 from users.models import User, RefreshToken
 from users.middleware import JWTWebsocketAuthMiddleware
 
 class MatchmakingConsumerTests(TransactionTestCase):
     def setUp(self):
+        cache.clear()
         logging.disable(logging.CRITICAL)
+        self.matchmaking_worker_task = None
 
     def tearDown(self):
         logging.disable(logging.NOTSET)
 
+    def start_matchmaking_worker(self):
+        """Matchmaking worker with the empty queue runs in the event loop of the test, which cancels it in the end."""
+        if self.matchmaking_worker_task is None:
+            worker = Worker(
+                ChannelNameRouter({MATCHMAKING_WORKER_CHANNEL_NAME: MatchmakingWorkerConsumer.as_asgi()}),
+                [MATCHMAKING_WORKER_CHANNEL_NAME],
+                get_channel_layer(),
+            )
+            self.matchmaking_worker_task = asyncio.create_task(worker.handle())
+
     async def connect_to_route(self, user, access_token, qs: str = ""):
+        self.start_matchmaking_worker()
         headers = [
             (b"cookie", f"access_token={access_token}".encode("utf-8"))
         ]
@@ -121,7 +140,50 @@ class MatchmakingConsumerTests(TransactionTestCase):
         except asyncio.TimeoutError:
             pass
         
-        assert await database_sync_to_async(GameRoom.objects.count)() == 2, "There should be 2 separate game rooms for each of the users"
+        assert await database_sync_to_async(GameRoom.objects.count)() == 0, "Game rooms should be created only for the matched players"
+
+        await communicator1.disconnect()
+        await communicator2.disconnect()
+
+    async def test_search_is_active_game_participation(self):
+        user1, communicator1, _ = await self.get_authenticated_user_and_communicator("TestUser1")
+        profile = await database_sync_to_async(lambda: user1.profile)()
+
+        *_, search = await database_sync_to_async(profile.get_active_game_participation)()
+        self.assertIsNotNone(search, "Player who searches for the game should be involved in the game")
 
         await communicator1.disconnect()
+        *_, search = await database_sync_to_async(profile.get_active_game_participation)()
+        self.assertIsNone(search, "Player who cancelled the search should not be involved in the game")
+
+    async def test_new_connection_replaces_search_of_previous_one(self):
+        user1, communicator1, access_token1 = await self.get_authenticated_user_and_communicator("TestUser1")
+        communicator2 = await self.connect_to_route(user1, access_token1)
+
+        output = await communicator1.receive_output()
+        self.assertEqual(output["type"], "websocket.close", "Replaced search should be closed")
+        self.assertEqual(output["code"], CloseCodes.ALREADY_IN_GAME)
+        await communicator1.disconnect(output["code"])
+
+        _, communicator3, _ = await self.get_authenticated_user_and_communicator("TestUser2")
+        output2 = await communicator2.receive_json_from()
+        self.assertEqual(output2["username"], "TestUser2", "New connection should keep searching")
+
         await communicator2.disconnect()
+        await communicator3.disconnect()
+
+    async def test_searches_are_closed_when_game_room_cant_be_created(self):
+        with mock.patch.object(MatchmakingWorkerConsumer, "_create_game_room", side_effect=RuntimeError):
+            user1, communicator1, _ = await self.get_authenticated_user_and_communicator("TestUser1")
+            user2, communicator2, _ = await self.get_authenticated_user_and_communicator("TestUser2")
+
+            for communicator in (communicator1, communicator2):
+                output = await communicator.receive_output()
+                self.assertEqual(output["type"], "websocket.close", "Search should be closed when game room can't be created")
+                self.assertEqual(output["code"], CloseCodes.CANCELLED)
+                await communicator.disconnect(output["code"])
+
+        for user in (user1, user2):
+            profile = await database_sync_to_async(lambda user=user: user.profile)()
+            *_, search = await database_sync_to_async(profile.get_active_game_participation)()
+            self.assertIsNone(search, "Failed search should not involve the player in the game")
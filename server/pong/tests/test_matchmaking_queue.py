@@ -0,0 +1,104 @@
+from django.test import SimpleTestCase
+
+from pong.matchmaking_metrics import MatchmakingMetrics
+from pong.matchmaking_queue import MatchmakingQueue, MatchmakingSearch
+
+SETTINGS = {"cool_mode": True, "game_speed": "fast", "time_limit": 3, "ranked": False, "score_to_win": 5}
+
+
+class MatchmakingQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.queue = MatchmakingQueue(elo_range=50, elo_range_growth=10)
+
+    def add(
+        self,
+        profile_id: int,
+        settings: dict,
+        elo: int = 1000,
+        current_time: float = 0.0,
+    ) -> MatchmakingSearch | None:
+        return self.queue.add(MatchmakingSearch(f"channel.{profile_id}", profile_id, settings, elo), current_time)
+
+    def test_searches_with_same_settings_are_paired(self):
+        self.assertIsNone(self.add(1, SETTINGS))
+        opponent = self.add(2, dict(SETTINGS))
+
+        self.assertEqual(opponent.profile_id, 1)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_settings_left_as_any_accept_any_value(self):
+        self.assertIsNone(self.add(1, {"score_to_win": 5, "ranked": False}))
+        self.assertIsNone(self.add(2, {"score_to_win": 7}))
+        opponent = self.add(3, {"ranked": False, "game_speed": "slow"})
+
+        self.assertEqual(opponent.profile_id, 1)
+        self.assertIn("channel.2", self.queue)
+        self.assertEqual(self.add(4, {}).profile_id, 2)
+
+    def test_searches_with_conflicting_settings_are_not_paired(self):
+        self.assertIsNone(self.add(1, SETTINGS))
+        self.assertIsNone(self.add(2, {**SETTINGS, "score_to_win": 6}))
+        self.assertIsNone(self.add(3, {"cool_mode": False}))
+
+        self.assertEqual(len(self.queue), 3)
+
+    def test_oldest_compatible_search_is_paired_first_on_same_elo(self):
+        self.add(1, {"score_to_win": 5})
+        self.add(2, {"score_to_win": 6})
+        self.add(3, {"score_to_win": 7, "cool_mode": True})
+
+        self.assertEqual(self.add(4, {"cool_mode": True}).profile_id, 1)
+        self.assertEqual(self.add(5, {"score_to_win": 7}).profile_id, 3)
+        self.assertEqual(self.add(6, {}).profile_id, 2)
+
+    def test_closest_elo_within_range_is_paired(self):
+        self.add(1, {"score_to_win": 5}, elo=1040)
+        self.add(2, {"score_to_win": 6}, elo=980)
+        self.add(3, {"cool_mode": False}, elo=1200)
+
+        self.assertEqual(self.add(4, {}, elo=990).profile_id, 2)
+        self.assertEqual(self.add(5, {}, elo=1010).profile_id, 1)
+        self.assertIsNone(self.add(6, {}, elo=1100))
+
+    def test_elo_range_widens_with_wait_time(self):
+        self.add(1, SETTINGS, elo=1000, current_time=0)
+        self.add(2, SETTINGS, elo=1120, current_time=3)
+
+        self.assertEqual(self.queue.match_waiting(current_time=6), [])
+        first, second = self.queue.match_waiting(current_time=7)[0]
+
+        self.assertEqual((first.profile_id, second.profile_id), (1, 2))
+        self.assertEqual(len(self.queue), 0)
+
+    def test_removed_search_is_not_paired(self):
+        self.add(1, SETTINGS)
+
+        self.assertEqual(self.queue.remove("channel.1").profile_id, 1)
+        self.assertIsNone(self.queue.remove("channel.1"))
+        self.assertIsNone(self.add(2, SETTINGS))
+
+    def test_new_search_of_player_replaces_previous_one(self):
+        self.add(1, SETTINGS)
+        self.assertIsNone(self.queue.add(MatchmakingSearch("channel.other", 1, SETTINGS, 1000), 1.0))
+
+        self.assertNotIn("channel.1", self.queue)
+        self.assertEqual(len(self.queue), 1)
+        self.assertEqual(self.queue.get_longest_wait_time(3.0), 2.0)
+        self.assertEqual(self.add(2, SETTINGS).channel_name, "channel.other")
+
+
+class MatchmakingMetricsTests(SimpleTestCase):
+    def test_snapshot_reports_wait_times_and_elo_gaps(self):
+        metrics = MatchmakingMetrics()
+        metrics.record_pair(1.5, 0.5, elo_gap=40)
+        metrics.record_pair(12, 3, elo_gap=120)
+
+        snapshot = metrics.snapshot(waiting_searches=3, longest_wait_time=4)
+
+        self.assertEqual(snapshot["waiting_searches"], 3)
+        self.assertEqual(snapshot["longest_wait_ms"], 4000)
+        self.assertEqual(snapshot["wait_time"]["count"], 4)
+        self.assertEqual(snapshot["wait_time"]["max_ms"], 12000)
+        self.assertEqual(snapshot["elo_gap"]["count"], 2)
+        self.assertEqual(snapshot["elo_gap"]["p50"], 50)
+        self.assertEqual(snapshot["elo_gap"]["max"], 120)
@@ -0,0 +1,204 @@
+import time
+
+from django.test import SimpleTestCase
+
+from pong.consumers.game_worker import (
+    BALL_Z_VELOCITY_PER_SECOND,
+    BUMPER_LENGTH_HALF,
+    BUMPER_WIDTH_HALF,
+    GAME_TICK_INTERVAL,
+    GAME_TICKS_PER_SECOND,
+    MAX_CATCH_UP_MOVES,
+    CollisionType,
+    WALL_RIGHT_X,
+    WALL_WIDTH_HALF,
+    MultiplayerPongMatch,
+)
+
+SETTINGS = {"cool_mode": False, "game_speed": "medium", "time_limit": 3, "ranked": False, "score_to_win": 5}
+
+
+class MultiplayerPongMatchInputsTests(SimpleTestCase):
+    def setUp(self):
+        self.match = MultiplayerPongMatch("game", SETTINGS, is_in_tournament=False, bracket_id=None, tournament_id=None)
+        self.match._player_1.id = "player_1"
+
+    def batch(self, first_move_id: int, last_move_id: int, first_timestamp: int, last_timestamp: int):
+        return {
+            "type": "player_inputs_batched",
+            "action": "move_right",
+            "game_room_id": "game",
+            "player_id": "player_1",
+            "first_move_id": first_move_id,
+            "last_move_id": last_move_id,
+            "first_timestamp": first_timestamp,
+            "last_timestamp": last_timestamp,
+        }
+
+    def test_batch_is_processed_as_one_move_per_tick(self):
+        self.match.add_inputs_batch_to_queue(self.batch(5, 7, 1000, 1066))
+        player = self.match._player_1
+
+        self.assertEqual(len(player.moves_queue), 1, "Batch should be one entry of the queue")
+        self.assertEqual(player.queued_moves, 3)
+        processed_moves = []
+        for _ in range(3):
+            self.match._process_inputs(player)
+            processed_moves.append((player.last_processed_move["move_id"], player.last_processed_move["timestamp"]))
+        self.assertTrue(player.bumper.moves_right)
+        self.assertEqual(processed_moves, [(5, 1000), (6, 1033), (7, 1066)])
+        self.assertFalse(player.moves_queue)
+        self.assertEqual(player.queued_moves, 0)
+
+    def test_late_batch_is_caught_up_at_once(self):
+        player = self.match._player_1
+        player.move_credit = MAX_CATCH_UP_MOVES
+        self.match.add_inputs_batch_to_queue(self.batch(1, 4, 1000, 1100))
+
+        self.match.start_tick(GAME_TICK_INTERVAL)
+
+        self.assertFalse(player.moves_queue)
+        self.assertEqual(player.last_processed_move["move_id"], 4)
+        self.assertEqual(player.last_processed_move["timestamp"], 1100)
+        self.assertEqual(player.bumper.catch_up_moves, 3)
+
+    def test_batch_is_limited_by_queue_size(self):
+        self.match.add_inputs_batch_to_queue(self.batch(1, GAME_TICKS_PER_SECOND * 2, 0, 0))
+        self.match.add_inputs_batch_to_queue(self.batch(GAME_TICKS_PER_SECOND * 2 + 1, GAME_TICKS_PER_SECOND * 3, 0, 0))
+
+        self.assertEqual(len(self.match._player_1.moves_queue), 1)
+        self.assertEqual(self.match._player_1.queued_moves, GAME_TICKS_PER_SECOND)
+
+    def test_batch_of_unknown_player_is_ignored(self):
+        batch = self.batch(1, 3, 0, 0)
+        batch["player_id"] = "stranger"
+        self.match.add_inputs_batch_to_queue(batch)
+
+        self.assertFalse(self.match._player_1.moves_queue)
+        self.assertFalse(self.match._player_2.moves_queue)
+
+
+class MultiplayerPongMatchBumperGeometryTests(SimpleTestCase):
+    def setUp(self):
+        self.match = MultiplayerPongMatch("game", SETTINGS, is_in_tournament=False, bracket_id=None, tournament_id=None)
+        ball = self.match._ball
+        ball.x, ball.z = 0.0, 0.0
+        ball.velocity.x, ball.velocity.z = 0.0, -1.0
+
+    def test_collision_follows_resized_bumper(self):
+        bumper = self.match._bumper_1
+        time_to_bumper, collision = self.match._find_next_collision(100)
+        self.assertEqual(collision, (CollisionType.BUMPER, bumper))
+
+        bumper.resize(BUMPER_LENGTH_HALF, 1.5)
+        time_to_enlarged_bumper, _ = self.match._find_next_collision(100)
+        self.assertLess(time_to_enlarged_bumper, time_to_bumper)
+
+        bumper.resize(BUMPER_LENGTH_HALF, BUMPER_WIDTH_HALF)
+        self.assertEqual(self.match._find_next_collision(100)[0], time_to_bumper)
+
+    def test_bumper_limits_follow_its_length(self):
+        bumper = self.match._bumper_1
+        bumper.moves_right = True
+        for _ in range(GAME_TICKS_PER_SECOND * 5):
+            self.match._move_bumper(bumper, 1 / GAME_TICKS_PER_SECOND)
+        self.assertEqual(bumper.x, bumper.right_limit)
+
+        bumper.resize(5, BUMPER_WIDTH_HALF)
+        self.match._move_bumper(bumper, 1 / GAME_TICKS_PER_SECOND)
+        self.assertEqual(bumper.x, WALL_RIGHT_X + WALL_WIDTH_HALF + 5)
+
+
+class MultiplayerPongMatchLagCompensationTests(SimpleTestCase):
+    def setUp(self):
+        self.match = MultiplayerPongMatch("game", SETTINGS, is_in_tournament=False, bracket_id=None, tournament_id=None)
+        self.player = self.match._player_1
+        self.player.id = "player_1"
+
+    def send_moves(self, action: str, number_of_moves: int):
+        timestamp = int(time.time() * 1000)
+        for move_id in range(number_of_moves):
+            self.match.add_input_to_queue(
+                {"action": action, "move_id": move_id, "player_id": "player_1", "timestamp": timestamp},
+            )
+
+    def idle(self, number_of_ticks: int):
+        for _ in range(number_of_ticks):
+            self.match.start_tick(GAME_TICK_INTERVAL)
+            self.match.finish_tick(0.0)
+
+    def test_late_moves_are_caught_up_in_one_tick(self):
+        self.idle(3)
+        self.send_moves("move_left", 3)
+        bumper = self.player.bumper
+        start_x = bumper.x
+
+        self.match.resolve_next_tick(GAME_TICK_INTERVAL, 0.0)
+
+        self.assertFalse(self.player.moves_queue)
+        self.assertEqual(self.player.last_processed_move["move_id"], 2)
+        self.assertAlmostEqual(bumper.x - start_x, bumper.speed * GAME_TICK_INTERVAL * 3)
+        self.assertEqual(bumper.catch_up_factor, 1.0, "Catch up lasts only for one tick")
+
+    def test_catch_up_is_limited_by_earned_moves(self):
+        self.idle(MAX_CATCH_UP_MOVES * 2)
+        self.send_moves("move_left", MAX_CATCH_UP_MOVES * 2)
+
+        self.match.start_tick(GAME_TICK_INTERVAL)
+        self.assertEqual(self.player.bumper.catch_up_moves, MAX_CATCH_UP_MOVES)
+        self.match.finish_tick(0.0)
+        self.match.start_tick(GAME_TICK_INTERVAL)
+        self.assertEqual(self.player.bumper.catch_up_moves, 0)
+
+    def test_change_of_direction_is_not_caught_up(self):
+        self.idle(3)
+        self.send_moves("move_left", 1)
+        self.send_moves("move_right", 1)
+
+        self.match.start_tick(GAME_TICK_INTERVAL)
+
+        self.assertEqual(len(self.player.moves_queue), 1)
+        self.assertEqual(self.player.bumper.catch_up_moves, 0)
+
+    def miss_ball(self) -> tuple[int, int]:
+        """Bumper reaches the ball after it has passed the bumper, just before the goal."""
+        bumper = self.player.bumper
+        ball = self.match._ball
+        ball.x, ball.z = 5.0, bumper.collision_top - 1.6
+        ball.velocity.x, ball.velocity.z = 0.0, -30.0
+        bumper.x = 5.0
+        self.match.start_tick(GAME_TICK_INTERVAL)
+        self.match.resolve_sub_ticks(GAME_TICK_INTERVAL, 0.0)
+        self.match.finish_tick(0.0)
+        return self.match._bumper_1.score, self.match._bumper_2.score
+
+    def test_miss_within_latency_is_hit(self):
+        for _ in range(GAME_TICKS_PER_SECOND):
+            self.player.record_input_latency(int((time.time() - 0.1) * 1000))
+
+        self.assertEqual(self.miss_ball(), (0, 0))
+        self.assertGreater(self.match._ball.velocity.z, 0)
+
+    def test_miss_without_latency_is_scored(self):
+        self.assertEqual(self.miss_ball(), (0, 1))
+
+    def test_bumper_late_by_latency_saves_ball_at_base_speed(self):
+        """The ball passes the bumper in the middle of the first tick, and the bumper reaches it some ticks later."""
+        cases = ((0.03, 0, False), (0.06, 0, True), (0.1, 1, True), (0.1, 2, False))
+        for latency, late_ticks, is_saved in cases:
+            with self.subTest(latency=latency, late_ticks=late_ticks):
+                self.setUp()
+                self.player.record_rtt(latency * 2)
+                bumper = self.player.bumper
+                ball = self.match._ball
+                ball.x, ball.z = 5.0, bumper.collision_top + BALL_Z_VELOCITY_PER_SECOND * GAME_TICK_INTERVAL / 2
+                ball.velocity.x, ball.velocity.z = 0.0, -BALL_Z_VELOCITY_PER_SECOND
+                bumper.x = -5.0
+                for _ in range(late_ticks + 1):
+                    self.match.resolve_next_tick(GAME_TICK_INTERVAL, 0.0)
+                self.assertLess(ball.velocity.z, 0)
+                bumper.x = 5.0
+                for _ in range(GAME_TICKS_PER_SECOND):
+                    self.match.resolve_next_tick(GAME_TICK_INTERVAL, 0.0)
+
+                self.assertEqual(self.match._bumper_2.score, 0 if is_saved else 1)
@@ -0,0 +1,109 @@
+import copy
+import random
+import tempfile
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from pong.consumers.game_worker import GAME_TICK_INTERVAL, MultiplayerPongMatch
+from pong.replays import (
+    REPLAY_KEYFRAME_INTERVAL,
+    TICK_RECORD,
+    ReplayRecorder,
+    get_replay_path,
+    play_replay,
+    read_records,
+)
+
+SETTINGS = {"cool_mode": True, "game_speed": "fast", "time_limit": 3, "ranked": False, "score_to_win": 100}
+
+
+class ReplayTests(SimpleTestCase):
+    def setUp(self):
+        self.replay_dir = tempfile.TemporaryDirectory()
+        self.override = override_settings(GAME_REPLAY_DIR=self.replay_dir.name)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.replay_dir.cleanup()
+
+    def play_match(
+        self,
+        number_of_ticks: int,
+        sudden_death_tick: int | None = None,
+        ticks_in_step: int = 1,
+        latency: float = 0.0,
+        burst: int = 1,
+    ) -> list:
+        """
+        Plays the match with random inputs while recording it. Returns the states of every tick.
+        With `ticks_in_step`, the match is resolved in the longer steps, like on the overloaded worker.
+        Inputs are sent `latency` seconds before they arrive, and arrive together every `burst` ticks.
+        """
+        match = MultiplayerPongMatch("game", SETTINGS, is_in_tournament=False, bracket_id=None, tournament_id=None)
+        for number, player in enumerate(match.get_players(), start=1):
+            player.id = f"player_{number}"
+        match.replay = ReplayRecorder.open("game")
+        match.replay.record_keyframe(match)
+        rng = random.Random(0)
+
+        states = []
+        inputs = []
+        current_time = match.start_time
+        for tick in range(number_of_ticks):
+            current_time += GAME_TICK_INTERVAL * ticks_in_step
+            timestamp = int((time.time() - latency) * 1000)
+            for player in match.get_players():
+                action = rng.choice(["move_left", "move_right", None])
+                if action:
+                    inputs.append({"action": action, "move_id": tick, "player_id": player.id, "timestamp": timestamp})
+            if tick % burst == burst - 1:
+                for player_input in inputs:
+                    match.add_input_to_queue(player_input)
+                inputs.clear()
+            if tick == sudden_death_tick:
+                match.time_limit_reached = True
+                match.set_ball_to_max_speed()
+            match.resolve_next_tick(GAME_TICK_INTERVAL * ticks_in_step, current_time)
+            states.append(copy.deepcopy(match.as_dict()))
+        match.replay.close()
+        return states
+
+    def test_playback_reproduces_the_match(self):
+        states = self.play_match(REPLAY_KEYFRAME_INTERVAL * 3 + 10, sudden_death_tick=REPLAY_KEYFRAME_INTERVAL * 2)
+
+        played_states = [copy.deepcopy(state) for _, state in play_replay(get_replay_path("game").read_bytes())]
+        self.assertEqual(len(played_states), len(states))
+        self.assertEqual(played_states, states)
+        self.assertGreater(states[-1]["bumper_1"]["score"] + states[-1]["bumper_2"]["score"], 0)
+
+    def test_playback_reproduces_the_match_resolved_in_longer_steps(self):
+        states = self.play_match(REPLAY_KEYFRAME_INTERVAL + 10, ticks_in_step=3)
+
+        played_states = [copy.deepcopy(state) for _, state in play_replay(get_replay_path("game").read_bytes())]
+        self.assertEqual(played_states, states)
+
+    def test_playback_reproduces_the_lag_compensated_match(self):
+        states = self.play_match(REPLAY_KEYFRAME_INTERVAL + 10, latency=0.1, burst=3)
+
+        played_states = [copy.deepcopy(state) for _, state in play_replay(get_replay_path("game").read_bytes())]
+        self.assertEqual(played_states, states)
+
+    def test_incomplete_chunk_of_crashed_worker_is_cut_off(self):
+        self.play_match(10)
+        replay_path = get_replay_path("game")
+        complete_size = replay_path.stat().st_size
+        with replay_path.open("ab") as replay:
+            replay.write(b"\xff\x00\x00\x00partial")
+
+        ReplayRecorder.open("game")
+
+        self.assertEqual(replay_path.stat().st_size, complete_size)
+        self.assertEqual(len(list(read_records(replay_path.read_bytes()))), 11)
+
+    def test_replay_is_compressed(self):
+        ticks = REPLAY_KEYFRAME_INTERVAL * 6
+        self.play_match(ticks)
+
+        self.assertLess(get_replay_path("game").stat().st_size, ticks * TICK_RECORD.size)
@@ -0,0 +1,20 @@
+from django.test import SimpleTestCase
+
+from pong.simulation import simulate
+
+
+class SimulationTests(SimpleTestCase):
+    def test_simulation_is_deterministic(self):
+        first = simulate(8, 300, seed=1)
+        second = simulate(8, 300, seed=1)
+
+        self.assertEqual(first.state_checksum, second.state_checksum)
+        self.assertNotEqual(first.state_checksum, simulate(8, 300, seed=2).state_checksum)
+
+    def test_engines_produce_the_same_games(self):
+        scalar = simulate(8, 300, seed=3, bot="random", engine="scalar")
+        batch = simulate(8, 300, seed=3, bot="random", engine="batch")
+
+        self.assertEqual(scalar.state_checksum, batch.state_checksum)
+        self.assertEqual(scalar.sub_ticks_per_match_tick, batch.sub_ticks_per_match_tick)
+        self.assertGreaterEqual(scalar.sub_ticks_per_match_tick, 1)
@@ -0,0 +1,97 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from pong.consumers.game_worker import (
+    GAME_TICK_INTERVAL,
+    GameWorkerConsumer,
+    MultiplayerPongMatch,
+    MultiplayerPongMatchStatus,
+)
+from pong.timer_wheel import WHEEL_SLOTS, TimerWheel
+
+SETTINGS = {"cool_mode": True, "game_speed": "fast", "time_limit": 3, "ranked": False, "score_to_win": 5}
+
+
+class TimerWheelTests(SimpleTestCase):
+    def advance_until_empty(self, wheel: TimerWheel, current_time: float) -> list[tuple[int, str]]:
+        """Advances the wheel tick by tick. Returns the fired timers with their ticks."""
+        fired = []
+        while len(wheel):
+            current_time += 1.0
+            fired.extend((wheel.current_tick, timer.callback(*timer.args)) for timer in wheel.advance(current_time))
+        return fired
+
+    def test_timers_of_all_levels_fire_on_their_ticks(self):
+        wheel = TimerWheel(1.0)
+        delays = {"next tick": 0.5, "first level": 10, "second level": 1000, "overflow": WHEEL_SLOTS * WHEEL_SLOTS + 7}
+        for name, delay in delays.items():
+            wheel.schedule(0.0, delay, lambda name: name, name)
+
+        fired = self.advance_until_empty(wheel, 0.0)
+
+        self.assertEqual(fired, [(1, "next tick"), (10, "first level"), (1000, "second level"), (65543, "overflow")])
+
+    def test_cancelled_timer_does_not_fire(self):
+        wheel = TimerWheel(1.0)
+        timer = wheel.schedule(0.0, 300, lambda: "cancelled")
+        wheel.schedule(0.0, 301, lambda: "kept")
+        wheel.cancel(timer)
+        wheel.cancel(timer)
+
+        self.assertFalse(timer.is_active())
+        self.assertEqual(self.advance_until_empty(wheel, 0.0), [(301, "kept")])
+
+    def test_empty_wheel_catches_up_with_the_clock(self):
+        wheel = TimerWheel(GAME_TICK_INTERVAL)
+        current_time = 1_000_000.0
+        self.assertEqual(wheel.advance(current_time), [])
+        timer = wheel.schedule(current_time + 3600, 1.0, lambda: None)
+
+        # the wheel jumps over the hour without any timer instead of stepping through its ticks
+        self.assertEqual(wheel.advance(current_time + 3600.5), [])
+        self.assertAlmostEqual(timer.get_remaining_time(current_time + 3600.5), 0.5)
+        self.assertEqual(wheel.advance(current_time + 3601.01), [timer])
+        self.assertEqual(len(wheel), 0)
+
+
+class GameWorkerTimersTests(SimpleTestCase):
+    def set_up_worker(self) -> tuple[GameWorkerConsumer, MultiplayerPongMatch]:
+        worker = GameWorkerConsumer()
+        match = MultiplayerPongMatch("game", SETTINGS, is_in_tournament=False, bracket_id=None, tournament_id=None)
+        for number, player in enumerate(match.get_players(), start=1):
+            player.id = f"player_{number}"
+            player.set_as_connected(match.start_time)
+        match.status = MultiplayerPongMatchStatus.ONGOING
+        worker.matches[match.id] = match
+        return worker, match
+
+    async def test_time_limit_does_not_run_while_match_is_paused(self):
+        worker, match = self.set_up_worker()
+        worker._start_time_limit_timer(match, match.start_time)
+        worker._stop_time_limit_timer(match)
+        match.total_paused_time = 60
+        worker._start_time_limit_timer(match, match.start_time + 60)
+
+        worker._fire_timers(match.start_time + match.time_limit_in_seconds + 1)
+        self.assertFalse(match.time_limit_reached)
+
+        worker._fire_timers(match.start_time + match.time_limit_in_seconds + 61)
+        self.assertTrue(match.time_limit_reached)
+        self.assertIsNone(match.time_limit_timer)
+        self.assertEqual(match.status, MultiplayerPongMatchStatus.ONGOING, "Equal scores start the sudden death")
+
+    async def test_reconnected_player_keeps_the_rest_of_reconnection_time(self):
+        worker, match = self.set_up_worker()
+        player = match.get_players()[0]
+        current_time = asyncio.get_event_loop().time()
+        worker._start_reconnection_timer(match, player, current_time)
+        self.assertAlmostEqual(player.get_remaining_reconnection_time(current_time + 10), 20)
+
+        worker._stop_reconnection_timer(player, current_time + 10)
+        worker._fire_timers(current_time + 31)
+
+        self.assertAlmostEqual(player.reconnection_time, 20)
+        self.assertIsNone(player.reconnection_timer)
+        self.assertEqual(len(worker.timers), 0)
+        self.assertEqual(match.status, MultiplayerPongMatchStatus.ONGOING)
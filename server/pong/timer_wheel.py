@@ -0,0 +1,125 @@
+"""
+Hierarchical timer wheel that holds the deadlines of all matches of the game worker: waiting for the players,
+reconnection of the players and the time limit. It's advanced by the game loop of the worker, tick by tick, instead of
+each deadline being its own `asyncio` task that sleeps, so scheduling, cancelling and firing a timer are O(1), and the
+pending and paused matches cost nothing until their deadlines.
+
+The first level has a slot for each of the next `WHEEL_SLOTS` ticks. The second level has a slot for each of the next
+`WHEEL_SLOTS` spans of `WHEEL_SLOTS` ticks, and when the first level wraps around, the timers of the next span are moved
+to it. Timers that are further than that wait in the overflow, and are moved when the second level wraps around.
+With 30 ticks per second, the first level covers about 8.5 seconds, the second about 36 minutes.
+"""
+
+import math
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+WHEEL_BITS = 8
+WHEEL_SLOTS = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SLOTS - 1
+
+
+@dataclass(slots=True, eq=False)
+class Timer:
+    callback: Callable
+    args: tuple
+    # time when the timer fires, and the tick of the wheel when it fires
+    deadline: float
+    tick: int
+    # slot of the wheel that holds the timer, `None` when it has fired or was cancelled
+    slot: set["Timer"] | None = field(default=None, repr=False)
+
+    def is_active(self) -> bool:
+        return self.slot is not None
+
+    def get_remaining_time(self, current_time: float) -> float:
+        return max(0.0, self.deadline - current_time)
+
+
+class TimerWheel:
+    def __init__(self, tick_interval: float):
+        self.tick_interval = tick_interval
+        # ticks are counted from the zero of the clock, the wheel catches up with it when it's empty
+        self.current_tick = 0
+        self._levels: tuple[list[set[Timer]], list[set[Timer]]] = (
+            [set() for _ in range(WHEEL_SLOTS)],
+            [set() for _ in range(WHEEL_SLOTS)],
+        )
+        self._overflow: set[Timer] = set()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def schedule(self, current_time: float, delay: float, callback: Callable, *args) -> Timer:
+        """
+        Returns the timer that fires on the first tick after `delay` seconds, or on the next tick if `delay` is not
+        positive. The fired timers are returned by `advance`, and their callbacks are called with `args` by its caller.
+        """
+        if not self._count:
+            self.current_tick = max(self.current_tick, self._get_tick(current_time))
+        deadline = current_time + delay
+        tick = max(math.ceil(deadline / self.tick_interval), self.current_tick + 1)
+        timer = Timer(callback, args, deadline, tick)
+        self._add(timer)
+        self._count += 1
+        return timer
+
+    def cancel(self, timer: Timer | None):
+        if timer is None or timer.slot is None:
+            return
+        timer.slot.discard(timer)
+        timer.slot = None
+        self._count -= 1
+
+    def advance(self, current_time: float) -> list[Timer]:
+        """Moves the wheel to the tick of `current_time`. Returns the due timers in the order of their ticks."""
+        target_tick = self._get_tick(current_time)
+        if not self._count:
+            self.current_tick = max(self.current_tick, target_tick)
+            return []
+
+        due = []
+        while self.current_tick < target_tick and self._count:
+            self.current_tick += 1
+            index = self.current_tick & WHEEL_MASK
+            if index == 0:
+                self._cascade()
+            slot = self._levels[0][index]
+            if slot:
+                for timer in slot:
+                    timer.slot = None
+                due.extend(slot)
+                self._count -= len(slot)
+                slot.clear()
+        self.current_tick = max(self.current_tick, target_tick)
+        return due
+
+    def _get_tick(self, current_time: float) -> int:
+        return math.floor(current_time / self.tick_interval)
+
+    def _add(self, timer: Timer):
+        ticks_left = timer.tick - self.current_tick
+        if ticks_left < WHEEL_SLOTS:
+            slot = self._levels[0][timer.tick & WHEEL_MASK]
+        elif ticks_left < WHEEL_SLOTS * WHEEL_SLOTS:
+            slot = self._levels[1][(timer.tick >> WHEEL_BITS) & WHEEL_MASK]
+        else:
+            slot = self._overflow
+        slot.add(timer)
+        timer.slot = slot
+
+    def _cascade(self):
+        """First level has wrapped around: the timers of the next span of ticks are moved down to it."""
+        index = (self.current_tick >> WHEEL_BITS) & WHEEL_MASK
+        if index == 0 and self._overflow:
+            overflow = list(self._overflow)
+            self._overflow.clear()
+            for timer in overflow:
+                self._add(timer)
+        slot = self._levels[1][index]
+        if slot:
+            timers = list(slot)
+            slot.clear()
+            for timer in timers:
+                self._add(timer)
@@ -20,6 +20,8 @@ from users.middleware import JWTWebsocketAuthMiddleware  # noqa: I001,E402
 
 from chat.routing import websocket_urlpatterns as chat_websocket_urlpatterns  # noqa: E402
 from pong.consumers.game_worker import GameWorkerConsumer  # noqa: E402
+from pong.consumers.matchmaking_worker import MatchmakingWorkerConsumer  # noqa: E402
+from pong.game_worker_shards import get_game_worker_channel_names  # noqa: E402
 from pong.routing import websocket_urlpatterns as pong_websocket_urlpatterns  # noqa: E402
 from tournaments.routing import websocket_urlpatterns as tournaments_websocket_urlpatterns  # noqa: E402
 from .deny_route import DenyRoute  # noqa: E402
@@ -39,8 +41,9 @@ application = ProtocolTypeRouter(
         ),
         "channel": ChannelNameRouter(
             {
-                "game": GameWorkerConsumer.as_asgi(),
+                **{channel_name: GameWorkerConsumer.as_asgi() for channel_name in get_game_worker_channel_names()},
                 "tournament": TournamentWorkerConsumer.as_asgi(),
+                "matchmaking": MatchmakingWorkerConsumer.as_asgi(),
             },
         ),
     },
@@ -39,6 +39,16 @@ env = environ.Env(
     MAX_MESSAGE_LENGTH=(int, 255),
     REQUIRED_PARTICIPANTS_OPTIONS=(tuple, (4, 8)),
     HOST_IP=(str, ""),
+    GAME_WORKER_SHARDS=(int, 1),
+    GAME_TICK_SOCKET_DIR=(str, "/tmp/game_ticks"),  # noqa: S108
+    GAME_RESULT_SPOOL_DIR=(str, "/tmp/game_results"),  # noqa: S108
+    GAME_SNAPSHOT_DIR=(str, "/tmp/game_snapshots"),  # noqa: S108
+    GAME_SNAPSHOT_INTERVAL=(float, 1.0),
+    GAME_REPLAY_DIR=(str, "/tmp/game_replays"),  # noqa: S108
+    GAME_MAX_SPECTATORS_PER_MATCH=(int, 100),
+    GAME_WORKER_MAX_MATCHES=(int, 0),
+    MATCHMAKING_ELO_RANGE=(int, 50),
+    MATCHMAKING_ELO_RANGE_GROWTH=(float, 10.0),
 )
 
 env.read_env(env_file=str(BASE_DIR / ".env"))
@@ -181,9 +191,34 @@ SOCIALACCOUNT_PROVIDERS = {
     },
 }
 
+# Number of game worker processes. Each one runs its own share of pong matches on the `game.{i}` channel.
+GAME_WORKER_SHARDS = env("GAME_WORKER_SHARDS")
+# Directory of the unix sockets through which game workers send game states to the websocket server, bypassing Redis.
+# Empty value disables it, for the setups where game workers don't run on the same host as the websocket server.
+GAME_TICK_SOCKET_DIR = env("GAME_TICK_SOCKET_DIR")
+# Directory where game workers keep the results of finished matches until they are written to the database.
+# Should be on a persistent volume: results left there are written when the worker starts again.
+GAME_RESULT_SPOOL_DIR = env("GAME_RESULT_SPOOL_DIR")
+# Directory where game workers save the snapshots of their matches, to resume them after a restart. Empty disables it.
+GAME_SNAPSHOT_DIR = env("GAME_SNAPSHOT_DIR")
+# How often the snapshots are saved, in seconds. The progress of the matches since the last one is lost on a crash.
+GAME_SNAPSHOT_INTERVAL = env("GAME_SNAPSHOT_INTERVAL")
+# Directory of the replays of the matches, shared by the game workers and the server that streams them. Empty disables.
+GAME_REPLAY_DIR = env("GAME_REPLAY_DIR")
+# Spectators of one match are refused above this number.
+GAME_MAX_SPECTATORS_PER_MATCH = env("GAME_MAX_SPECTATORS_PER_MATCH")
+# Game worker with this many matches hands over the new ones to the other workers, or cancels them. 0 is unlimited.
+GAME_WORKER_MAX_MATCHES = env("GAME_WORKER_MAX_MATCHES")
+# Largest elo difference between the players the matchmaking pairs right away, and how much it widens every second
+# the player waits.
+MATCHMAKING_ELO_RANGE = env("MATCHMAKING_ELO_RANGE")
+MATCHMAKING_ELO_RANGE_GROWTH = env("MATCHMAKING_ELO_RANGE_GROWTH")
+
 # For the tests
 if "test" in sys.argv:
     CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    # every test starts its game worker from scratch
+    GAME_SNAPSHOT_DIR = ""
 else:
     REDIS_HOST = env("REDIS_HOST")
     REDIS_PORT = env("REDIS_PORT")
@@ -194,11 +229,19 @@ else:
                 "hosts": [(REDIS_HOST, REDIS_PORT)],
                 "expiry": 3,
                 "channel_capacity": {
-                    "game": 5000,
+                    "game.*": 5000,
                 },
             },
         },
     }
+    # shared by the server and the workers, which invalidate the cached data of the server, see
+    # `invalidate_active_game_participation`
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}",
+        },
+    }
 
 
 CSRF_TRUSTED_ORIGINS = [
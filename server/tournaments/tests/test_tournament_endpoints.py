@@ -1,5 +1,6 @@
 import logging
 
+from django.core.cache import cache
 from django.test import TestCase
 
 from tournaments.models import Tournament
@@ -12,6 +13,7 @@ class TournamentEndpointsTests(TestCase):
     """
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user("TestUser", email="user0@gmail.com", password="123")  # noqa: S106
         self.user_auth = self.client.post(
             "/api/login",
@@ -2,6 +2,7 @@ import logging
 from unittest.mock import patch
 from uuid import uuid4
 
+from django.core.cache import cache
 from django.test import TestCase
 
 from tournaments.models import Participant, Round, Tournament
@@ -10,6 +11,7 @@ from users.models import User
 
 class TournamentsEndpointsTests(TestCase):
     def setUp(self):
+        cache.clear()
         logging.disable(logging.CRITICAL)
         self.user1 = User.objects.create_user("Player1", email="player1@example.com", password="TestPassword123")
         self.user2 = User.objects.create_user("Player2", email="player2@example.com", password="TestPassword123")
@@ -0,0 +1,124 @@
+import asyncio
+import contextlib
+import json
+import logging
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from pong.binary_protocol import pack_state
+from pong.consumers.game_worker import GAME_TICK_INTERVAL, BasePong
+from pong.game_protocol import GameServerToClient
+from pong.local_tick_transport import LocalTickClient, LocalTickServer
+
+logger = logging.getLogger("server")
+
+
+class _LatencyRecorder:
+    """Stands in for the websocket consumer. Records how long the state took to arrive."""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+
+    async def dispatch(self, event: GameServerToClient.WorkerToClientState):
+        self.latencies.append(time.perf_counter() - json.loads(event["text"])["sent_at"])
+
+
+def _make_state_event(pong: BasePong, current_time: float) -> GameServerToClient.WorkerToClientState:
+    state = {**pong.as_dict(), "elapsed_seconds": int(current_time), "time_limit_reached": False}
+    return GameServerToClient.WorkerToClientState(
+        type="worker_to_client_state",
+        text=json.dumps({"action": "state_updated", "state": state, "sent_at": time.perf_counter()}),
+        packed_state=pack_state(state),
+    )
+
+
+class Command(BaseCommand):
+    help = "Measures latency of the game states sent through the channel layer and through the local tick transport"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--matches", type=int, default=50, help="Number of simultaneous matches.")
+        parser.add_argument("--ticks", type=int, default=150, help="Number of ticks to send for every match.")
+
+    def handle(self, *args, **options):
+        for name, benchmark in (("channel layer", self._benchmark_channel_layer), ("local", self._benchmark_local)):
+            latencies = async_to_sync(benchmark)(options["matches"], options["ticks"])
+            if not latencies:
+                logger.warning("%s: no states were received", name)
+                continue
+            latencies.sort()
+            logger.info(
+                "%s: received %d/%d states, p50 %.3f ms, p99 %.3f ms, max %.3f ms",
+                name,
+                len(latencies),
+                options["matches"] * options["ticks"],
+                statistics.median(latencies) * 1000,
+                latencies[int(len(latencies) * 0.99) - 1] * 1000,
+                latencies[-1] * 1000,
+            )
+
+    async def _run_ticks(self, number_of_matches: int, number_of_ticks: int, send_states):
+        pongs = [BasePong(cool_mode=True, game_speed=1.0, start_time=0.0) for _ in range(number_of_matches)]
+        for tick in range(1, number_of_ticks + 1):
+            start = time.perf_counter()
+            current_time = tick * GAME_TICK_INTERVAL
+            for pong in pongs:
+                pong.resolve_next_tick(GAME_TICK_INTERVAL, current_time)
+            await send_states([_make_state_event(pong, current_time) for pong in pongs])
+            await asyncio.sleep(max(GAME_TICK_INTERVAL - (time.perf_counter() - start), 0))
+        # let the last states arrive
+        await asyncio.sleep(0.5)
+
+    async def _benchmark_channel_layer(self, number_of_matches: int, number_of_ticks: int) -> list[float]:
+        channel_layer = get_channel_layer()
+        recorder = _LatencyRecorder()
+        channel_name = await channel_layer.new_channel()
+        group_names = [f"benchmark_tick_transport_{i}" for i in range(number_of_matches)]
+        for group_name in group_names:
+            await channel_layer.group_add(group_name, channel_name)
+
+        async def receive():
+            while True:
+                await recorder.dispatch(await channel_layer.receive(channel_name))
+
+        async def send_states(events):
+            sends = zip(group_names, events, strict=True)
+            await asyncio.gather(*(channel_layer.group_send(group_name, event) for group_name, event in sends))
+
+        receiver = asyncio.create_task(receive())
+        try:
+            await self._run_ticks(number_of_matches, number_of_ticks, send_states)
+        finally:
+            receiver.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await receiver
+            for group_name in group_names:
+                await channel_layer.group_discard(group_name, channel_name)
+        return recorder.latencies
+
+    async def _benchmark_local(self, number_of_matches: int, number_of_ticks: int) -> list[float]:
+        recorder = _LatencyRecorder()
+        room_ids = [f"benchmark_tick_transport_{i}" for i in range(number_of_matches)]
+        with tempfile.TemporaryDirectory() as directory:
+            server = LocalTickServer(Path(directory) / "benchmark.sock")
+            await server.start()
+            for room_id in room_ids:
+                server.register(room_id, recorder)
+            client = LocalTickClient()
+            await client.connect(server.path)
+
+            async def send_states(events):
+                for room_id, event in zip(room_ids, events, strict=True):
+                    client.send(server.path, room_id, event)
+
+            try:
+                await self._run_ticks(number_of_matches, number_of_ticks, send_states)
+            finally:
+                await client.close()
+                await server.close()
+        return recorder.latencies
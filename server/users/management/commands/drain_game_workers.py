@@ -0,0 +1,52 @@
+import asyncio
+import contextlib
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from pong.game_protocol import GameWorkerControl
+from pong.game_worker_shards import get_game_worker_channel_names
+
+logger = logging.getLogger("server")
+
+
+class Command(BaseCommand):
+    help = "Stops game workers from accepting new matches and waits until their ongoing matches are finished"
+
+    def add_arguments(self, parser):
+        parser.add_argument("shards", nargs="*", type=int, help="Numbers of the workers to drain. All by default.")
+        parser.add_argument("--timeout", type=float, default=360, help="How long to wait for the workers, in seconds.")
+
+    def handle(self, *args, **options):
+        channel_names = get_game_worker_channel_names()
+        if options["shards"]:
+            channel_names = [channel_names[shard] for shard in options["shards"] if shard < len(channel_names)]
+        drained = async_to_sync(self._drain)(channel_names, options["timeout"])
+        for channel_name in channel_names:
+            if channel_name in drained:
+                logger.info("Game worker %s has been drained", channel_name)
+            else:
+                logger.warning("Game worker %s still has matches after %s seconds", channel_name, options["timeout"])
+
+    async def _drain(self, channel_names: list[str], timeout: float) -> set[str]:
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        for channel_name in channel_names:
+            await channel_layer.send(
+                channel_name,
+                GameWorkerControl.Drain(type="worker_drain", reply_channel=reply_channel),
+            )
+
+        drained = set()
+
+        async def wait_for_replies():
+            while len(drained) < len(channel_names):
+                message = await channel_layer.receive(reply_channel)
+                if message.get("type") == "worker_drained":
+                    drained.add(message["channel_name"])
+
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(wait_for_replies(), timeout)
+        return drained
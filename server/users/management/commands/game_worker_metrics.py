@@ -0,0 +1,56 @@
+import asyncio
+import contextlib
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from pong.game_protocol import GameWorkerControl
+from pong.game_worker_metrics import GameWorkerMetricsSnapshot
+from pong.game_worker_shards import get_game_worker_channel_names
+
+logger = logging.getLogger("server")
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints the metrics of the game workers as JSON: tick times, lateness, matches, queued inputs, spectators and "
+        "network of the players"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("shards", nargs="*", type=int, help="Numbers of the workers to ask. All by default.")
+        parser.add_argument("--timeout", type=float, default=5, help="How long to wait for the workers, in seconds.")
+
+    def handle(self, *args, **options):
+        channel_names = get_game_worker_channel_names()
+        if options["shards"]:
+            channel_names = [channel_names[shard] for shard in options["shards"] if shard < len(channel_names)]
+        metrics = async_to_sync(self._collect)(channel_names, options["timeout"])
+        for channel_name in channel_names:
+            if channel_name not in metrics:
+                logger.warning("Game worker %s didn't report its metrics in time", channel_name)
+        self.stdout.write(json.dumps(metrics, indent=2))
+
+    async def _collect(self, channel_names: list[str], timeout: float) -> dict[str, GameWorkerMetricsSnapshot]:
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        for channel_name in channel_names:
+            await channel_layer.send(
+                channel_name,
+                GameWorkerControl.GetMetrics(type="worker_metrics", reply_channel=reply_channel),
+            )
+
+        metrics = {}
+
+        async def wait_for_replies():
+            while len(metrics) < len(channel_names):
+                message = await channel_layer.receive(reply_channel)
+                if message.get("type") == "worker_metrics_reported":
+                    metrics[message["metrics"]["channel_name"]] = message["metrics"]
+
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(wait_for_replies(), timeout)
+        return metrics
@@ -0,0 +1,62 @@
+import json
+import logging
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from pong.load_test import run_load_test
+
+logger = logging.getLogger("server")
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs simulated players through the events, matchmaking and game websockets, and measures the connection "
+        "setup, the jitter of the ticks, the latency of the moves and of the chat messages, and the CPU and memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=100, help="Number of simulated players, rounded to even.")
+        parser.add_argument("--duration", type=float, default=30, help="How long every game is played, in seconds.")
+        parser.add_argument("--chat-interval", type=float, default=2, help="Seconds between the chat messages.")
+        parser.add_argument(
+            "--workers",
+            choices=["auto", "in_process", "external"],
+            default="auto",
+            help="Where the game workers run. `auto` runs them in process with the in-memory channel layer.",
+        )
+        parser.add_argument("--output", type=Path, help="Path of the JSON file to write the results to.")
+
+    def handle(self, *args, **options):
+        result = run_load_test(
+            options["players"],
+            options["duration"],
+            chat_interval=options["chat_interval"],
+            workers=options["workers"],
+        )
+        for name, summary in (
+            *((f"{kind} connection", summary) for kind, summary in result.connection_setup.items()),
+            ("matchmaking", result.matchmaking),
+            ("tick interval", result.tick_interval),
+            ("tick jitter", result.tick_jitter),
+            ("input latency", result.input_latency),
+            ("chat latency", result.chat_latency),
+        ):
+            logger.info(
+                "%s: %d samples, p50 %.3f ms, p99 %.3f ms, max %.3f ms",
+                name,
+                summary["count"],
+                summary["p50_ms"],
+                summary["p99_ms"],
+                summary["max_ms"],
+            )
+        logger.info(
+            "%d players, %d games started, CPU %.0f%%, max RSS %.0f MB, errors: %s",
+            result.players,
+            result.games_started,
+            result.cpu_percent,
+            result.max_rss_mb,
+            result.errors or "none",
+        )
+        if options["output"]:
+            options["output"].write_text(json.dumps(result.as_dict(), indent=2) + "\n")
@@ -0,0 +1,49 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from pong.consumers.matchmaking import MATCHMAKING_WORKER_CHANNEL_NAME
+from pong.game_protocol import MatchmakingWorkerControl
+from pong.matchmaking_metrics import MatchmakingMetricsSnapshot
+
+logger = logging.getLogger("server")
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints the metrics of the matchmaking worker as JSON: waiting searches, wait times of the paired players and "
+        "their elo gaps"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--timeout", type=float, default=5, help="How long to wait for the worker, in seconds.")
+
+    def handle(self, *args, **options):
+        metrics = async_to_sync(self._collect)(options["timeout"])
+        if metrics is None:
+            logger.warning("Matchmaking worker didn't report its metrics in time")
+            return
+        self.stdout.write(json.dumps(metrics, indent=2))
+
+    async def _collect(self, timeout: float) -> MatchmakingMetricsSnapshot | None:
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        await channel_layer.send(
+            MATCHMAKING_WORKER_CHANNEL_NAME,
+            MatchmakingWorkerControl.GetMetrics(type="matchmaking_metrics", reply_channel=reply_channel),
+        )
+
+        async def wait_for_reply():
+            while True:
+                message = await channel_layer.receive(reply_channel)
+                if message.get("type") == "matchmaking_metrics_reported":
+                    return message["metrics"]
+
+        try:
+            return await asyncio.wait_for(wait_for_reply(), timeout)
+        except asyncio.TimeoutError:
+            return None
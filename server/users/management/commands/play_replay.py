@@ -0,0 +1,32 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pong.replays import get_replay_path, play_replay
+
+logger = logging.getLogger("server")
+
+
+class Command(BaseCommand):
+    help = "Plays the replay of the match on the pong engine and prints its final state, or every state with --states"
+
+    def add_arguments(self, parser):
+        parser.add_argument("game_id", help="Id of the match.")
+        parser.add_argument("--states", action="store_true", help="Print the state of every tick as JSON lines.")
+
+    def handle(self, *args, **options):
+        replay_path = get_replay_path(options["game_id"])
+        if replay_path is None or not replay_path.exists():
+            msg = f"Replay of the match {options['game_id']} doesn't exist"
+            raise CommandError(msg)
+
+        ticks = 0
+        state = None
+        for current_time, state in play_replay(replay_path.read_bytes()):
+            ticks += 1
+            if options["states"]:
+                self.stdout.write(json.dumps({"time": current_time, "state": state}))
+        logger.info("%d ticks were played", ticks)
+        if state and not options["states"]:
+            self.stdout.write(json.dumps(state, indent=2))
@@ -0,0 +1,31 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from pong.models import GameRoomPlayer
+
+logger = logging.getLogger("server")
+
+
+class Command(BaseCommand):
+    help = "Reset the counters of the connections of the players to their game rooms to 0"
+
+    def handle(self, *args, **options):
+        table_name = GameRoomPlayer._meta.db_table  # noqa: SLF001
+        connection = connections["default"]
+
+        if table_name in connection.introspection.table_names():
+            try:
+                # nobody is connected when the server starts, players reconnect to their games afterwards
+                number_of_players = GameRoomPlayer.objects.exclude(number_of_connections=0).update(
+                    number_of_connections=0,
+                )
+                logger.info("Successfully reset %d game room connection counters to 0", number_of_players)
+            except DatabaseError as e:
+                logger.error("Error resetting game room connection counters: %s", e)
+        else:
+            logger.info(
+                "Table '%s' does not exist. No need to reset game room connection counters.",
+                table_name,
+            )
@@ -0,0 +1,42 @@
+import json
+import logging
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from pong.simulation import BOTS, simulate
+
+logger = logging.getLogger("server")
+
+
+class Command(BaseCommand):
+    help = "Plays headless pong matches between bots and measures the performance of the engine"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--matches", type=int, default=1000, help="Number of simultaneous matches.")
+        parser.add_argument("--ticks", type=int, default=900, help="Number of ticks to play. 900 is 30 seconds.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of every random choice of the simulation.")
+        parser.add_argument("--bot", choices=list(BOTS), default="follow_ball", help="How bumpers are controlled.")
+        parser.add_argument("--engine", choices=["auto", "scalar", "batch"], default="auto", help="Physics engine.")
+        parser.add_argument("--output", type=Path, help="Path of the JSON file to write the results to.")
+
+    def handle(self, *args, **options):
+        result = simulate(
+            options["matches"],
+            options["ticks"],
+            seed=options["seed"],
+            bot=options["bot"],
+            engine=options["engine"],
+        )
+        logger.info(
+            "%d matches x %d ticks: %.0f match ticks/s, tick avg %.3f ms, p99 %.3f ms, %.3f sub ticks per match tick",
+            result.matches,
+            result.ticks,
+            result.match_ticks_per_second,
+            result.tick_time_avg_ms,
+            result.tick_time_p99_ms,
+            result.sub_ticks_per_match_tick,
+        )
+        logger.info("state checksum: %s", result.state_checksum)
+        if options["output"]:
+            options["output"].write_text(json.dumps(result.as_dict(), indent=2) + "\n")
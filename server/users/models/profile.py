@@ -10,10 +10,25 @@ import magic
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import RequestDataTooBig, ValidationError
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.db import models
-from django.db.models import Case, Count, Exists, ExpressionWrapper, F, Func, IntegerField, Q, Sum, Value, When
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    Func,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
 from django.db.models.lookups import Exact
 from django.utils import timezone
 
@@ -35,10 +50,82 @@ def calculate_winrate(wins: int, loses: int) -> int | None:
     return round(wins / (total) * 100)
 
 
+# seconds for which the active game participation stays cached when its invalidation was missed
+ACTIVE_GAME_PARTICIPATION_CACHE_TIMEOUT = 60
+
+
+def _get_active_game_participation_cache_key(profile_id: int) -> str:
+    return f"active_game_participation:{profile_id}"
+
+
+def invalidate_active_game_participation(*profile_ids: int) -> None:
+    """
+    Drops the cached active game participation of the profiles, see `Profile.get_active_game_participation`.
+    Called on the state transitions of game rooms, tournaments and game invitations. The cache is cleared right away,
+    and once more after the commit, so that the profiles read before the commit are not left cached.
+    """
+    keys = [_get_active_game_participation_cache_key(profile_id) for profile_id in profile_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# the search expires on its own if the server which holds its connection stops without cleaning up
+MATCHMAKING_SEARCH_CACHE_TIMEOUT = 10 * 60
+
+
+def _get_matchmaking_search_cache_key(profile_id: int) -> str:
+    return f"matchmaking_search:{profile_id}"
+
+
+def start_matchmaking_search(profile_id: int, channel_name: str) -> None:
+    """
+    Marks the profile as searching for the game from the `MatchmakingConsumer` with the `channel_name`, so that
+    `Profile.get_active_game_participation` sees the search, which has no game room until the opponent is found.
+    """
+    cache.set(_get_matchmaking_search_cache_key(profile_id), channel_name, MATCHMAKING_SEARCH_CACHE_TIMEOUT)
+
+
+def stop_matchmaking_search(profile_id: int, channel_name: str) -> None:
+    """Removes the search, unless it was already taken over by another connection of the same profile."""
+    cache_key = _get_matchmaking_search_cache_key(profile_id)
+    if cache.get(cache_key) == channel_name:
+        cache.delete(cache_key)
+
+
 class ProfileQuerySet(models.QuerySet):
     def for_username(self, username: str):
         return self.filter(user__username__iexact=username)
 
+    def with_active_game_participation(self):
+        """
+        Annotates the active non-tournament game room and its status, the tournament where the profile still plays and
+        the pending invitation the profile sent, with the subqueries of one query.
+        """
+        from chat.models import GameInvitation
+        from pong.models import GameRoom
+        from tournaments.models import Participant, Tournament
+
+        active_game_rooms = GameRoom.objects.filter(
+            players=OuterRef("pk"),
+            status__in=[GameRoom.PENDING, GameRoom.ONGOING],
+            bracket__isnull=True,
+        )
+        active_participants = Participant.objects.filter(
+            ~Q(status__in=[Participant.ELIMINATED, Participant.WINNER]),
+            profile=OuterRef("pk"),
+            tournament__status__in=[Tournament.PENDING, Tournament.ONGOING],
+            excluded=False,
+        )
+        pending_invitations = GameInvitation.objects.filter(sender=OuterRef("pk"), status=GameInvitation.PENDING)
+        return self.annotate(
+            active_game_room_id=Subquery(active_game_rooms.values("id")[:1]),
+            active_game_room_status=Subquery(active_game_rooms.values("status")[:1]),
+            active_tournament_id=Subquery(active_participants.values("tournament_id")[:1]),
+            pending_invitation_id=Subquery(pending_invitations.values("id")[:1]),
+        )
+
     def with_friendship_and_block_status(self, curr_user, username: str):
         """
         Annotates friendship and block status regarding user <username>.
@@ -358,26 +445,50 @@ class Profile(models.Model):
             return participant.tournament
         return None
 
-    def get_active_game_participation(self) -> tuple[GameRoom | None, Tournament | None, GameInvitation | None]:
+    def get_active_game_participation(
+        self,
+    ) -> tuple[GameRoom | None, Tournament | None, GameInvitation | None, str | None]:
         """
         Gets active game pariticipation.
         User should not participate in matchmaking, be a participant of a tournament, play pong match currently
         or have a game invitation for someone.
+        Resolved by one query, see `ProfileQuerySet.with_active_game_participation`, and cached until the state of the
+        game rooms, tournaments or invitations of the user changes. Only the ids of the returned models are loaded, and
+        the status of the game room, the other fields are loaded on access.
+        The last item is the channel name of the `MatchmakingConsumer` of the search for the game, see
+        `start_matchmaking_search`.
         """
-        active_statuses = ["pending", "ongoing"]
-        # active non-tournament game
-        active_game_room: GameRoom | None = self.game_rooms.filter(
-            status__in=active_statuses,
-            bracket__isnull=True,
-        ).first()
-
-        # active tournament presence
-        active_tournament: Tournament | None = self.get_active_tournament()
-
-        # active invitation of someone (as inviter)
-        pending_invitation_as_inviter: GameInvitation | None = self.sent_invites.filter(status="pending").first()
+        from chat.models import GameInvitation
+        from pong.models import GameRoom
+        from tournaments.models import Tournament
+
+        cache_key = _get_active_game_participation_cache_key(self.pk)
+        search_cache_key = _get_matchmaking_search_cache_key(self.pk)
+        cached = cache.get_many([cache_key, search_cache_key])
+        participation = cached.get(cache_key)
+        if participation is None:
+            participation = (
+                Profile.objects.filter(pk=self.pk)
+                .with_active_game_participation()
+                .values_list(
+                    "active_game_room_id",
+                    "active_game_room_status",
+                    "active_tournament_id",
+                    "pending_invitation_id",
+                )
+                .get()
+            )
+            cache.set(cache_key, participation, ACTIVE_GAME_PARTICIPATION_CACHE_TIMEOUT)
 
-        return active_game_room, active_tournament, pending_invitation_as_inviter
+        game_room_id, game_room_status, tournament_id, invitation_id = participation
+        return (
+            GameRoom.from_db(DEFAULT_DB_ALIAS, ["id", "status"], [game_room_id, game_room_status])
+            if game_room_id
+            else None,
+            Tournament.from_db(DEFAULT_DB_ALIAS, ["id"], [tournament_id]) if tournament_id else None,
+            GameInvitation.from_db(DEFAULT_DB_ALIAS, ["id"], [invitation_id]) if invitation_id else None,
+            cached.get(search_cache_key),
+        )
 
 
 class Friendship(models.Model):
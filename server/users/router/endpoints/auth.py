@@ -44,7 +44,7 @@ def check_self(request: HttpRequest):
     """
     profile: Profile = request.auth.profile
     active_games = profile.get_active_game_participation()
-    game_room, tournament, game_invitation = active_games
+    game_room, tournament, game_invitation, _ = active_games
     profile.game_id = str(game_room.id) if game_room and game_room.status == GameRoom.ONGOING else None
     profile.tournament_id = str(tournament.id) if tournament else None
     profile.is_engaged_in_game = any(x for x in active_games if x is not None)
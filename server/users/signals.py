@@ -1,9 +1,14 @@
 from contextlib import suppress
 
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
+from chat.models import GameInvitation
+from pong.models import GameRoom, GameRoomPlayer
+from tournaments.models import Participant, Tournament
+
 from .models import Profile, User
+from .models.profile import invalidate_active_game_participation
 
 
 @receiver(post_save, sender=User)
@@ -18,3 +23,32 @@ def delete_avatar(sender, instance: User, **kwargs) -> None:
     """Ensures that on `User` deletion their profile picture gets deleted too."""
     with suppress(Profile.DoesNotExist):
         instance.profile.delete_avatar()
+
+
+@receiver(post_save, sender=GameRoom)
+def invalidate_active_game_participation_of_game_room(sender, instance: GameRoom, created: bool, **kwargs) -> None:
+    """Players of the game room don't have it as active anymore, or have it now."""
+    if not created:
+        invalidate_active_game_participation(*instance.players.values_list("id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=GameRoomPlayer)
+@receiver([post_save, post_delete], sender=Participant)
+def invalidate_active_game_participation_of_player(
+    sender,
+    instance: GameRoomPlayer | Participant,
+    **kwargs,
+) -> None:
+    invalidate_active_game_participation(instance.profile_id)
+
+
+@receiver(post_save, sender=Tournament)
+def invalidate_active_game_participation_of_tournament(sender, instance: Tournament, created: bool, **kwargs) -> None:
+    if not created:
+        invalidate_active_game_participation(*instance.participants.values_list("profile_id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=GameInvitation)
+def invalidate_active_game_participation_of_inviter(sender, instance: GameInvitation, **kwargs) -> None:
+    if instance.sender_id is not None:
+        invalidate_active_game_participation(instance.sender_id)
@@ -1,6 +1,7 @@
 import logging
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.core import mail
 from django.test import TestCase
 from django.utils import timezone
@@ -20,6 +21,7 @@ class AuthEndpointsTests(TestCase):
         logging.disable(logging.NOTSET)
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user("TestUser", email="test@example.com", password="TestPassword123")
         self.user_with_mfa = User.objects.create_user(
             "MfaUser", email="mfa@example.com", password="TestPassword123", mfa_enabled=True
@@ -1,8 +1,11 @@
 import logging
 
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
 
 from chat.models import GameInvitation
+from pong.match_results import FinishedGameRoom, write_finished_game_rooms
 from pong.models import GameRoom, GameRoomPlayer, get_default_game_room_settings
 from tournaments.models import Tournament
 from users.models import User
@@ -11,6 +14,7 @@ from users.models import User
 # ruff: noqa: S106
 class ProfileModelTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.user: User = User.objects.create_user("TestUser", email="user0@gmail.com", password="123")
 
     def test_get_active_game_participation_when_not_active_in_games(self):
@@ -81,3 +85,29 @@ class ProfileModelTests(TestCase):
             next((x for x in self.user.profile.get_active_game_participation() if isinstance(x, GameInvitation)), None),
             "User should be able to participate in games after their invite was accepted",
         )
+
+    def test_get_active_game_participation_is_one_query_and_cached(self):
+        game_room: GameRoom = GameRoom.objects.create(settings=get_default_game_room_settings(), status=GameRoom.ONGOING)
+        game_room.add_player(self.user.profile)
+
+        with self.assertNumQueries(1):
+            participation = self.user.profile.get_active_game_participation()
+        active_game_room, active_tournament, pending_invitation, search = participation
+        self.assertEqual(active_game_room, game_room)
+        self.assertIsNone(active_tournament)
+        self.assertIsNone(pending_invitation)
+        self.assertIsNone(search)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.user.profile.get_active_game_participation()[0].status, GameRoom.ONGOING)
+
+    def test_get_active_game_participation_when_game_room_is_closed_in_bulk(self):
+        game_room: GameRoom = GameRoom.objects.create(settings=get_default_game_room_settings(), status=GameRoom.ONGOING)
+        game_room.add_player(self.user.profile)
+        self.assertEqual(self.user.profile.get_active_game_participation()[0], game_room)
+
+        write_finished_game_rooms([FinishedGameRoom(game_room_id=str(game_room.id), date=timezone.now().isoformat())])
+
+        self.assertIsNone(
+            self.user.profile.get_active_game_participation()[0],
+            "User should be able to participate in games after the game worker closed the game",
+        )
@@ -1,5 +1,6 @@
 import logging
 
+from django.core.cache import cache
 from django.test import TestCase
 
 from chat.models import GameInvitation
@@ -21,6 +22,7 @@ class AuthEndpointsTests(TestCase):
         logging.disable(logging.NOTSET)
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user("TestUser", email="user0@gmail.com", password="123")
 
     def _get_default_tournament_creation_data(self):
@@ -115,6 +117,7 @@ class UsersEndpointsTests(TestCase):
         logging.disable(logging.NOTSET)
 
     def setUp(self):
+        cache.clear()
         self.users: dict[User] = {}
         for i in range(5):
             self.users[f"TestUser{i}"] = User.objects.create_user(f"TestUser{i}", email=f"user{i}@gmail.com", password="123")